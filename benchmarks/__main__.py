@@ -0,0 +1,46 @@
+'''
+    python -m benchmarks [--quick] [--scenario NAME ...] [--output results.json]
+                         [--baseline baseline.json] [--threshold 0.2]
+
+Exits with status 1 when any metric regressed past the threshold against the baseline.
+'''
+import argparse
+import sys
+
+from benchmarks import harness
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Lexer, parser and evaluation benchmarks.')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs, for smoke runs')
+    parser.add_argument('--scenario', action='append', choices=list(harness.SCENARIOS), help='run only this scenario (repeatable)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved earlier')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown as a fraction (default: 0.2)')
+    options = parser.parse_args(arguments)
+
+    results = harness.run(options.scenario, options.quick)
+
+    print(f'{"scenario":<14} {"stage":<9} {"ops/s":>12} {"p50 us":>9} {"p99 us":>9} {"peak KB":>9}')
+    for name, stages in results['scenarios'].items():
+        for stage, metrics in stages.items():
+            print(
+                f'{name:<14} {stage:<9} {metrics["ops_per_second"]:>12,.0f} {metrics["p50_us"]:>9.1f} '
+                f'{metrics["p99_us"]:>9.1f} {metrics["peak_bytes"] / 1024:>9.1f}'
+            )
+
+    if options.output:
+        harness.save(results, options.output)
+
+    if options.baseline:
+        regressions = harness.compare(results, harness.load(options.baseline), options.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+'''
+Adaptive operand ordering on a filter written in an expensive order.
+
+    python -m benchmarks.bench_adaptive [events]
+'''
+import random
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import AdaptiveFilter, Compiler
+
+QUERY = 'contains(properties.description, "needle") and match(context.page.url, "*/checkout/*") and event = "Click"'
+
+
+def make_events(count, rng):
+    return [
+        {
+            'event': 'Click' if rng.random() < 0.05 else 'View',
+            'properties': {'description': 'lorem ipsum ' * 150 + rng.choice(['needle', 'hay'])},
+            'context': {'page': {'url': rng.choice(['https://shop.example/checkout/cart', 'https://shop.example/home'])}},
+        }
+        for _ in range(count)
+    ]
+
+
+def run(predicate, events):
+    start = time.perf_counter()
+    for event in events:
+        predicate(event)
+    return len(events) / (time.perf_counter() - start)
+
+
+def main(count=50_000):
+    events = make_events(count, random.Random(2))
+    ast = Parser(Scanner(QUERY).lex()).parse()
+
+    adaptive = AdaptiveFilter(ast, reorder_every=1_000)
+    learning = run(adaptive, events)
+
+    print(f'source order compiled:  {run(Compiler(ast).compile(), events):>10,.0f} events/s')
+    print(f'adaptive (learning):    {learning:>10,.0f} events/s')
+    print(f'learned order compiled: {run(adaptive.compile(), events):>10,.0f} events/s')
+    print(f'learned order:          {[operand.key for operand in adaptive.plan.operands[0].operands]}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,87 @@
+'''
+Finding duplicate and implied filters in a workspace of 10k filters: most
+filters are `event = "..."` plus a few conditions, with copies in a different
+order or spelling and stronger variants of some of them. Then the same for
+filters with no `path = value` condition: `!=`, ranges and `or`.
+
+    python -m benchmarks.bench_analysis [filters]
+'''
+import random
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import FilterAnalysis
+
+
+def condition(rng):
+    field = f'properties.p{rng.randrange(20)}'
+    kind = rng.randrange(5)
+    if kind == 0:
+        return f'{field} = "v{rng.randrange(10)}"'
+    if kind == 1:
+        return f'{field} > {rng.randrange(100)}'
+    if kind == 2:
+        return f'{field} = [{", ".join(str(rng.randrange(10)) for _ in range(3))}]'
+    if kind == 3:
+        return f'contains({field}, "s{rng.randrange(10)}")'
+    return f'{field} != null'
+
+
+def workspace(count, seed=21):
+    '''`count` queries: 70% originals, 15% reordered copies and 15% stronger variants.'''
+    rng = random.Random(seed)
+    originals = []
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if originals and kind < 0.15:
+            event, conditions = rng.choice(originals)
+            conditions = conditions[::-1]
+            queries.append(' and '.join(conditions + [f'"{event}" = event']))
+        elif originals and kind < 0.3:
+            event, conditions = rng.choice(originals)
+            queries.append(' and '.join([f'event = "{event}"'] + conditions + [condition(rng)]))
+        else:
+            event = f'Event {rng.randrange(count // 20 or 1)}'
+            conditions = [condition(rng) for _ in range(rng.randrange(3))]
+            originals.append((event, conditions))
+            queries.append(' and '.join([f'event = "{event}"'] + conditions))
+    return queries
+
+
+def inequalities(count):
+    '''`count` queries without equalities to require, e.g. `properties.x > 7 and properties.x < 12`.'''
+    shapes = [
+        lambda index: f'event = "A" and properties.x != {index}',
+        lambda index: f'properties.x > {index} and properties.x < {index + 5}',
+        lambda index: f'event = "B" or properties.y = {index}',
+        lambda index: f'properties.x < {index % 100} and properties.x > -{index % 100}',
+    ]
+    return [shapes[index % 4](index) for index in range(count)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(count=10_000):
+    for name, queries in [('workspace', workspace(count)), ('inequalities', inequalities(count))]:
+        asts, parsing = timed(lambda: {index: Parser(Scanner(query).lex()).parse() for index, query in enumerate(queries)})
+        analysis, building = timed(lambda: FilterAnalysis(asts))
+        duplicates, deduplicating = timed(analysis.duplicates)
+        implications, implying = timed(analysis.implications)
+
+        print(f'{name}')
+        print(f'  filters:       {len(analysis):,}')
+        print(f'  parse:         {parsing:.2f}s')
+        print(f'  analyze:       {building:.2f}s')
+        print(f'  duplicates:    {deduplicating:.2f}s  {len(duplicates):,} groups, {sum(len(group) - 1 for group in duplicates):,} redundant filters')
+        print(f'  implications:  {implying:.2f}s  {len(implications):,} pairs, {analysis.unchecked:,} unchecked')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
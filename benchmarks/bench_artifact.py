@@ -0,0 +1,49 @@
+'''
+Worker cold start for 10k filters: lexing, parsing and compiling every query
+against loading a FilterArtifact, eagerly or lazily.
+
+    python -m benchmarks.bench_artifact [filters]
+'''
+import os
+import sys
+import tempfile
+import time
+
+from segment_fql import Filter, FilterArtifact
+from benchmarks.generator import QueryGenerator
+
+
+def main(count=10_000):
+    generator = QueryGenerator(clauses=4, depth=1, function_ratio=0.2, seed=14)
+    queries = {f'filter-{index}': query for index, query in enumerate(generator.queries(count))}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'filters.fqla')
+        FilterArtifact.dump(queries, path)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        from_source = {filter_id: Filter(query) for filter_id, query in queries.items()}
+        parse = time.perf_counter() - start
+
+        start = time.perf_counter()
+        artifact = FilterArtifact.load(path)
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = {filter_id: artifact[filter_id] for filter_id in artifact}
+        build = time.perf_counter() - start
+
+        event = generator.event()
+        assert all(loaded[filter_id](event) == from_source[filter_id](event) for filter_id in queries)
+        artifact.close()
+
+    source_size = sum(len(query.encode()) for query in queries.values())
+    print(f'{count} filters, {source_size / 1024:.0f} KB of source, {size / 1024:.0f} KB artifact')
+    print(f'  parse and compile from source: {parse * 1000:8.1f} ms')
+    print(f'  load artifact (lazy):          {load * 1000:8.1f} ms  {parse / load:6.1f}x')
+    print(f'  load artifact and build all:   {(load + build) * 1000:8.1f} ms  {parse / (load + build):6.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,71 @@
+'''
+Columnar batch evaluation against calling the compiled predicate once per row.
+
+    python -m benchmarks.bench_columnar [rows]
+'''
+import array
+import random
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.compiler import ColumnarEvaluator, columns_from_events
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+QUERIES = [
+    'event = "Order Completed"',
+    'event = "Order Completed" and properties.revenue > 50',
+    'type = "track" and properties.revenue > 50 or contains(context.ip, "10.")',
+    '!(event = "Page Viewed") and properties.revenue <= 20 and type != "identify"',
+]
+
+
+def make_events(count, rng):
+    return [
+        {
+            'type': rng.choice(['track', 'page', 'identify']),
+            'event': rng.choice(['Order Completed', 'Page Viewed', 'Signed Up']),
+            'properties': {'revenue': rng.randint(0, 100)},
+            'context': {'ip': f'{rng.choice([10, 172, 192])}.0.0.{rng.randint(0, 255)}'},
+        }
+        for _ in range(count)
+    ]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(rows=100_000):
+    rng = random.Random(3)
+    events = make_events(rows, rng)
+    print(f'{"query":<80} {"rows/s":>12} {"lists":>12} {"numpy":>12}')
+    for query in QUERIES:
+        compiled = Filter(query)
+        evaluator = ColumnarEvaluator(compiled.ast)
+        columns = columns_from_events(events, evaluator.paths)
+        if 'properties.revenue' in columns:
+            columns['properties.revenue'] = array.array('q', columns['properties.revenue'])
+
+        expected, per_row = timed(lambda: [compiled.predicate(event) for event in events])
+        mask, batched = timed(lambda: evaluator.evaluate(columns))
+        assert mask == expected
+
+        vectorized = ''
+        if numpy is not None:
+            arrays = {path: numpy.asarray(values) if path != 'context.ip' else numpy.asarray(values, dtype=object) for path, values in columns.items()}
+            mask, elapsed = timed(lambda: evaluator.evaluate(arrays))
+            assert mask.tolist() == expected
+            vectorized = f'{rows / elapsed:,.0f}'
+
+        print(f'{query:<80} {rows / per_row:>12,.0f} {rows / batched:>12,.0f} {vectorized:>12}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
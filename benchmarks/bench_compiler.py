@@ -0,0 +1,64 @@
+'''
+Compiled predicates against the tree-walking interpreter.
+
+    python -m benchmarks.bench_compiler [events]
+'''
+import random
+import sys
+import time
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Interpreter
+
+QUERY = (
+    'type = "track" and event = "Order Completed" and properties.revenue > 10 '
+    'or !(context.library.name = "analytics.js") and contains(properties.url, "checkout")'
+)
+
+EVENT_NAMES = ['Order Completed', 'Product Viewed', 'Signed Up', 'Page Viewed']
+LIBRARIES = ['analytics.js', 'analytics-python', 'analytics-ios']
+
+
+def make_events(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            'type': rng.choice(['track', 'page', 'identify']),
+            'event': rng.choice(EVENT_NAMES),
+            'properties': {
+                'revenue': rng.randint(0, 50),
+                'url': rng.choice(['https://shop.example/checkout', 'https://shop.example/cart']),
+            },
+            'context': {'library': {'name': rng.choice(LIBRARIES)}},
+        }
+        for _ in range(count)
+    ]
+
+
+def run(evaluate, events):
+    start = time.perf_counter()
+    matches = 0
+    for event in events:
+        if evaluate(event):
+            matches += 1
+    return time.perf_counter() - start, matches
+
+
+def main(count=1_000_000):
+    ast = Parser(Lexer(QUERY).lex()).parse()
+    events = make_events(count)
+
+    interpreted, interpreted_matches = run(Interpreter(ast).evaluate, events)
+    compiled, compiled_matches = run(Compiler(ast).compile(), events)
+    assert interpreted_matches == compiled_matches
+
+    print(f'events:      {count}')
+    print(f'matches:     {compiled_matches}')
+    print(f'interpreter: {interpreted:.3f}s ({count / interpreted:,.0f} events/s)')
+    print(f'compiled:    {compiled:.3f}s ({count / compiled:,.0f} events/s)')
+    print(f'speedup:     {interpreted / compiled:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
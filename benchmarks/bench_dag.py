@@ -0,0 +1,43 @@
+'''
+Shared predicate DAG against evaluating each compiled filter separately.
+
+    python -m benchmarks.bench_dag [filters]
+'''
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, PredicateDAG
+from benchmarks.generator import QueryGenerator
+
+
+def main(count=1_000):
+    generator = QueryGenerator(clauses=4, function_ratio=0.5, string_length=64, seed=4)
+    asts = {index: Parser(Scanner(query).lex()).parse() for index, query in enumerate(generator.queries(count))}
+    events = generator.events(200)
+
+    predicates = {filter_id: Compiler(ast).compile() for filter_id, ast in asts.items()}
+    dag = PredicateDAG(asts)
+
+    start = time.perf_counter()
+    expected = [[filter_id for filter_id, predicate in predicates.items() if predicate(event)] for event in events]
+    separate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [dag.match(event) for event in events]
+    shared = time.perf_counter() - start
+    assert found == expected
+
+    stats = dag.stats()
+    profile = dag.profile(events)
+    print(f'filters:             {stats["filters"]}')
+    print(f'sub-tree references: {stats["references"]}')
+    print(f'unique nodes:        {stats["nodes"]} ({stats["deduplication_ratio"]:.2f}x deduplication)')
+    print(f'evaluations/event:   {profile["evaluations_per_event"]:.0f} shared, {profile["unshared_per_event"]:.0f} unshared')
+    print(f'separate:            {len(events) / separate:,.0f} events/s')
+    print(f'dag:                 {len(events) / shared:,.0f} events/s')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,76 @@
+'''
+Per-keystroke latency of `Document.edit` against lexing and parsing the whole
+query again, while typing a clause into the middle of filters of 1k to 100k
+characters.
+
+    python -m benchmarks.bench_document [largest size in characters]
+'''
+import statistics
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser, Document
+from benchmarks.generator import QueryGenerator
+
+TYPED = 'properties.total > 42 and '
+
+
+def query(size):
+    generator = QueryGenerator(clauses=4, depth=2, function_ratio=0.2, list_size=3, seed=22)
+    parts = []
+    length = 0
+    while length < size:
+        part = generator.query()
+        parts.append(part)
+        length += len(part) + 5
+    return ' and '.join(parts)
+
+
+def full(text):
+    try:
+        Parser(Scanner(text).lex()).parse()
+    except Exception:
+        pass
+
+
+def keystrokes(text):
+    '''`(start, end, text)` edits typing `TYPED` after the middle `and`, then deleting it again.'''
+    position = text.index(' and ', len(text) // 2) + len(' and ')
+    edits = [(position + index, position + index, char) for index, char in enumerate(TYPED)]
+    edits += [(position + index - 1, position + index, '') for index in range(len(TYPED), 0, -1)]
+    return edits
+
+
+def main(largest=100_000):
+    print(f'{"chars":>8} {"tokens":>7} {"edit p50 us":>12} {"edit p99 us":>12} {"full p50 us":>12} {"speedup":>8}')
+    size = 1_000
+    while size <= largest:
+        text = query(size)
+        document = Document(text)
+        edits = keystrokes(text)
+
+        latencies = []
+        for start, end, typed in edits:
+            began = time.perf_counter()
+            document.edit(start, end, typed)
+            latencies.append(time.perf_counter() - began)
+        assert document.text == text and document.error is None
+
+        full_latencies = []
+        current = text
+        for start, end, typed in edits[::max(1, len(edits) // 10)]:
+            current = current[:start] + typed + current[end:]
+            began = time.perf_counter()
+            full(current)
+            full_latencies.append(time.perf_counter() - began)
+
+        edit_p50 = statistics.median(latencies) * 1e6
+        edit_p99 = sorted(latencies)[int(len(latencies) * 0.99)] * 1e6
+        full_p50 = statistics.median(full_latencies) * 1e6
+        print(f'{len(text):>8,} {len(document.tokens):>7,} {edit_p50:>12.1f} {edit_p99:>12.1f} {full_p50:>12.1f} {full_p50 / edit_p50:>7.0f}x')
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
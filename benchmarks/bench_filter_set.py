@@ -0,0 +1,64 @@
+'''
+FilterSet lookups against evaluating every filter, at 100, 1k and 10k filters.
+
+    python -m benchmarks.bench_filter_set [events]
+'''
+import random
+import sys
+import time
+
+from segment_fql import Filter, FilterSet
+
+SIZES = [100, 1_000, 10_000]
+EVENT_NAMES = [f'Event {index}' for index in range(500)]
+
+
+def make_queries(count, rng):
+    queries = {}
+    for index in range(count):
+        roll = rng.random()
+        if roll < 0.8:
+            query = f'event = "{rng.choice(EVENT_NAMES)}" and properties.revenue > {rng.randint(0, 100)}'
+        elif roll < 0.9:
+            query = f'type = "{rng.choice(["page", "identify", "screen"])}" or event = "{rng.choice(EVENT_NAMES)}"'
+        else:
+            query = f'contains(properties.url, "/{rng.randint(0, 50)}/")'
+        queries[f'filter-{index}'] = query
+    return queries
+
+
+def make_events(count, rng):
+    return [
+        {
+            'type': rng.choice(['track', 'track', 'page', 'identify']),
+            'event': rng.choice(EVENT_NAMES),
+            'properties': {'revenue': rng.randint(0, 100), 'url': f'/shop/{rng.randint(0, 50)}/item'},
+        }
+        for _ in range(count)
+    ]
+
+
+def main(event_count=2_000):
+    rng = random.Random(11)
+    events = make_events(event_count, rng)
+    print(f'{"filters":>8} {"linear ev/s":>12} {"indexed ev/s":>13} {"candidates":>11} {"speedup":>8}')
+    for size in SIZES:
+        queries = make_queries(size, rng)
+        compiled = [(filter_id, Filter(query).predicate) for filter_id, query in queries.items()]
+        filters = FilterSet({filter_id: Filter(query).ast for filter_id, query in queries.items()})
+
+        start = time.perf_counter()
+        expected = [[filter_id for filter_id, predicate in compiled if predicate(event)] for event in events]
+        linear = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = [filters.match(event) for event in events]
+        indexed = time.perf_counter() - start
+
+        assert found == expected
+        candidates = sum(len(filters.candidates(event)) for event in events) / len(events)
+        print(f'{size:>8} {len(events) / linear:>12,.0f} {len(events) / indexed:>13,.0f} {candidates:>11.1f} {linear / indexed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,63 @@
+'''
+`match()` globs through the function runtime against a regex per glob (what
+the compiler used before: `fnmatch.translate`, wrapped to return a boolean),
+and compiling many filters that share patterns.
+
+    python -m benchmarks.bench_functions [values]
+'''
+import fnmatch
+import random
+import re
+import string
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.functions import match, default_registry
+
+PATTERNS = ['https://segment.com/docs', 'https://*', '*.pdf', '*/checkout/*', 'https://*/docs/*.html', 'user-??-*', '[a-m]*']
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def make_values(count, rng):
+    hosts = ['segment.com', 'example.com', 'app.segment.com']
+    paths = ['docs/intro.html', 'checkout/cart', 'files/report.pdf', 'docs/api/index.html']
+    return [
+        rng.choice([
+            f'https://{rng.choice(hosts)}/{rng.choice(paths)}',
+            f'user-{rng.randint(10, 99)}-{rng.choice(string.ascii_lowercase)}',
+            ''.join(rng.choice(string.ascii_lowercase) for _ in range(12)),
+        ])
+        for _ in range(count)
+    ]
+
+
+def main(values=200_000):
+    rng = random.Random(11)
+    subjects = make_values(values, rng)
+    print(f'{"pattern":<26} {"regex/s":>12} {"runtime/s":>12} {"speedup":>8}')
+    for pattern in PATTERNS:
+        matcher = re.compile(fnmatch.translate(pattern)).match
+        baseline = lambda value: matcher(value) is not None
+        test = match(pattern)
+
+        expected, regex = timed(lambda: [baseline(value) for value in subjects])
+        result, runtime = timed(lambda: [test(value) for value in subjects])
+        assert result == expected
+        print(f'{pattern:<26} {values / regex:>12,.0f} {values / runtime:>12,.0f} {regex / runtime:>7.1f}x')
+
+    filters = 10_000
+    queries = [f'event = "e{index}" and match(properties.url, "{rng.choice(PATTERNS)}")' for index in range(filters)]
+    default_registry.clear()
+    _, elapsed = timed(lambda: [Filter(query) for query in queries])
+    info = default_registry.cache_info()
+    print(f'\n{filters:,} filters compiled in {elapsed:.2f}s: {info.misses} matchers built, {info.hits:,} shared')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,43 @@
+'''
+Scanner throughput against the character-level Lexer, from 10 characters to 1 MB.
+
+    python -m benchmarks.bench_lexer
+'''
+import time
+
+from segment_fql.lexer import Lexer, Scanner
+
+CLAUSE = 'event = "Order Completed" or properties.revenue >= 10.5 and contains(context.page.url, "checkout") or '
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def make_query(size):
+    '''Repeats `CLAUSE` until `size` characters, cutting the tail back to a whole token.'''
+    text = (CLAUSE * (size // len(CLAUSE) + 1))[:size]
+    return text.rsplit(' ', 1)[0] if ' ' in text else 'event'
+
+
+def measure(lexer_class, text, minimum_time=0.2):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        lexer_class(text).lex()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= minimum_time:
+            return elapsed / runs
+
+
+def main():
+    print(f'{"chars":>10} {"lexer MB/s":>12} {"scanner MB/s":>13} {"speedup":>8}')
+    for size in SIZES:
+        text = make_query(size)
+        assert Scanner(text).lex() == Lexer(text).lex()
+        lexer = measure(Lexer, text)
+        scanner = measure(Scanner, text)
+        megabytes = len(text) / 1_000_000
+        print(f'{len(text):>10} {megabytes / lexer:>12.2f} {megabytes / scanner:>13.2f} {lexer / scanner:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+List literals of 10 to 100,000 values: build cost, and evaluation against a
+linear scan of the same values (what a naive `in` over the list would cost).
+
+    python -m benchmarks.bench_list [events]
+'''
+import random
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.compiler import semantics
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(events=20_000):
+    rng = random.Random(5)
+    print(f'{"list":<8} {"values":>8} {"build ms":>10} {"events/s":>12} {"linear/s":>12}')
+    for size in SIZES:
+        for kind in ['strings', 'numbers']:
+            if kind == 'strings':
+                values = [f'user-{index}' for index in range(size)]
+                literals = ', '.join(f'"{value}"' for value in values)
+                probes = [f'user-{rng.randrange(2 * size)}' for _ in range(events)]
+            else:
+                values = list(range(0, 2 * size, 2))
+                literals = ', '.join(str(value) for value in values)
+                probes = [rng.randrange(2 * size) for _ in range(events)]
+            batch = [{'userId': probe} for probe in probes]
+
+            compiled, build = timed(lambda: Filter(f'userId = [{literals}]'))
+            matched, elapsed = timed(lambda: [compiled(event) for event in batch])
+
+            # The linear scan gets the same number of probes, capped so it finishes.
+            scanned = batch[:max(100, events * 10 // size)]
+
+            def linear():
+                return [any(semantics.equals(event['userId'], value) for value in values) for event in scanned]
+            expected, linear_elapsed = timed(linear)
+            assert expected == matched[:len(scanned)]
+
+            print(f'{kind:<8} {size:>8,} {build * 1000:>10.1f} {events / elapsed:>12,.0f} {len(scanned) / linear_elapsed:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
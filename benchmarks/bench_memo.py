@@ -0,0 +1,87 @@
+'''
+MemoizedFilter against the plain compiled predicate on event streams whose
+projected values follow a Zipf distribution. Lower exponents are closer to
+uniform. The last stream has unique values, where the cache switches itself
+off. Memoization pays off for filters that cost more to evaluate than to
+project, like `heavy`; `cheap` shows the overhead on filters that do not.
+
+    python -m benchmarks.bench_memo [events] [distinct combinations]
+'''
+import itertools
+import json
+import random
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.compiler import MemoizedFilter
+
+EVENT_NAMES = [f'Event {index}' for index in range(40)]
+QUERIES = {
+    'cheap': 'event = "Event 4" and properties.plan != "free-0"',
+    # A destination filter of the heavier kind: long lists and several glob matches on the same few fields.
+    'heavy': (
+        f'event = {json.dumps(EVENT_NAMES[::2])} and '
+        '!(match(context.library.name, "*-test*")) and !(contains(properties.plan, "trial")) and '
+        '!(!(match(context.library.name, "analytics*") or match(context.library.name, "*-ios"))) and '
+        'match(context.page.url, "https://*/*?*utm_source=*") or '
+        'properties.plan = ["enterprise-1", "business-2", "enterprise-3", "business-4"] and '
+        'match(context.page.url, "*/pricing/*") and !(match(context.page.url, "*preview=*")) or '
+        'contains(context.page.url, "/checkout/") and !(contains(properties.plan, "free")) and '
+        '!(match(context.page.url, "*utm_medium=internal*"))'
+    ),
+}
+EXPONENTS = [0.8, 1.1, 1.5]
+REPEATS = 3
+
+
+def combination(index):
+    section = ['pricing', 'docs', 'blog', 'checkout'][index % 4]
+    return {
+        'event': EVENT_NAMES[index % 40],
+        'context': {
+            'library': {'name': ['analytics.js', 'analytics-ios', 'analytics-node', 'segment-go'][index // 40 % 4]},
+            'page': {'url': f'https://www.example.com/{section}/{index % 50}?utm_source=newsletter&utm_medium={["email", "internal"][index // 7 % 2]}'},
+        },
+        'properties': {'plan': f'{["free", "trial", "business", "enterprise"][index // 20 % 4]}-{index // 80}', 'revenue': index},
+    }
+
+
+def zipf_stream(count, distinct, exponent, rng):
+    combinations = [combination(index) for index in range(distinct)]
+    weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, distinct + 1)))
+    return rng.choices(combinations, cum_weights=weights, k=count)
+
+
+def run(make, events):
+    '''Best throughput of `REPEATS` runs, each with a fresh predicate from `make()`.'''
+    best = 0
+    for _ in range(REPEATS):
+        predicate = make()
+        start = time.perf_counter()
+        results = [predicate(event) for event in events]
+        best = max(best, len(events) / (time.perf_counter() - start))
+    return results, best, predicate
+
+
+def main(event_count=100_000, distinct=20_000):
+    rng = random.Random(25)
+    streams = [(f'zipf {exponent}', zipf_stream(event_count, distinct, exponent, rng)) for exponent in EXPONENTS]
+    streams.append(('unique', [combination(index) for index in range(event_count)]))
+    print(f'{"query":>6} {"stream":>10} {"plain ev/s":>11} {"memo ev/s":>11} {"speedup":>8} {"hit rate":>9} {"entries":>8} {"memory KB":>10} {"enabled":>8}')
+    for name, query in QUERIES.items():
+        compiled = Filter(query)
+        for stream, events in streams:
+            expected, plain_rate, _ = run(lambda: compiled.predicate, events)
+            found, memo_rate, memoized = run(lambda: MemoizedFilter(compiled.ast), events)
+            assert found == expected
+
+            stats = memoized.stats()
+            print(
+                f'{name:>6} {stream:>10} {plain_rate:>11,.0f} {memo_rate:>11,.0f} {memo_rate / plain_rate:>7.2f}x {stats["hit_rate"]:>8.1%} '
+                f'{stats["entries"]:>8,} {stats["memory_bytes"] / 1024:>10,.0f} {str(stats["enabled"]):>8}'
+            )
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:3]])
@@ -0,0 +1,67 @@
+'''
+Memory held by 50k parsed filters: the previous dict-backed representation,
+the current slotted tree with shared tokens, and FlatAST.
+
+    python -m benchmarks.bench_memory [filters]
+'''
+import gc
+import sys
+import tracemalloc
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser, ASTNode, FlatAST
+
+TEMPLATES = [
+    'event = "Order Completed {0}" and properties.revenue > {0}',
+    'type = "track" and !(context.library.name = "analytics.js" or properties.plan = "plan-{0}")',
+    'contains(properties.url, "/checkout/{0}") or match(context.page.path, "/docs/{0}/*")',
+]
+
+
+class LegacyToken:
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+class LegacyNode:
+    def __init__(self, node_type, children):
+        self.type = node_type
+        self.children = children
+
+
+def legacy_copy(node):
+    '''Per-instance `__dict__`, a fresh token per occurrence and no interning, as before.'''
+    if isinstance(node, ASTNode):
+        return LegacyNode(node.type, [legacy_copy(child) for child in node.children])
+    return LegacyToken(node.type, ''.join(list(node.value)))
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(index) for index in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def parse(index):
+    return Parser(Scanner(TEMPLATES[index % len(TEMPLATES)].format(index)).lex()).parse()
+
+
+def main(count=50_000):
+    results = [
+        ('legacy tree', measure(lambda index: legacy_copy(parse(index)), count)),
+        ('slotted tree', measure(parse, count)),
+        ('flat arrays', measure(lambda index: FlatAST.from_node(parse(index)), count)),
+    ]
+    baseline = results[0][1]
+    print(f'{count} filters')
+    for name, size in results:
+        print(f'{name:<13} {size / 1_000_000:>8.1f} MB {size / count:>8.0f} B/filter {size / baseline:>6.0%}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
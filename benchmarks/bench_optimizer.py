@@ -0,0 +1,68 @@
+'''
+Node counts and evaluation speed before and after `Optimizer`, on generated
+filters and on a long equality chain over one path.
+
+    python -m benchmarks.bench_optimizer [events]
+'''
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Optimizer
+from benchmarks.generator import QueryGenerator
+
+SCENARIOS = {
+    'small': {'clauses': 3},
+    'wide': {'clauses': 200},
+    'deep': {'clauses': 40, 'depth': 30},
+    'lists': {'clauses': 10, 'list_size': 50},
+}
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def chain(size):
+    return ' or '.join(f'userId = "user-{index}"' for index in range(size)) + ' and type = "track"'
+
+
+def main(events=20_000):
+    print(f'{"scenario":<14} {"nodes":>8} {"optimized":>10} {"optimize ms":>12} {"events/s":>12} {"optimized/s":>12}')
+    cases = [(name, QueryGenerator(seed=8, **options)) for name, options in SCENARIOS.items()]
+    for name, generator in cases + [('chain-500', None)]:
+        if generator is None:
+            queries = [chain(500)]
+            batch = [{'userId': f'user-{index % 1000}', 'type': 'track'} for index in range(events)]
+        else:
+            queries = generator.queries(20)
+            batch = generator.events(events // len(queries))
+
+        before = after = 0
+        optimizing = plain = optimized = 0.0
+        for query in queries:
+            ast = Parser(Scanner(query).lex()).parse()
+            optimizer = Optimizer(ast)
+            rewritten, elapsed = timed(optimizer.optimize)
+            optimizing += elapsed
+            before += optimizer.nodes_before
+            after += optimizer.nodes_after
+
+            predicate = Compiler(ast).compile()
+            faster = Compiler(rewritten).compile()
+            expected, elapsed = timed(lambda: [predicate(event) for event in batch])
+            plain += elapsed
+            result, elapsed = timed(lambda: [faster(event) for event in batch])
+            optimized += elapsed
+            assert result == expected
+
+        evaluated = len(queries) * len(batch)
+        print(f'{name:<14} {before:>8,} {after:>10,} {optimizing * 1000 / len(queries):>12.2f} '
+              f'{evaluated / plain:>12,.0f} {evaluated / optimized:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,35 @@
+'''
+Parser scaling from 10 to 100k clauses, joined with `or` on one path and with
+`and` on a different path per clause. The time per clause should stay flat.
+
+    python -m benchmarks.bench_parser
+'''
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+
+CLAUSES = [10, 100, 1_000, 10_000, 100_000]
+SHAPES = {
+    'or': lambda index: f'event = "Event {index}"',
+    'and': lambda index: f'properties.id{index} = "{index}"',
+}
+REPEATS = 3
+
+
+def main():
+    print(f'{"shape":>5} {"clauses":>8} {"tokens":>8} {"seconds":>9} {"us/clause":>10}')
+    for shape, clause in SHAPES.items():
+        for clauses in CLAUSES:
+            tokens = Scanner(f' {shape} '.join(clause(index) for index in range(clauses))).lex()
+            timings = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                Parser(tokens).parse()
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+            print(f'{shape:>5} {clauses:>8} {len(tokens):>8} {elapsed:>9.4f} {elapsed / clauses * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
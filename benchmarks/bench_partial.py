@@ -0,0 +1,83 @@
+'''
+Routing with residuals. Events carry one of 50 event names. The first event of
+each `type` and `event` pair specializes every filter through a
+`ResidualCache` and keeps the residuals that are not `false`. Later events of
+the pair only evaluate those. Compared against evaluating every filter, both
+on a cold start (specializing included) and once every pair has its route.
+
+    python -m benchmarks.bench_partial [events]
+'''
+import random
+import sys
+import time
+
+from segment_fql import Filter, ResidualCache
+from benchmarks.bench_filter_set import EVENT_NAMES, make_queries
+
+SIZES = [100, 1_000]
+
+
+def make_events(count, rng):
+    return [
+        {
+            'type': rng.choice(['track', 'track', 'page', 'identify']),
+            'event': rng.choice(EVENT_NAMES[:50]),
+            'properties': {'revenue': rng.randint(0, 100), 'url': f'/shop/{rng.randint(0, 50)}/item'},
+        }
+        for _ in range(count)
+    ]
+
+
+def route(filters, events, cache, routes):
+    '''Matching filter ids per event, evaluating only the residuals left live for its `type` and `event`.'''
+    found = []
+    for event in events:
+        key = (event['type'], event['event'])
+        live = routes.get(key)
+        if live is None:
+            known = {'type': key[0], 'event': key[1]}
+            live = routes[key] = [
+                (filter_id, residual) for filter_id, residual in
+                ((filter_id, cache.get(compiled, known)) for filter_id, compiled in filters.items())
+                if residual.always is not False
+            ]
+        found.append([filter_id for filter_id, residual in live if residual.always or residual(event)])
+    return found
+
+
+def main(event_count=20_000):
+    rng = random.Random(24)
+    events = make_events(event_count, rng)
+    print(f'{"filters":>8} {"full ev/s":>10} {"cold ev/s":>10} {"warm ev/s":>10} {"speedup":>8} {"live":>6} {"pairs":>6} {"specialize us":>14}')
+    for size in SIZES:
+        filters = {filter_id: Filter(query) for filter_id, query in make_queries(size, rng).items()}
+        cache = ResidualCache(maxsize=size * 200)
+
+        start = time.perf_counter()
+        expected = [[filter_id for filter_id, compiled in filters.items() if compiled(event)] for event in events]
+        full = time.perf_counter() - start
+
+        routes = {}
+        start = time.perf_counter()
+        found = route(filters, events, cache, routes)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm_found = route(filters, events, cache, routes)
+        warm = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for filter_id, compiled in filters.items():
+            compiled.specialize({'type': 'track', 'event': EVENT_NAMES[0]})
+        specialize = (time.perf_counter() - start) / len(filters)
+
+        assert found == expected and warm_found == expected
+        live = sum(len(residuals) for residuals in routes.values()) / len(routes)
+        print(
+            f'{size:>8} {len(events) / full:>10,.0f} {len(events) / cold:>10,.0f} {len(events) / warm:>10,.0f} {full / warm:>7.1f}x '
+            f'{live:>6.1f} {len(routes):>6} {specialize * 1e6:>14.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
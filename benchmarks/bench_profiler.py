@@ -0,0 +1,59 @@
+'''
+Cost of `Profiler`: events per second for the plain filter, a disabled
+profiler (through `profiler.predicate` and through `profiler(event)`),
+profiling with and without timing, and per-event tracing.
+
+    python -m benchmarks.bench_profiler [events]
+'''
+import sys
+import time
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Profiler
+from benchmarks.generator import QueryGenerator
+
+SCENARIOS = {
+    'small': {'clauses': 3},
+    'wide': {'clauses': 50},
+    'deep': {'clauses': 20, 'depth': 10},
+    'functions': {'clauses': 10, 'function_ratio': 0.5},
+}
+
+
+def rate(function, batch):
+    start = time.perf_counter()
+    for event in batch:
+        function(event)
+    return len(batch) / (time.perf_counter() - start)
+
+
+def main(events=20_000):
+    print(f'{"scenario":<10} {"plain/s":>11} {"off/s":>11} {"off call/s":>11} {"counts/s":>11} {"timed/s":>11} {"trace/s":>11}')
+    for name, options in SCENARIOS.items():
+        generator = QueryGenerator(seed=19, **options)
+        queries = generator.queries(10)
+        batch = generator.events(events // len(queries))
+
+        totals = [0.0] * 6
+        for query in queries:
+            ast = Parser(Scanner(query).lex()).parse()
+            disabled = Profiler(ast)
+            disabled.disable()
+            cases = [
+                Compiler(ast).compile(),
+                disabled.predicate,
+                disabled,
+                Profiler(ast, sample_every=None),
+                Profiler(ast, sample_every=16),
+                Profiler(ast).trace,
+            ]
+            for index, function in enumerate(cases):
+                totals[index] += 1 / rate(function, batch)
+
+        rates = [len(queries) / total for total in totals]
+        print(f'{name:<10} ' + ' '.join(f'{value:>11,.0f}' for value in rates))
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,94 @@
+'''
+Projected evaluation over raw JSON against `json.loads` followed by the compiled
+predicate, on Segment-like track payloads of about 5 and 20 KB.
+
+    python -m benchmarks.bench_projection [events]
+'''
+import json
+import random
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.compiler import ProjectedEvaluator
+
+QUERIES = [
+    'type = "track"',
+    'event = "Order Completed" and properties.revenue > 50',
+    'contains(context.page.url, "/checkout") or properties.currency = "EUR"',
+    'context.library.name = "analytics.js" and userId != null',
+]
+
+
+def make_payload(rng, products):
+    event = {
+        'anonymousId': f'{rng.getrandbits(128):032x}',
+        'type': 'track',
+        'channel': 'client',
+        'context': {
+            'ip': f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}',
+            'library': {'name': 'analytics.js', 'version': '4.1.0'},
+            'locale': 'en-US',
+            'page': {
+                'path': '/checkout/payment',
+                'referrer': 'https://www.google.com/',
+                'title': 'Checkout',
+                'url': f'https://shop.example.com/checkout/payment?session={rng.getrandbits(64):x}',
+            },
+            'userAgent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+            'campaign': {'name': 'spring', 'source': 'newsletter', 'medium': 'email'},
+        },
+        'event': rng.choice(['Order Completed', 'Product Viewed', 'Cart Viewed']),
+        'integrations': {'All': True},
+        'messageId': f'ajs-{rng.getrandbits(128):032x}',
+        'properties': {
+            'checkout_id': f'{rng.getrandbits(64):x}',
+            'currency': rng.choice(['USD', 'EUR']),
+            'products': [
+                {
+                    'product_id': f'{rng.getrandbits(48):x}',
+                    'sku': f'SKU-{index}',
+                    'name': f'Product number {index} with a long descriptive name',
+                    'price': round(rng.uniform(1, 200), 2),
+                    'quantity': rng.randint(1, 4),
+                    'category': 'Apparel',
+                    'url': f'https://shop.example.com/products/{index}',
+                    'image_url': f'https://cdn.example.com/products/{index}.jpg',
+                }
+                for index in range(products)
+            ],
+            'revenue': round(rng.uniform(0, 100), 2),
+        },
+        'receivedAt': '2024-05-01T12:00:00.000Z',
+        'timestamp': '2024-05-01T12:00:00.000Z',
+        'userId': rng.choice([None, f'user-{rng.randint(0, 1000)}']),
+    }
+    return json.dumps(event).encode()
+
+
+def main(event_count=5_000):
+    rng = random.Random(5)
+    for products in [15, 70]:
+        payloads = [make_payload(rng, products) for _ in range(event_count)]
+        size = sum(len(payload) for payload in payloads) / len(payloads)
+        print(f'payload of {size / 1024:.1f} KB')
+        print(f'  {"query":<75} {"json.loads ev/s":>16} {"projected ev/s":>15} {"speedup":>8}')
+        for query in QUERIES:
+            compiled = Filter(query)
+            projected = ProjectedEvaluator(compiled.ast)
+            predicate = compiled.predicate
+
+            start = time.perf_counter()
+            expected = [predicate(json.loads(payload)) for payload in payloads]
+            loads = time.perf_counter() - start
+
+            start = time.perf_counter()
+            found = [projected(payload) for payload in payloads]
+            elapsed = time.perf_counter() - start
+
+            assert found == expected
+            print(f'  {query:<75} {event_count / loads:>16,.0f} {event_count / elapsed:>15,.0f} {loads / elapsed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
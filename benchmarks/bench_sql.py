@@ -0,0 +1,48 @@
+'''
+Filtering events stored in SQLite: a `WHERE` clause from `SQLCompiler` against
+reading every row and running the compiled predicate in Python.
+
+    python -m benchmarks.bench_sql [rows]
+'''
+import json
+import random
+import sqlite3
+import sys
+import time
+
+from segment_fql import Filter
+from segment_fql.compiler import SQLCompiler
+from benchmarks.bench_columnar import make_events, QUERIES
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(rows=200_000):
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE events (payload TEXT)')
+    events = make_events(rows, random.Random(3))
+    connection.executemany('INSERT INTO events (payload) VALUES (?)', [(json.dumps(event),) for event in events])
+
+    print(f'{"query":<80} {"python rows/s":>14} {"sql rows/s":>12} {"matches":>8}')
+    for query in QUERIES:
+        compiled = Filter(query)
+        sql, params = SQLCompiler(compiled.ast).compile()
+
+        def in_python():
+            return [rowid for rowid, payload in connection.execute('SELECT rowid, payload FROM events') if compiled(json.loads(payload))]
+
+        def in_sql():
+            return [rowid for rowid, in connection.execute(f'SELECT rowid FROM events WHERE {sql}', params)]
+
+        expected, python = timed(in_python)
+        result, pushed = timed(in_sql)
+        assert result == expected
+        print(f'{query:<80} {rows / python:>14,.0f} {rows / pushed:>12,.0f} {len(result):>8,}')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+'''
+`afilter` throughput by batch size against the synchronous `Filter`, and the
+latency of events from a slow source, which only reach the consumer through
+`max_delay` flushes.
+
+    python -m benchmarks.bench_streaming [events]
+'''
+import asyncio
+import statistics
+import sys
+import time
+
+from segment_fql import Filter, afilter
+
+QUERY = 'event = "Order Completed" or match(properties.url, "https://*.com")'
+BATCH_SIZES = [1, 16, 64, 256, 1000]
+EVENTS = [
+    {'event': 'Order Completed', 'properties': {'url': 'https://shop.example.com'}},
+    {'event': 'Page Viewed', 'properties': {'url': 'https://docs.example.com'}},
+    {'event': 'Page Viewed', 'properties': {'url': 'https://example.org'}},
+    {'event': 'Signed Up'},
+]
+
+
+async def source_of(events, delay=None, produced=None):
+    for event in events:
+        if delay is not None:
+            await asyncio.sleep(delay)
+        if produced is not None:
+            produced.append(time.perf_counter())
+        yield event
+
+
+async def consume(stream):
+    count = 0
+    async for _ in stream:
+        count += 1
+    return count
+
+
+def latencies(count=20, delay=0.01, max_delay=0.005):
+    produced = []
+    found = []
+
+    async def main():
+        events = [{'event': 'Order Completed'}] * count
+        async for _ in afilter(QUERY, source_of(events, delay, produced), batch_size=1000, max_delay=max_delay):
+            found.append(time.perf_counter() - produced[len(found)])
+
+    asyncio.run(main())
+    return found
+
+
+def main(event_count=100_000):
+    events = (EVENTS * (event_count // len(EVENTS) + 1))[:event_count]
+    compiled = Filter(QUERY)
+    start = time.perf_counter()
+    expected = sum(1 for event in events if compiled(event))
+    synchronous = len(events) / (time.perf_counter() - start)
+
+    print(f'{"batch":>6} {"ev/s":>11} {"of sync":>8}')
+    print(f'{"sync":>6} {synchronous:>11,.0f} {1:>7.0%}')
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        found = asyncio.run(consume(afilter(QUERY, source_of(events), batch_size=batch_size, max_delay=None)))
+        rate = len(events) / (time.perf_counter() - start)
+        assert found == expected
+        print(f'{batch_size:>6} {rate:>11,.0f} {rate / synchronous:>7.0%}')
+
+    found = latencies()
+    print(f'slow source latency: p50 {statistics.median(found) * 1e3:.1f} ms, max {max(found) * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])
@@ -0,0 +1,56 @@
+'''
+Throughput of `match_many` and of concurrent `Filter` compilation at 1, 2, 4,
+... threads, up to the number of cores. Threads only scale on a free-threaded
+Python build; with the GIL, this shows the cost of the thread pool instead.
+
+    python -m benchmarks.bench_threads [filters] [events]
+'''
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from segment_fql import Filter, FilterSet, match_many
+from benchmarks.bench_filter_set import make_queries, make_events
+
+
+def thread_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != (os.cpu_count() or 1):
+        counts.append(os.cpu_count())
+    return counts
+
+
+def main(filter_count=1_000, event_count=20_000):
+    rng = random.Random(23)
+    queries = make_queries(filter_count, rng)
+    events = make_events(event_count, rng)
+    filters = FilterSet({filter_id: Filter(query).ast for filter_id, query in queries.items()})
+    expected = match_many(filters, events, workers=1)
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'cores: {os.cpu_count()}, GIL: {"enabled" if gil else "disabled"}')
+    print(f'{"threads":>8} {"match ev/s":>12} {"scaling":>8} {"compile q/s":>12} {"scaling":>8}')
+    base_match = base_compile = None
+    texts = list(queries.values())
+    for workers in thread_counts():
+        start = time.perf_counter()
+        found = match_many(filters, events, workers=workers)
+        match_rate = len(events) / (time.perf_counter() - start)
+        assert found == expected
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            list(pool.map(Filter, texts))
+            compile_rate = len(texts) / (time.perf_counter() - start)
+
+        base_match = base_match or match_rate
+        base_compile = base_compile or compile_rate
+        print(f'{workers:>8} {match_rate:>12,.0f} {match_rate / base_match:>7.2f}x {compile_rate:>12,.0f} {compile_rate / base_compile:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:3]])
@@ -0,0 +1,61 @@
+'''
+Validating 100k user-supplied queries, a fifth of them invalid: compiling each
+with `Filter` and catching exceptions, against `validate_many` in-process and
+in a process pool.
+
+    python -m benchmarks.bench_validation [queries] [workers]
+'''
+import os
+import random
+import sys
+import time
+
+from segment_fql import Filter, validate_many
+from benchmarks.generator import QueryGenerator
+
+
+def queries(count, seed=20):
+    rng = random.Random(seed)
+    valid = QueryGenerator(seed=seed, clauses=6, depth=1, function_ratio=0.2, list_size=3).queries(1000)
+    found = []
+    for index in range(count):
+        query = valid[index % len(valid)]
+        if rng.random() < 0.2:
+            position = rng.randrange(len(query))
+            query = query[:position] + rng.choice(['(', ')', ' and', '"', '#', ' 1.']) + query[position:]
+        found.append(query)
+    return found
+
+
+def compile_all(batch):
+    results = []
+    for query in batch:
+        try:
+            Filter(query)
+            results.append(True)
+        except Exception:
+            results.append(False)
+    return results
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(count=100_000, workers=None):
+    batch = queries(count)
+    workers = workers or os.cpu_count()
+
+    expected, elapsed = timed(lambda: compile_all(batch))
+    print(f'{"Filter + except":<22} {elapsed:>7.2f}s {count / elapsed:>11,.0f} queries/s  {expected.count(False):,} invalid')
+
+    for name, options in [('validate_many', {}), (f'validate_many x{workers}', {'workers': workers})]:
+        results, elapsed = timed(lambda: validate_many(batch, **options))
+        assert [result.valid for result in results] == expected
+        print(f'{name:<22} {elapsed:>7.2f}s {count / elapsed:>11,.0f} queries/s')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:3]])
@@ -0,0 +1,92 @@
+import random
+import string
+
+FUNCTIONS = ['contains', 'match']
+
+
+class QueryGenerator:
+    '''
+    Deterministic synthetic FQL queries, with matching events to evaluate them on.
+
+    `clauses` is the total number of conditions, `depth` how many `!(...)`
+    groupings are nested, `path_length` the number of segments in each field
+    path, `string_length` the length of string literals, `function_ratio` the
+    share of clauses using `contains`/`match`, and `list_size` the number of
+    values in list literals (0 for no lists).
+    '''
+
+    def __init__(self, clauses=5, depth=0, path_length=2, string_length=8, function_ratio=0.0, list_size=0, seed=0):
+        if clauses < depth + 1:
+            raise Exception(f'{depth} levels of grouping need at least {depth + 1} clauses')
+
+        self.clauses = clauses
+        self.depth = depth
+        self.path_length = path_length
+        self.string_length = string_length
+        self.function_ratio = function_ratio
+        self.list_size = list_size
+        self.random = random.Random(seed)
+        self.paths = [self._path(index) for index in range(16)]
+        self.strings = [self._string() for _ in range(12)]
+
+    def _path(self, index):
+        if self.path_length == 1:
+            return [f'field{index}']
+        middle = [f'level{level}' for level in range(1, self.path_length - 1)]
+        return ['properties'] + middle + [f'field{index}']
+
+    def _string(self):
+        return ''.join(self.random.choice(string.ascii_letters + ' ') for _ in range(self.string_length))
+
+    def _clause(self):
+        path = '.'.join(self.random.choice(self.paths))
+        roll = self.random.random()
+
+        if roll < self.function_ratio:
+            value = self.random.choice(self.strings)
+            if self.random.choice(FUNCTIONS) == 'contains':
+                return f'contains({path}, "{value[:max(1, len(value) // 2)]}")'
+            return f'match({path}, "{value[:max(1, len(value) // 2)]}*")'
+
+        if self.list_size and roll < self.function_ratio + (1 - self.function_ratio) / 4:
+            values = ', '.join(f'"{self.random.choice(self.strings)}"' for _ in range(self.list_size))
+            return f'{path} = [{values}]'
+
+        if self.random.random() < 0.25:
+            return f'{path} {self.random.choice([">", "<"])} {self.random.randint(0, 100)}'
+
+        return f'{path} {self.random.choice(["=", "=", "!="])} "{self.random.choice(self.strings)}"'
+
+    def _chain(self, count):
+        text = self._clause()
+        for _ in range(count - 1):
+            text += f' {self.random.choice(["and", "or"])} {self._clause()}'
+        return text
+
+    def query(self):
+        text = self._chain(self.clauses - self.depth)
+        for _ in range(self.depth):
+            text = f'{self._clause()} {self.random.choice(["and", "or"])} !({text})'
+        return text
+
+    def queries(self, count):
+        return [self.query() for _ in range(count)]
+
+    def event(self):
+        event = {'type': 'track', 'event': self.random.choice(self.strings)}
+        for path in self.paths:
+            if self.random.random() < 0.3:
+                continue
+
+            target = event
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+
+            if self.random.random() < 0.25:
+                target[path[-1]] = self.random.randint(0, 100)
+            else:
+                target[path[-1]] = self.random.choice(self.strings)
+        return event
+
+    def events(self, count):
+        return [self.event() for _ in range(count)]
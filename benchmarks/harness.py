@@ -0,0 +1,117 @@
+import json
+import platform
+import time
+import tracemalloc
+
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler
+from benchmarks.generator import QueryGenerator
+
+SCENARIOS = {
+    'small': {'clauses': 3},
+    'wide': {'clauses': 200},
+    'deep': {'clauses': 40, 'depth': 30},
+    'long-paths': {'clauses': 10, 'path_length': 8},
+    'long-strings': {'clauses': 10, 'string_length': 512},
+    'functions': {'clauses': 10, 'function_ratio': 0.5},
+    'lists': {'clauses': 10, 'list_size': 50},
+}
+
+STAGES = ['lex', 'parse', 'evaluate']
+
+# Tail latencies are reported but too noisy between runs to gate on.
+COMPARED_METRICS = ['ops_per_second', 'p50_us', 'peak_bytes']
+
+# Metrics where a bigger number is a regression; all others regress when they shrink.
+LOWER_IS_BETTER = ['p50_us', 'p90_us', 'p99_us', 'peak_bytes']
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(function, inputs):
+    '''Calls `function` once per input and reports throughput, latency percentiles and peak memory.'''
+    latencies = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for argument in inputs:
+        before = clock()
+        function(argument)
+        latencies.append(clock() - before)
+    elapsed = (clock() - start) / 1e9
+
+    # Memory is traced in a separate pass because tracemalloc slows every allocation down.
+    tracemalloc.start()
+    for argument in inputs:
+        function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'calls': len(inputs),
+        'ops_per_second': len(inputs) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(latencies, 0.50) / 1000,
+        'p90_us': percentile(latencies, 0.90) / 1000,
+        'p99_us': percentile(latencies, 0.99) / 1000,
+        'peak_bytes': peak,
+    }
+
+
+def run_scenario(settings, queries=200, events=2000, seed=0):
+    generator = QueryGenerator(seed=seed, **settings)
+    texts = generator.queries(queries)
+    tokens = [Scanner(text).lex() for text in texts]
+    predicates = [Compiler(Parser(list(query_tokens)).parse()).compile() for query_tokens in tokens]
+    samples = generator.events(events)
+    pairs = [(predicates[index % len(predicates)], event) for index, event in enumerate(samples)]
+
+    return {
+        'lex': measure(lambda text: Scanner(text).lex(), texts),
+        'parse': measure(lambda query_tokens: Parser(query_tokens).parse(), tokens),
+        'evaluate': measure(lambda pair: pair[0](pair[1]), pairs),
+    }
+
+
+def run(names=None, quick=False):
+    names = names or list(SCENARIOS)
+    queries, events = (20, 500) if quick else (200, 20000)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'scenarios': {name: run_scenario(SCENARIOS[name], queries, events) for name in names},
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    '''Lists every metric that is more than `threshold` (a fraction) worse than in `baseline`.'''
+    regressions = []
+    for name, stages in results['scenarios'].items():
+        for stage, metrics in stages.items():
+            previous = baseline.get('scenarios', {}).get(name, {}).get(stage)
+            if not previous:
+                continue
+
+            for metric in COMPARED_METRICS:
+                value, reference = metrics.get(metric), previous.get(metric)
+                if not reference or value is None:
+                    continue
+
+                change = (value - reference) / reference
+                if metric not in LOWER_IS_BETTER:
+                    change = -change
+                if change > threshold:
+                    regressions.append(f'{name}/{stage} {metric}: {reference:.6g} -> {value:.6g} ({change:+.0%} worse)')
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
@@ -0,0 +1,6 @@
+from segment_fql.lexer.lexer import Lexer
+from segment_fql.lexer.token import Token
+from segment_fql.lexer.token_type import TokenType
+from segment_fql.filter import Filter, FilterSet, FilterCache, ResidualCache, get_filter, configure_filter_cache, filter_cache_info, afilter, FilterArtifact, match_many
+from segment_fql.functions import register_function
+from segment_fql.validation import validate, validate_many
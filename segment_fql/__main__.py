@@ -0,0 +1,5 @@
+import sys
+
+from segment_fql.cli import main
+
+sys.exit(main())
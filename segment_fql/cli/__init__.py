@@ -0,0 +1,21 @@
+import argparse
+import sys
+
+from segment_fql.cli import filter_command
+
+
+def main(arguments=None, stdin=None, stdout=None, stderr=None):
+    parser = argparse.ArgumentParser(prog='python -m segment_fql', description='Segment FQL tools.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    filter_command.add_arguments(commands.add_parser('filter', help='print the NDJSON events matching a query'))
+    options = parser.parse_args(arguments)
+
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr
+
+    try:
+        return filter_command.command(options, stdin, stdout, stderr)
+    except Exception as error:
+        stderr.write(f'error: {error}\n')
+        return 1
@@ -0,0 +1,133 @@
+import json
+import mmap
+import multiprocessing
+import os
+import time
+
+from segment_fql.filter import Filter
+
+# Set in each worker process by `_start_worker`, so the query is compiled once per process.
+worker_filter = None
+
+
+def _start_worker(query):
+    global worker_filter
+    worker_filter = Filter(query)
+
+
+def file_chunks(path, chunk_size):
+    '''`(path, start, end)` byte ranges of roughly `chunk_size`, each ending on a line boundary.'''
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+
+    with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                newline = mapped.find(b'\n', end - 1)
+                end = size if newline == -1 else newline + 1
+            yield path, start, end
+            start = end
+
+
+def stream_chunks(stream, chunk_size):
+    '''Line-aligned blocks of about `chunk_size` bytes read from a binary stream.'''
+    while True:
+        lines = stream.readlines(chunk_size)
+        if not lines:
+            return
+        yield b''.join(lines)
+
+
+def filter_lines(data):
+    '''Returns `(matching lines, events, matches, errors)` for a block of NDJSON.'''
+    matched = []
+    events = errors = 0
+    for line in data.splitlines(keepends=True):
+        if not line.strip():
+            continue
+
+        events += 1
+        try:
+            event = json.loads(line)
+        except ValueError:
+            errors += 1
+            continue
+
+        if isinstance(event, dict) and worker_filter(event):
+            matched.append(line if line.endswith(b'\n') else line + b'\n')
+
+    return b''.join(matched), events, len(matched), errors
+
+
+def filter_chunk(chunk):
+    if isinstance(chunk, bytes):
+        return filter_lines(chunk)
+
+    path, start, end = chunk
+    with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return filter_lines(mapped[start:end])
+
+
+def run_filter(query, paths, stdin, stdout, workers=None, chunk_size=4 * 1024 * 1024, ordered=True):
+    '''
+    Writes the NDJSON lines of `paths` (or `stdin`) that match `query` to `stdout`
+    and returns `(events, matches, errors)`. With `workers` above 1, chunks are
+    evaluated in a process pool; `ordered=False` writes results as chunks finish.
+    '''
+    Filter(query)  # Fail early, in this process, on invalid queries.
+
+    if paths:
+        chunks = (chunk for path in paths for chunk in file_chunks(path, chunk_size))
+    else:
+        chunks = stream_chunks(stdin, chunk_size)
+
+    events = matches = errors = 0
+
+    def consume(results):
+        nonlocal events, matches, errors
+        for data, chunk_events, chunk_matches, chunk_errors in results:
+            stdout.write(data)
+            events += chunk_events
+            matches += chunk_matches
+            errors += chunk_errors
+
+    if workers == 1:
+        _start_worker(query)
+        consume(map(filter_chunk, chunks))
+    else:
+        with multiprocessing.Pool(workers, initializer=_start_worker, initargs=(query,)) as pool:
+            mapper = pool.imap if ordered else pool.imap_unordered
+            consume(mapper(filter_chunk, chunks))
+
+    stdout.flush()
+    return events, matches, errors
+
+
+def add_arguments(parser):
+    parser.add_argument('query', help='FQL query')
+    parser.add_argument('files', nargs='*', help='NDJSON files (default: standard input)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: one per CPU; 1 runs in-process)')
+    parser.add_argument('--chunk-size', type=int, default=4 * 1024 * 1024, help='bytes per work unit (default: 4 MiB)')
+    parser.add_argument('--unordered', action='store_true', help='write matches as soon as a chunk finishes')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not print the summary')
+
+
+def command(options, stdin, stdout, stderr):
+    start = time.perf_counter()
+    events, matches, errors = run_filter(
+        options.query, options.files, stdin, stdout,
+        workers=options.workers, chunk_size=options.chunk_size, ordered=not options.unordered
+    )
+    elapsed = time.perf_counter() - start
+
+    if not options.quiet:
+        rate = matches / events if events else 0.0
+        speed = events / elapsed if elapsed else 0.0
+        stderr.write(
+            f'{events} events, {matches} matched ({rate:.2%}), {errors} invalid, '
+            f'{elapsed:.2f}s, {speed:,.0f} events/s\n'
+        )
+    return 0
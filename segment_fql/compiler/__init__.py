@@ -0,0 +1,12 @@
+from segment_fql.compiler.compiler import Compiler
+from segment_fql.compiler.interpreter import Interpreter
+from segment_fql.compiler.dag import PredicateDAG
+from segment_fql.compiler.adaptive import AdaptiveFilter
+from segment_fql.compiler.memo import MemoizedFilter
+from segment_fql.compiler.columnar import ColumnarEvaluator, columns_from_events
+from segment_fql.compiler.projection import ProjectedEvaluator
+from segment_fql.compiler.optimizer import Optimizer
+from segment_fql.compiler.partial import PartialEvaluator, Residual
+from segment_fql.compiler.sql import SQLCompiler, SQLDialect, SQLiteDialect
+from segment_fql.compiler.profiler import Profiler
+from segment_fql.compiler.analysis import FilterAnalysis
@@ -0,0 +1,237 @@
+import time
+
+from segment_fql.lexer.shared_tokens import RESERVED_KEYWORDS
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+
+
+class Operand:
+    '''Statistics shared by every part of a plan: how often it ran, was true, and what it cost.'''
+
+    def __init__(self, key):
+        self.key = key
+        self.evaluations = 0
+        self.matches = 0
+        self.nanoseconds = 0
+        self.samples = 0
+
+    def probability(self):
+        return self.matches / self.evaluations if self.evaluations else 0.5
+
+    def cost(self):
+        return self.nanoseconds / self.samples if self.samples else None
+
+    def stats(self):
+        return {
+            'evaluations': self.evaluations,
+            'matches': self.matches,
+            'nanoseconds': self.nanoseconds,
+            'samples': self.samples,
+        }
+
+    def load(self, stats):
+        self.evaluations = stats['evaluations']
+        self.matches = stats['matches']
+        self.nanoseconds = stats['nanoseconds']
+        self.samples = stats['samples']
+
+    def walk(self):
+        yield self
+
+
+class Clause(Operand):
+    '''A condition, function call or bare value, compiled as-is.'''
+
+    def __init__(self, key, node):
+        super().__init__(key)
+        self.node = node
+        self.predicate = Compiler(node).compile()
+
+    def run(self, event, sample_every):
+        return self.predicate(event)
+
+    def to_ast(self):
+        return self.node
+
+
+class Negation(Operand):
+    '''`!(...)`: the grouped statement is itself an adaptive chain.'''
+
+    def __init__(self, key, chain):
+        super().__init__(key)
+        self.chain = chain
+
+    def run(self, event, sample_every):
+        return not self.chain.evaluate(event, sample_every)
+
+    def to_ast(self):
+        return ASTNode(ASTType.NOT, [ASTNode(ASTType.GROUPING, [self.chain.to_statement()])])
+
+    def walk(self):
+        yield self
+        yield from self.chain.walk()
+
+    def reorder(self):
+        self.chain.reorder()
+
+
+class Chain(Operand):
+    '''
+    Operands joined by one connector. FQL operands have no side effects, so any
+    order gives the same result; only the cost of short-circuiting changes.
+    '''
+
+    def __init__(self, key, connector, operands):
+        super().__init__(key)
+        self.connector = connector
+        self.operands = operands
+
+    def run(self, event, sample_every):
+        return self.evaluate(event, sample_every)
+
+    def evaluate(self, event, sample_every):
+        stop_on = self.connector == 'or'
+        for operand in self.operands:
+            operand.evaluations += 1
+            if operand.evaluations % sample_every:
+                result = operand.run(event, sample_every)
+            else:
+                start = time.perf_counter_ns()
+                result = operand.run(event, sample_every)
+                operand.nanoseconds += time.perf_counter_ns() - start
+                operand.samples += 1
+
+            if result:
+                operand.matches += 1
+            if bool(result) == stop_on:
+                return stop_on
+        return not stop_on
+
+    def reorder(self):
+        for operand in self.operands:
+            if hasattr(operand, 'reorder'):
+                operand.reorder()
+
+        known = [operand.cost() for operand in self.operands if operand.cost() is not None]
+        default_cost = sum(known) / len(known) if known else 1.0
+
+        def rank(operand):
+            # Expected cost paid per short-circuit: cheap operands that usually decide the chain go first.
+            cost = operand.cost()
+            decides = operand.probability() if self.connector == 'or' else 1 - operand.probability()
+            return (cost if cost is not None else default_cost) / max(decides, 1e-6)
+
+        self.operands.sort(key=rank)
+
+    def walk(self):
+        yield self
+        for operand in self.operands:
+            yield from operand.walk()
+
+    def to_ast(self):
+        return self.to_statement()
+
+    def to_statement(self):
+        '''
+        A right-nested `statement` in the current order. Nested `and` chains are
+        written inline: `and` binds tighter than `or`, so no grouping is needed.
+        '''
+        pieces = []
+        for operand in self.operands:
+            parts = operand.pieces() if isinstance(operand, Chain) else [operand.to_ast()]
+            if pieces:
+                pieces.append(RESERVED_KEYWORDS[self.connector])
+            pieces.extend(parts)
+
+        node = ASTNode(ASTType.STATEMENT, [pieces[-1]])
+        for index in range(len(pieces) - 3, -1, -2):
+            node = ASTNode(ASTType.STATEMENT, [pieces[index], pieces[index + 1], node])
+        return node
+
+    def pieces(self):
+        pieces = []
+        for operand in self.operands:
+            if pieces:
+                pieces.append(RESERVED_KEYWORDS[self.connector])
+            pieces.append(operand.to_ast())
+        return pieces
+
+
+class AdaptiveFilter:
+    '''
+    Evaluates a filter while recording, for every operand of every `and`/`or`
+    chain, how often it is true and (on a sample of evaluations) how long it
+    takes. Every `reorder_every` events, operands are reordered so the cheapest
+    and most decisive ones run first. Results never change.
+
+    `export_stats()` returns a JSON-serializable snapshot, and `load_stats()`
+    restores it (including the learned order) after a restart.
+    '''
+
+    def __init__(self, ast, reorder_every=10000, sample_every=16):
+        self.reorder_every = reorder_every
+        self.sample_every = sample_every
+        self.events = 0
+        self.plan = self._chain('', semantics.root_statement(ast))
+
+    def __call__(self, event):
+        self.events += 1
+        if self.events % self.reorder_every == 0:
+            self.plan.reorder()
+        return self.plan.evaluate(event, self.sample_every)
+
+    def reorder(self):
+        self.plan.reorder()
+
+    def compile(self):
+        '''A plain compiled predicate for the current order, without the bookkeeping.'''
+        return Compiler(self.to_ast()).compile()
+
+    def to_ast(self):
+        return ASTNode(ASTType.ROOT, [self.plan.to_statement()])
+
+    def export_stats(self):
+        parts = list(self.plan.walk())
+        return {
+            'version': 1,
+            'events': self.events,
+            'operands': {part.key: part.stats() for part in parts},
+            'order': {
+                part.key: [operand.key for operand in part.operands]
+                for part in parts if isinstance(part, Chain)
+            },
+        }
+
+    def load_stats(self, stats):
+        if stats.get('version') != 1:
+            raise Exception(f'Unsupported statistics version: {stats.get("version")}')
+
+        parts = {part.key: part for part in self.plan.walk()}
+        if set(parts) != set(stats['operands']):
+            raise Exception('Statistics were recorded for a different filter')
+        for key, order in stats['order'].items():
+            # Each order must be a permutation of that chain's own operands, or results would change.
+            chain = parts.get(key)
+            if not isinstance(chain, Chain) or sorted(order) != sorted(operand.key for operand in chain.operands):
+                raise Exception('Statistics were recorded for a different filter')
+
+        self.events = stats['events']
+        for key, values in stats['operands'].items():
+            parts[key].load(values)
+        for key, order in stats['order'].items():
+            parts[key].operands = [parts[operand_key] for operand_key in order]
+
+    def _chain(self, key, statement):
+        groups = []
+        for group_index, group in enumerate(semantics.disjunction(statement)):
+            group_key = f'{key}/{group_index}'
+            operands = [self._operand(f'{group_key}/{index}', operand) for index, operand in enumerate(group)]
+            groups.append(Chain(group_key, 'and', operands))
+        return Chain(key or '/', 'or', groups)
+
+    def _operand(self, key, node):
+        if isinstance(node, ASTNode) and node.type == ASTType.NOT:
+            grouping = node.children[0]
+            return Negation(key, self._chain(f'{key}/!', grouping.children[0]))
+        return Clause(key, node)
@@ -0,0 +1,960 @@
+import bisect
+import itertools
+
+from segment_fql.lexer import TokenType
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+from segment_fql.compiler.optimizer import Optimizer, node_key
+
+# Values every field is tried with, besides those derived from the conditions on it.
+OTHER_VALUES = [None, True, False, [], [0]]
+MIRRORED = {'=': '=', '!=': '!=', '>': '<', '<': '>', '>=': '<=', '<=': '>='}
+# The ends of the number and string lines, as cuts (see `Region`).
+BELOW, ABOVE = (0,), (2,)
+# About how many filter ids a `RegionIndex` collects at once (see `stabbed`).
+LOOKUP_BATCH = 1 << 20
+
+
+def value_key(value):
+    '''A hashable key in which booleans never equal numbers, as in FQL.'''
+    if value is None:
+        return ('null',)
+    if value is True or value is False:
+        return ('bool', value)
+    if semantics.is_number(value):
+        return ('number', value)
+    return ('string', value)
+
+
+def literal(node):
+    '''`(True, value)` for literal tokens, `true`-like paths and lists (as a `ValueSet`).'''
+    if isinstance(node, ASTNode):
+        if node.type == ASTType.LIST:
+            return True, semantics.list_value(node)
+        if node.type == ASTType.PATH:
+            return semantics.path_literal(node)
+        return False, None
+    return semantics.literal_value(node)
+
+
+def field(node):
+    '''Path keys of a field reference, or `None`.'''
+    if isinstance(node, ASTNode):
+        if node.type == ASTType.EXPR:
+            return field(node.children[0])
+        if node.type != ASTType.PATH or semantics.path_literal(node)[0]:
+            return None
+        return tuple(semantics.path_keys(node))
+    if node.type != TokenType.Ident or semantics.literal_value(node)[0]:
+        return None
+    return (node.value,)
+
+
+def field_condition(node):
+    '''`(path, operator, value)` for a field compared with a literal, with the field on the left; else `None`.'''
+    left, operator, right = node.children
+    path, (is_literal, value) = field(left), literal(right)
+    operator = operator.value
+    if path is None:
+        path, (is_literal, value) = field(right), literal(left)
+        operator = MIRRORED.get(operator, operator)
+    if path is None or not is_literal:
+        return None
+    return path, operator, value
+
+
+def values_of(value):
+    if type(value) is semantics.ValueSet:
+        return list(value)
+    return [value]
+
+
+class Atom:
+    '''
+    A leaf of a normal form: a condition, function call or field truthiness.
+    It is exact when its result only depends on the value of one `path`
+    through `=`, `!=`, ordering against literals or truthiness; other atoms
+    (functions, field against field) are treated as free booleans.
+    '''
+
+    def __init__(self, key, node):
+        self.key = key
+        self.node = node
+        self.predicate = Compiler(node).compile()
+        self.paths = [tuple(path) for path in semantics.query_paths(node)]
+        self.path = None
+        self.operator = None
+        self.constants = []
+        self.hints = []
+        self._classify(node)
+
+    def _classify(self, node):
+        if node.type == ASTType.CONDITIONAL:
+            condition = field_condition(node)
+            if condition is not None:
+                self.path, self.operator, value = condition
+                self.constants = values_of(value)
+            return
+
+        function = node.children[0] if node.type == ASTType.EXPR else node
+        if isinstance(function, ASTNode) and function.type == ASTType.FUNC:
+            # Strings likely to satisfy the call, tried when looking for real counterexamples.
+            subject, pattern = field(function.children[1]), function.children[2].children[0]
+            if subject is not None and pattern.type == TokenType.String:
+                self.hints = [(subject, pattern.value.replace('*', '').replace('?', '_'))]
+            return
+
+        path = field(node)
+        if path is not None:
+            self.path = path
+            self.operator = 'truthy'
+
+
+class Formula:
+    '''A filter in normal form, with the atoms it uses and some events it matches.'''
+
+    def __init__(self, filter_id, ast, atoms):
+        self.filter_id = filter_id
+        self.predicate = Compiler(ast).compile()
+        self.atoms = {}
+        self.form = self._form(Optimizer(ast).normal_form(), atoms)
+        self.key = form_key(self.form)
+        self.paths = frozenset(path for atom in self.atoms.values() for path in atom.paths)
+        self.facts = self._facts()
+        self.conjunctive = len(self.form) == 1 and all(kind == 'atom' for kind, _ in self.form[0])
+        self.witnesses = []
+        # Set by `FilterAnalysis`, for filters whose atoms are all exact: see `FilterAnalysis._profile`.
+        self.regions = None
+        self.matchable = None
+        self.tautology = None
+        self.signature = None
+
+    def _form(self, form, atoms):
+        '''The optimizer's form with leaves replaced by shared `Atom`s.'''
+        converted = []
+        for group in form:
+            items = []
+            for kind, value in group:
+                if kind == 'leaf':
+                    key = atom_key(value)
+                    atom = atoms.get(key)
+                    if atom is None:
+                        atom = atoms[key] = Atom(key, value)
+                    self.atoms[key] = atom
+                    items.append(('atom', atom))
+                else:
+                    items.append((kind, self._form(value, atoms)))
+            converted.append(items)
+        return converted
+
+    def _facts(self):
+        '''`{path: frozenset of value keys}` for paths that every `or` branch requires to equal a literal.'''
+        facts = None
+        for group in self.form:
+            allowed = {}
+            for kind, atom in group:
+                if kind == 'atom' and atom.operator == '=':
+                    values = frozenset(value_key(value) for value in atom.constants)
+                    allowed[atom.path] = allowed[atom.path] & values if atom.path in allowed else values
+            if facts is None:
+                facts = allowed
+            else:
+                facts = {path: facts[path] | values for path, values in allowed.items() if path in facts}
+        return facts or {}
+
+
+def atom_key(node):
+    '''Equal keys for conditions that only differ in operand order, number spelling or list order.'''
+    condition = field_condition(node) if isinstance(node, ASTNode) and node.type == ASTType.CONDITIONAL else None
+    if condition is not None:
+        path, operator, value = condition
+        values = frozenset(value_key(member) for member in values_of(value))
+        if operator in ['=', '!='] or type(value) is semantics.ValueSet:
+            # `a = 1` and `a = [1]` match the same events.
+            return ('condition', path, operator, values)
+        return ('condition', path, operator, next(iter(values)))
+    path = field(node)
+    if path is not None:
+        return ('truthy', path)
+    return node_key(node)
+
+
+def form_key(form):
+    '''A hashable key of a normal form, independent of the order of `and` and `or` operands.'''
+    return frozenset(
+        frozenset(value.key if kind == 'atom' else (kind, form_key(value)) for kind, value in group)
+        for group in form
+    )
+
+
+def evaluate(form, truth):
+    for group in form:
+        for kind, value in group:
+            if kind == 'atom':
+                result = truth[value.key]
+            elif kind == 'not':
+                result = not evaluate(value, truth)
+            else:
+                result = evaluate(value, truth)
+            if not result:
+                break
+        else:
+            return True
+    return False
+
+
+def form_atoms(form, found):
+    for group in form:
+        for kind, value in group:
+            if kind == 'atom':
+                found[value.key] = value
+            else:
+                form_atoms(value, found)
+    return found
+
+
+def domain(atoms):
+    '''
+    Values to try for one path: together they give every combination of
+    results the exact `atoms` can have, e.g. for `x > 1 and x != 5` a value
+    below 1, 1, between 1 and 5, 5 and above 5, plus 0, null, booleans, an empty
+    string and lists.
+
+    Returns the values and, for each, the cell of values it stands for:
+    `(line, start, end)` with the cuts around an interval of numbers or
+    strings, or `('other', index, index)` for `OTHER_VALUES[index]`.
+    '''
+    numbers = {0}
+    strings = {''}
+    for atom in atoms:
+        for value in atom.constants:
+            if semantics.is_number(value):
+                numbers.add(value)
+            elif type(value) is str:
+                strings.add(value)
+        for _, hint in atom.hints:
+            strings.add(hint)
+
+    numbers = sorted(numbers)
+    values = list(numbers)
+    cells = [('number', (1, number, 0), (1, number, 1)) for number in numbers]
+    for low, high in zip(numbers, numbers[1:]):
+        values.append((low + high) / 2)
+        cells.append(('number', (1, low, 1), (1, high, 0)))
+    values += [numbers[0] - 1, numbers[-1] + 1]
+    cells += [('number', BELOW, (1, numbers[0], 0)), ('number', (1, numbers[-1], 1), ABOVE)]
+
+    strings = sorted(strings)
+    values += strings
+    # The string right after `value` is `value + '\0'`, so cuts just above a string are written as cuts below that one.
+    cells += [('string', (1, value, 0), (1, value + '\0', 0)) for value in strings]
+    for index, value in enumerate(strings):
+        # A string just above `value`, when one fits before the next.
+        above = value + '\0'
+        if index + 1 == len(strings) or above < strings[index + 1]:
+            values.append(above)
+            cells.append(('string', (1, above, 0), (1, strings[index + 1], 0) if index + 1 < len(strings) else ABOVE))
+    values += OTHER_VALUES
+    cells += [('other', index, index) for index in range(len(OTHER_VALUES))]
+    return values, cells
+
+
+class Region:
+    '''
+    A set of values of one field, built from cells of `domain()`: maximal
+    intervals of numbers and of strings as `(start, end)` pairs of cuts, and
+    indexes of `OTHER_VALUES`. A cut `(1, value, 0)` lies just below `value`,
+    `(1, value, 1)` just above it; `BELOW` and `ABOVE` are the ends of a line.
+    Equal sets have equal `key`s.
+    '''
+
+    def __init__(self, cells):
+        intervals = {'number': [], 'string': []}
+        others = set()
+        for line, start, end in cells:
+            if line == 'other':
+                others.add(start)
+            else:
+                intervals[line].append((start, end))
+
+        self.numbers = merge(intervals['number'])
+        self.strings = merge(intervals['string'])
+        self.others = frozenset(others)
+        self.starts = {'number': [start for start, _ in self.numbers], 'string': [start for start, _ in self.strings]}
+        self.key = (tuple(self.numbers), tuple(self.strings), self.others)
+
+    def lines(self):
+        return [('number', self.numbers), ('string', self.strings)]
+
+    def covers(self, other):
+        '''Whether every value of region `other` is in this one.'''
+        if not other.others <= self.others:
+            return False
+        for line, intervals in other.lines():
+            starts = self.starts[line]
+            own = self.numbers if line == 'number' else self.strings
+            for start, end in intervals:
+                position = bisect.bisect_right(starts, start) - 1
+                if position < 0 or own[position][1] < end:
+                    return False
+        return True
+
+
+def merge(intervals):
+    '''Joins adjacent `(start, end)` intervals of disjoint cells.'''
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+NOWHERE = Region([])
+
+
+def region(cells, selected):
+    '''The `Region` of the `cells` whose flag in `selected` is set.'''
+    cells = [cell for cell, flag in zip(cells, selected) if flag]
+    return Region(cells) if cells else NOWHERE
+
+
+def nested(paths):
+    return any(other != path and other[:len(path)] == path for path in paths for other in paths)
+
+
+def event_with(assignments):
+    '''An event with each `(path, value)` set, creating the objects on the way.'''
+    event = {}
+    for path, value in assignments:
+        target = event
+        for key in path[:-1]:
+            inner = target.get(key)
+            if not isinstance(inner, dict):
+                inner = target[key] = {}
+            target = inner
+        target[path[-1]] = value
+    return event
+
+
+class Worlds:
+    '''
+    The combinations of values and free booleans that decide the atoms of some
+    formulas. Exact atoms are evaluated on one value per path; atoms whose path
+    is a prefix of another path also become free booleans, since objects and
+    their fields are not independent.
+    '''
+
+    def __init__(self, atoms):
+        paths = set(path for atom in atoms for path in atom.paths)
+        exact = {}
+        self.opaque = []
+        for atom in atoms:
+            nested = atom.path is not None and any(other != atom.path and other[:len(atom.path)] == atom.path for other in paths)
+            if atom.path is None or nested:
+                self.opaque.append(atom)
+            else:
+                exact.setdefault(atom.path, []).append(atom)
+
+        self.paths = list(exact)
+        self.values = []
+        self.cells = []
+        # Per exact atom: its path's index and its result for each value of the path.
+        self.tables = {}
+        hints = [atom for atom in self.opaque if atom.hints]
+        for index, path in enumerate(self.paths):
+            values, cells = domain(exact[path] + [atom for atom in hints if atom.hints[0][0] == path])
+            self.values.append(values)
+            self.cells.append(cells)
+            for atom in exact[path]:
+                self.tables[atom.key] = (index, [bool(atom.predicate(event_with([(path, value)]))) for value in values])
+
+    def choices(self, required):
+        '''Indexes of values per path that satisfy the `required` exact atoms.'''
+        choices = [range(len(values)) for values in self.values]
+        for atom in required:
+            table = self.tables.get(atom.key)
+            if table is not None:
+                index, results = table
+                choices[index] = [choice for choice in choices[index] if results[choice]]
+        return choices
+
+    def truth(self, combination):
+        return {key: results[combination[index]] for key, (index, results) in self.tables.items()}
+
+    def event(self, combination, truth):
+        '''
+        A real event for `combination`, where fields only read by functions are
+        set to the hints of the calls that `truth` wants to match.
+        '''
+        assignments = [(path, self.values[index][choice]) for index, (path, choice) in enumerate(zip(self.paths, combination))]
+        assigned = set(self.paths)
+        for atom in self.opaque:
+            for path, hint in atom.hints:
+                if truth[atom.key] and path not in assigned:
+                    assigned.add(path)
+                    assignments.append((path, hint))
+        return event_with(assignments)
+
+
+def size(choices, free):
+    count = 2 ** free
+    for values in choices:
+        count *= len(values)
+    return count
+
+
+class FilterAnalysis:
+    '''
+    Finds filters that are equivalent to, or implied by, other filters, e.g.
+    `event = "A" and properties.x = 1` implies `event = "A"`:
+
+        analysis = FilterAnalysis({'a': Filter(query).ast, ...})
+        analysis.duplicates()    # [['a', 'c'], ...], equivalent filters
+        analysis.implications()  # [('b', 'a'), ...]: whenever `b` matches, `a` does
+
+    Filters are normalized with `Optimizer.normal_form()` and keyed so that
+    filters differing only in operand order, spelling of numbers or list order
+    share a key. Implication is decided by evaluating both filters for every
+    combination of the values that matter to their conditions; functions and
+    field-against-field comparisons are treated as free booleans, so a pair can
+    be undecided (`None`), e.g. `contains(a, "xy")` and `contains(a, "x")`.
+    Pairs needing more than `MAXIMUM_WORLDS` combinations are undecided too.
+
+    Pairs are not compared blindly. Filters whose conditions only compare
+    paths with literals get regions: per path, the intervals of values with
+    which they never, and always, match. Filters with equal keys are
+    equivalent; beyond that, only filters reading the same paths with the same
+    regions are compared, after splitting them by their results on events
+    known to match some of them. A filter is only tested as the weaker side
+    against filters that read every path it reads and that, on each path where
+    it requires `path = value`, require some of the same values; candidates
+    are also looked up in an index of the regions, so `x != 1` and `x != 2` are
+    never paired, and between `and`-only filters the regions decide. So
+    `q = 2` implying `p = 1 or q = 2` is not reported. Other candidates are
+    mostly rejected by events known to match the stronger filter. At most
+    `MAXIMUM_COMPARISONS` pairs are enumerated per weaker filter, and per group
+    of filters with the same paths; pairs past it are undecided and counted in
+    `unchecked`.
+    '''
+
+    def __init__(self, filters=None):
+        self.MAXIMUM_WORLDS = 4096
+        self.MAXIMUM_WITNESSES = 4
+        self.MAXIMUM_COMPARISONS = 1000
+        self.atoms = {}
+        self.formulas = {}
+        self.by_path = {}
+        self.by_fact = {}
+        self.unprofiled = {}
+        self.unchecked = 0
+        for filter_id, ast in (filters.items() if isinstance(filters, dict) else filters or []):
+            self.add(filter_id, ast)
+
+    def __len__(self):
+        return len(self.formulas)
+
+    def add(self, filter_id, ast):
+        if filter_id in self.formulas:
+            raise Exception(f'Duplicate filter id: {filter_id}')
+        formula = self.formulas[filter_id] = Formula(filter_id, ast, self.atoms)
+        worlds = Worlds(list(formula.atoms.values()))
+        formula.witnesses = self._witnesses(formula, worlds)
+        self._profile(formula, worlds)
+        for path in formula.paths:
+            self.by_path.setdefault(path, set()).add(filter_id)
+            if formula.regions is None:
+                self.unprofiled.setdefault(path, set()).add(filter_id)
+        for path, values in formula.facts.items():
+            for value in values:
+                self.by_fact.setdefault((path, value), set()).add(filter_id)
+
+    def canonical_key(self, filter_id):
+        return self.formulas[filter_id].key
+
+    def implies(self, stronger, weaker):
+        '''Whether every event matching filter `stronger` matches `weaker`: `True`, `False` or `None` if undecided.'''
+        return self._implies(self.formulas[stronger], self.formulas[weaker])
+
+    def equivalent(self, first, second):
+        return both(self.implies(first, second), lambda: self.implies(second, first))
+
+    def never_matches(self, filter_id):
+        '''Whether no event can match the filter: `True`, `False` or `None` if undecided.'''
+        formula = self.formulas[filter_id]
+        if formula.regions is not None:
+            return not formula.matchable
+        return self._implies(formula, NEVER)
+
+    def duplicates(self):
+        '''Groups of two or more equivalent filter ids, each in insertion order.'''
+        self.unchecked = 0
+        return [group for group in self._classes() if len(group) > 1]
+
+    def implications(self):
+        '''
+        `(stronger, weaker)` pairs where `stronger` implies `weaker` but they are
+        not equivalent. Equivalent filters are represented by the first of
+        their group; when `weaker` does not match an event, neither does `stronger`.
+        Filters that never match imply every filter and are left out.
+        '''
+        self.unchecked = 0
+        classes = self._classes()
+        representatives = set(group[0] for group in classes if self.never_matches(group[0]) is not True)
+        # Only filters that never match imply those that never match.
+        weakers = [group[0] for group in classes if group[0] in representatives]
+        stabbed = self._stab(weakers, representatives)
+        found = []
+        for weaker in weakers:
+            budget = self.MAXIMUM_COMPARISONS
+            for stronger in self._candidates(weaker, stabbed.get(weaker)):
+                if stronger not in representatives or stronger == weaker:
+                    continue
+                result = self._by_regions(self.formulas[stronger], self.formulas[weaker])
+                if result is None:
+                    if not budget:
+                        self.unchecked += 1
+                        continue
+                    budget -= 1
+                    result = self.implies(stronger, weaker)
+                if result is True:
+                    found.append((stronger, weaker))
+        order = {filter_id: index for index, filter_id in enumerate(self.formulas)}
+        return sorted(found, key=lambda pair: (order[pair[1]], order[pair[0]]))
+
+    def _classes(self):
+        '''Equivalence classes: filters with equal keys, merged with proven equivalent filters of the same paths.'''
+        by_key = {}
+        for filter_id, formula in self.formulas.items():
+            by_key.setdefault(formula.key, []).append(filter_id)
+
+        by_paths = {}
+        for group in by_key.values():
+            formula = self.formulas[group[0]]
+            by_paths.setdefault((formula.paths, formula.signature), []).append(group)
+
+        classes = []
+        for groups in by_paths.values():
+            budget = self.MAXIMUM_COMPARISONS
+            for part in self._split(groups):
+                merged = []
+                for group in part:
+                    target = None
+                    compared = 0
+                    for existing in merged[:budget]:
+                        compared += 1
+                        if self.equivalent(existing[0], group[0]) is True:
+                            target = existing
+                            break
+                    budget -= compared
+                    if target is not None:
+                        target.extend(group)
+                        continue
+                    # Pairs past the budget are unknown, so the group stays apart from them.
+                    self.unchecked += len(merged) - compared
+                    merged.append(list(group))
+                classes.extend(merged)
+
+        order = {filter_id: index for index, filter_id in enumerate(self.formulas)}
+        classes = [sorted(group, key=order.get) for group in classes]
+        return sorted(classes, key=lambda group: order[group[0]])
+
+    def _split(self, groups):
+        '''
+        Splits groups of filters by their results on some of their witnesses:
+        equivalent filters always end up in the same part.
+        '''
+        pending = [groups]
+        parts = []
+        while pending:
+            groups = pending.pop()
+            if len(groups) <= 8:
+                parts.append(groups)
+                continue
+            step = max(1, len(groups) // 16)
+            probes = [event for group in groups[::step] for event in self.formulas[group[0]].witnesses[:1]]
+            split = {}
+            for group in groups:
+                predicate = self.formulas[group[0]].predicate
+                split.setdefault(tuple(bool(predicate(event)) for event in probes), []).append(group)
+            if len(split) == 1:
+                parts.append(groups)
+            else:
+                pending.extend(split.values())
+        return parts
+
+    def _candidates(self, weaker, stabbed=None):
+        '''
+        Filters that could imply `weaker` (see the class docstring), taken from
+        `stabbed` (see `_stab`) or else from the smallest of its path and fact
+        postings.
+        '''
+        formula = self.formulas[weaker]
+        candidates = set().union(*self._postings(formula)[1]) if stabbed is None else stabbed
+        found = []
+        for filter_id in candidates:
+            other = self.formulas[filter_id]
+            if formula.paths <= other.paths and all(other.facts.get(path) and other.facts[path] <= values for path, values in formula.facts.items()):
+                found.append(filter_id)
+        return found
+
+    def _postings(self, formula):
+        '''`(size, sets)`: the smallest posting holding every candidate of `formula`, as the sets to join.'''
+        best = (len(self.formulas), [self.formulas.keys()])
+        for path in formula.paths:
+            posting = self.by_path.get(path, set())
+            if len(posting) < best[0]:
+                best = (len(posting), [posting])
+        for path, values in formula.facts.items():
+            postings = [self.by_fact.get((path, value), set()) for value in values]
+            size = sum(len(posting) for posting in postings)
+            if size < best[0]:
+                best = (size, postings)
+        return best
+
+    def _stab(self, weakers, representatives):
+        '''
+        `{weaker: candidates}` for the filters in `weakers` where the region
+        indexes give fewer candidates than their postings. A filter that can
+        match and implies `weaker` never matches wherever `weaker` never does,
+        and always matches only where `weaker` always does: weaker filters are
+        looked up among the never-matching regions of the `representatives`,
+        and representatives among the always-matching regions of the weaker
+        filters, each by two intervals shared with the fewest filters. When
+        both lookups find candidates, only those found by both are kept.
+        '''
+        strongers = [self.formulas[filter_id] for filter_id in representatives if self.formulas[filter_id].regions is not None]
+        weakers = [self.formulas[filter_id] for filter_id in weakers if self.formulas[filter_id].regions is not None]
+        best = {weaker.filter_id: self._postings(weaker) for weaker in weakers}
+
+        index = RegionIndex(strongers, NEVER_SIDE)
+        chosen = smallest(index, {weaker.filter_id: region_queries(weaker, NEVER_SIDE) for weaker in weakers})
+        # Where the postings are smaller, only they are looked up.
+        within = {weaker: set().union(*best[weaker][1]) for weaker, (count, _) in chosen.items() if best[weaker][0] < count}
+        best = {weaker: (size, None) for weaker, (size, _) in best.items()}
+        excluding = stabbed(index, chosen, within)
+        for weaker, found in excluding.items():
+            # Filters without regions are not in the index.
+            postings = [self.unprofiled.get(path, set()) for path in self.formulas[weaker].paths]
+            if weaker in within:
+                postings.append(within[weaker])
+            postings.sort(key=len)
+            found |= postings[0].intersection(*postings[1:])
+            if len(found) < best[weaker][0]:
+                best[weaker] = (len(found), excluding)
+
+        # A filter matching every event always matches on paths it does not read, where the index cannot find it.
+        index = RegionIndex([weaker for weaker in weakers if not weaker.tautology], ALWAYS_SIDE)
+        chosen = smallest(index, {stronger.filter_id: region_queries(stronger, ALWAYS_SIDE) for stronger in strongers})
+        # Filters without an always-matching region are not found by the index either. As candidates,
+        # they must read every path `weaker` reads, so they are kept by path.
+        loose = set(representatives).difference(chosen)
+        loose_by_path = {}
+        for stronger in loose:
+            for path in self.formulas[stronger].paths:
+                loose_by_path.setdefault(path, set()).add(stronger)
+        forcing = {}
+        for stronger, found in stabbed(index, chosen).items():
+            for weaker in found:
+                forcing.setdefault(weaker, set()).add(stronger)
+        for weaker in weakers:
+            if weaker.tautology:
+                continue
+            filter_id = weaker.filter_id
+            spare = min((loose_by_path.get(path, set()) for path in weaker.paths), key=len, default=loose)
+            if filter_id in excluding:
+                # Both lookups are necessary conditions, so their candidates can be intersected.
+                found = excluding[filter_id]
+                excluding[filter_id] = found & spare | found & forcing.get(filter_id, set())
+                if len(excluding[filter_id]) < best[filter_id][0]:
+                    best[filter_id] = (len(excluding[filter_id]), excluding)
+            elif len(forcing.get(filter_id, ())) + len(spare) < best[filter_id][0]:
+                forcing[filter_id] = forcing.get(filter_id, set()) | spare
+                best[filter_id] = (len(forcing[filter_id]), forcing)
+
+        return {weaker: source[weaker] for weaker, (_, source) in best.items() if source is not None}
+
+    def _implies(self, stronger, weaker):
+        if stronger.key == weaker.key or not stronger.form or weaker.form == [[]]:
+            return True
+        for event in stronger.witnesses:
+            if not weaker.predicate(event):
+                return False
+        decided = self._by_regions(stronger, weaker)
+        if decided is not None:
+            return decided
+
+        undecided = False
+        used = 0
+        for group in stronger.form:
+            atoms = form_atoms([group], form_atoms(weaker.form, {}))
+            worlds = Worlds(list(atoms.values()))
+            required = [value for kind, value in group if kind == 'atom']
+            choices = worlds.choices(required)
+            # Free booleans directly in the group must be true; the others can be anything.
+            fixed = set(atom.key for atom in required)
+            free = [atom for atom in worlds.opaque if atom.key not in fixed]
+            used += size(choices, len(free))
+            if used > self.MAXIMUM_WORLDS:
+                return None
+
+            for combination in itertools.product(*choices):
+                truth = worlds.truth(combination)
+                for atom in worlds.opaque:
+                    truth[atom.key] = True
+                for bits in itertools.product([False, True], repeat=len(free)):
+                    for atom, bit in zip(free, bits):
+                        truth[atom.key] = bit
+                    if not evaluate([group], truth) or evaluate(weaker.form, truth):
+                        continue
+                    if not worlds.opaque:
+                        return False
+                    # Free booleans may not be realizable together: check a real event.
+                    event = worlds.event(combination, truth)
+                    if stronger.predicate(event) and not weaker.predicate(event):
+                        return False
+                    undecided = True
+        return None if undecided else True
+
+    def _by_regions(self, stronger, weaker):
+        '''
+        Implication decided from the regions of both filters, or `None`. A
+        filter that can match only implies filters that never match wherever
+        it never does; between `and`-only filters, that is enough.
+        '''
+        if stronger.regions is None or weaker.regions is None:
+            return None
+        if not stronger.matchable:
+            return True
+        if not weaker.paths <= stronger.paths and nested(stronger.paths | weaker.paths):
+            return None
+        for path, (never, _) in weaker.regions.items():
+            own = stronger.regions[path][0] if path in stronger.regions else NOWHERE
+            if not own.covers(never):
+                return False
+        return True if stronger.conjunctive and weaker.conjunctive else None
+
+    def _profile(self, formula, worlds):
+        '''
+        For filters whose atoms are all exact, sets `regions`: per path, the
+        `Region`s of values with which the filter never, and always, matches,
+        whatever the other paths hold. Equivalent filters have equal regions,
+        kept in `signature`. `and`-only filters are read path by path; others
+        are evaluated on every combination, if there are at most
+        `MAXIMUM_WORLDS`. `worlds` holds all the atoms of `formula`.
+        '''
+        if worlds.opaque:
+            return
+
+        if formula.conjunctive:
+            passing = [[True] * len(values) for values in worlds.values]
+            for atom in formula.atoms.values():
+                index, results = worlds.tables[atom.key]
+                passing[index] = [passed and result for passed, result in zip(passing[index], results)]
+            matchable = all(any(results) for results in passing)
+            free = [all(results) for results in passing]
+            tautology = all(free)
+            never = [[not (matchable and passed) for passed in results] for results in passing]
+            always = [
+                [matchable and passed and all(free[:index] + free[index + 1:]) for passed in results]
+                for index, results in enumerate(passing)
+            ]
+        else:
+            choices = worlds.choices([])
+            if size(choices, 0) > self.MAXIMUM_WORLDS:
+                return
+            seen = {True: [[False] * len(values) for values in worlds.values], False: [[False] * len(values) for values in worlds.values]}
+            matchable = False
+            tautology = True
+            for combination in itertools.product(*choices):
+                result = evaluate(formula.form, worlds.truth(combination))
+                matchable = matchable or result
+                tautology = tautology and result
+                rows = seen[result]
+                for index, choice in enumerate(combination):
+                    rows[index][choice] = True
+            never = [[not result for result in results] for results in seen[True]]
+            always = [[not result for result in results] for results in seen[False]]
+
+        formula.matchable = matchable
+        formula.tautology = tautology
+        formula.regions = {
+            path: (region(worlds.cells[index], never[index]), region(worlds.cells[index], always[index]))
+            for index, path in enumerate(worlds.paths)
+        }
+        formula.signature = tuple(sorted((path, never.key, always.key) for path, (never, always) in formula.regions.items()))
+
+    def _witnesses(self, formula, worlds):
+        '''A few events matching `formula`, used to reject implications without enumerating.'''
+        witnesses = []
+        for group in formula.form:
+            if len(formula.form) > 1:
+                worlds = Worlds(list(form_atoms([group], {}).values()))
+            choices = worlds.choices([value for kind, value in group if kind == 'atom'])
+            truth = {atom.key: True for atom in worlds.opaque}
+            for combination in itertools.islice(itertools.product(*choices), 16):
+                event = worlds.event(combination, truth)
+                if formula.predicate(event):
+                    witnesses.append(event)
+                    break
+            if len(witnesses) >= self.MAXIMUM_WITNESSES:
+                break
+        return witnesses
+
+
+class Never:
+    '''A formula that matches nothing.'''
+    key = frozenset()
+    form = []
+    regions = None
+    predicate = staticmethod(lambda event: False)
+
+
+NEVER_SIDE, ALWAYS_SIDE = 0, 1
+
+
+class RegionIndex:
+    '''
+    Finds the filters that never (`NEVER_SIDE`) or always (`ALWAYS_SIDE`)
+    match while a field holds a value of some interval, e.g. every filter
+    that fails whenever `properties.x = 5`, for many intervals at once. Each
+    line of values is swept in order, so the cost is sorting the intervals plus
+    the size of the answers.
+    '''
+
+    def __init__(self, formulas, side):
+        self.intervals = {}
+        self.others = {}
+        for formula in formulas:
+            for path, regions in formula.regions.items():
+                region = regions[side]
+                for line, intervals in region.lines():
+                    self.intervals.setdefault((path, line), []).extend((start, end, formula.filter_id) for start, end in intervals)
+                for index in region.others:
+                    self.others.setdefault((path, index), set()).add(formula.filter_id)
+
+    def lookup(self, queries, collect=False, within=None):
+        '''
+        For each `(path, line, start cut)` query, the filters whose region on
+        `path` contains the cut: their number, or their ids with `collect`.
+        With `within`, the ids are those of the set `within[position]`, or all
+        of them where it is `None`. Queries on `other` lines take an index of
+        `OTHER_VALUES` instead of a cut.
+        '''
+        def answer(position, members):
+            if within is not None and within[position] is not None:
+                return within[position] & members
+            return set(members) if collect or within is not None else len(members)
+
+        found = [None] * len(queries)
+        by_line = {}
+        for position, (path, line, start) in enumerate(queries):
+            if line == 'other':
+                found[position] = answer(position, self.others.get((path, start), set()))
+            else:
+                by_line.setdefault((path, line), []).append((start, position))
+
+        for key, cuts in by_line.items():
+            intervals = self.intervals.get(key, [])
+            # At equal cuts, intervals ending there are dropped before those starting there are added, then queries run.
+            events = [(end, 0, index) for index, (_, end, _) in enumerate(intervals)]
+            events += [(start, 1, index) for index, (start, _, _) in enumerate(intervals)]
+            events += [(cut, 2, position) for cut, position in cuts]
+            events.sort()
+            # The intervals of a filter on one line are disjoint, so each filter is active at most once.
+            active = set()
+            for _, kind, index in events:
+                if kind == 0:
+                    active.remove(intervals[index][2])
+                elif kind == 1:
+                    active.add(intervals[index][2])
+                else:
+                    found[index] = answer(index, active)
+        return found
+
+
+def region_queries(formula, side):
+    '''A `RegionIndex` query for each interval and other value of the regions of `formula` on `side`.'''
+    queries = []
+    for path, regions in formula.regions.items():
+        region = regions[side]
+        for line, intervals in region.lines():
+            queries += [(path, line, start) for start, _ in intervals]
+        queries += [(path, 'other', index) for index in sorted(region.others)]
+    return queries
+
+
+def smallest(index, queries):
+    '''
+    `{key: (count, chosen)}` with, for each key of `queries`, the query that
+    `index` answers with the fewest filters, that number, and the next
+    smallest query, on another path if there is one: queries on one path tend
+    to find the same filters.
+    '''
+    counts = iter(index.lookup([query for key_queries in queries.values() for query in key_queries]))
+    chosen = {}
+    for key, key_queries in queries.items():
+        sizes = [next(counts) for _ in key_queries]
+        if sizes:
+            order = sorted(range(len(sizes)), key=sizes.__getitem__)
+            first = key_queries[order[0]]
+            rest = [key_queries[position] for position in order[1:]]
+            rest = [query for query in rest if query[0] != first[0]] or rest
+            chosen[key] = (sizes[order[0]], [first] + rest[:1])
+    return chosen
+
+
+def stabbed(index, chosen, within=None):
+    '''
+    `{key: ids}`: the filters that `index` finds for all the queries chosen
+    for each key by `smallest`, among the ids of `within[key]` if given. Keys
+    are looked up in batches collecting about `LOOKUP_BATCH` ids, and the
+    second query only narrows down the first.
+    '''
+    within = within or {}
+    batches = [[]]
+    total = 0
+    for key, (count, _) in chosen.items():
+        if key in within:
+            count = min(count, len(within[key]))
+        if batches[-1] and total + count > LOOKUP_BATCH:
+            batches.append([])
+            total = 0
+        batches[-1].append(key)
+        total += count
+
+    found = {}
+    for batch in batches:
+        found.update(zip(batch, index.lookup([chosen[key][1][0] for key in batch], within=[within.get(key) for key in batch])))
+        narrowed = [key for key in batch if len(chosen[key][1]) > 1]
+        found.update(zip(narrowed, index.lookup([chosen[key][1][1] for key in narrowed], within=[found[key] for key in narrowed])))
+    return found
+
+
+NEVER = Never()
+
+
+def both(first, second):
+    '''Three-valued `and` of a result and a lazily computed one.'''
+    if first is False:
+        return False
+    second = second()
+    if second is False:
+        return False
+    return True if first is True and second is True else None
+
+
+def canonical_key(ast):
+    '''A hashable key shared by filters that differ only in operand order, number spelling or list order.'''
+    return Formula(None, ast, {}).key
+
+
+def implies(stronger, weaker):
+    '''Whether every event matching AST `stronger` matches AST `weaker`: `True`, `False` or `None` if undecided.'''
+    return FilterAnalysis({0: stronger, 1: weaker}).implies(0, 1)
+
+
+def equivalent(first, second):
+    return FilterAnalysis({0: first, 1: second}).equivalent(0, 1)
@@ -0,0 +1,313 @@
+import array
+import operator as operators
+from itertools import repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.functions import default_registry
+
+ORDERINGS = {
+    '>': operators.gt,
+    '<': operators.lt,
+    '>=': operators.ge,
+    '<=': operators.le,
+}
+
+
+def columns_from_events(events, paths):
+    '''Splits event dictionaries into `{dotted path: list of values}`; missing paths become `None`.'''
+    keys = {path: tuple(path.split('.')) for path in paths}
+    return {path: [semantics.resolve(event, keys[path]) for event in events] for path in paths}
+
+
+class ListBatch:
+    '''Columns held in lists or `array` buffers; masks are lists of booleans.'''
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    def column(self, path):
+        values = self.columns.get(path)
+        if values is None:
+            return [None] * self.length
+        return values
+
+    def constant(self, result):
+        return [result] * self.length
+
+    def mask(self, values):
+        return list(values)
+
+    def truthy(self, values):
+        return list(map(bool, values))
+
+    def conjunction(self, masks):
+        if len(masks) == 2:
+            return list(map(operators.and_, *masks))
+        return list(map(all, zip(*masks)))
+
+    def disjunction(self, masks):
+        if len(masks) == 2:
+            return list(map(operators.or_, *masks))
+        return list(map(any, zip(*masks)))
+
+    def negation(self, mask):
+        return [not value for value in mask]
+
+    def compare(self, operator, values, constant):
+        if isinstance(values, array.array) and values.typecode != 'u' and semantics.is_number(constant):
+            # Numeric buffers hold nothing but numbers: compare without type checks.
+            if operator == '=':
+                return [value == constant for value in values]
+            if operator == '!=':
+                return [value != constant for value in values]
+            return list(map(ORDERINGS[operator], values, repeat(constant)))
+
+        if operator in ['=', '!=']:
+            if type(constant) is semantics.ValueSet:
+                mask = [value in constant for value in values]
+            elif constant is None or constant is True or constant is False:
+                mask = [value is constant for value in values]
+            elif semantics.is_number(constant):
+                mask = [value == constant and value is not True and value is not False for value in values]
+            else:
+                mask = [value == constant for value in values]
+            return [not value for value in mask] if operator == '!=' else mask
+
+        if semantics.is_number(constant):
+            kinds = (int, float)
+        elif type(constant) is str:
+            kinds = (str,)
+        else:
+            return self.constant(False)
+
+        compare = ORDERINGS[operator]
+        return [type(value) in kinds and compare(value, constant) for value in values]
+
+    def compare_columns(self, operator, left, right):
+        return [semantics.compare(operator, left_value, right_value) for left_value, right_value in zip(left, right)]
+
+    def function(self, test, values):
+        return [type(value) is str and bool(test(value)) for value in values]
+
+
+class NumpyBatch(ListBatch):
+    '''
+    Used when any column is a NumPy array. Numeric, boolean and unicode arrays
+    are compared in one vectorized operation; object arrays (the way to hold
+    nulls or mixed types) fall back to the element-wise rules.
+    '''
+
+    def column(self, path):
+        values = self.columns.get(path)
+        if values is None:
+            return numpy.full(self.length, None, dtype=object)
+        if not isinstance(values, numpy.ndarray):
+            return numpy.asarray(values, dtype=object) if isinstance(values, list) else numpy.asarray(values)
+        return values
+
+    def constant(self, result):
+        return numpy.full(self.length, result, dtype=bool)
+
+    def mask(self, values):
+        return numpy.fromiter(values, dtype=bool, count=self.length)
+
+    def truthy(self, values):
+        if values.dtype.kind in 'biuf':
+            return values.astype(bool)
+        return self.mask(map(bool, values))
+
+    def conjunction(self, masks):
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask
+        return result
+
+    def disjunction(self, masks):
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result | mask
+        return result
+
+    def negation(self, mask):
+        return ~mask
+
+    def compare(self, operator, values, constant):
+        kind = values.dtype.kind
+        if type(constant) is semantics.ValueSet:
+            return self._membership(operator, values, constant)
+
+        is_number = semantics.is_number(constant)
+        if (kind in 'iuf' and is_number) or (kind == 'U' and type(constant) is str):
+            if operator == '=':
+                return values == constant
+            if operator == '!=':
+                return values != constant
+            return ORDERINGS[operator](values, constant)
+
+        if kind == 'b' and (constant is True or constant is False):
+            if operator == '=':
+                return values == constant
+            if operator == '!=':
+                return values != constant
+            return self.constant(False)
+
+        if kind in 'biufU':
+            # Typed arrays never hold nulls, and the constant's type can never match.
+            return self.constant(operator == '!=')
+
+        return self.mask(ListBatch.compare(self, operator, values, constant))
+
+    def _membership(self, operator, values, constant):
+        kind = values.dtype.kind
+        if kind in 'iuf':
+            members = list(constant.numbers)
+        elif kind == 'U':
+            members = list(constant.strings)
+        elif kind == 'b':
+            members = [value for value in constant.constants if value is not None]
+        else:
+            return self.mask(ListBatch.compare(self, operator, values, constant))
+
+        mask = numpy.isin(values, members) if members else self.constant(False)
+        return ~mask if operator == '!=' else mask
+
+    def compare_columns(self, operator, left, right):
+        return self.mask(ListBatch.compare_columns(self, operator, left, right))
+
+    def function(self, test, values):
+        if values.dtype.kind == 'U':
+            # `tolist()` turns the `numpy.str_` elements into `str`, like every other engine sees.
+            values = values.tolist()
+        return self.mask(ListBatch.function(self, test, values))
+
+
+class ColumnarEvaluator:
+    '''
+    Evaluates a filter over a batch of events held as columns, e.g.
+    `{'event': [...], 'properties.revenue': [...]}`, and returns one boolean per
+    row. Each condition is a single pass over its column and `and`/`or`/`!`
+    combine whole masks. Missing columns and `None` values are null.
+
+    Columns may be lists, `array` buffers or, when NumPy is installed, NumPy
+    arrays; the result is a NumPy boolean array if any column used is one.
+    '''
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.functions = default_registry
+        self.paths = ['.'.join(keys) for keys in semantics.query_paths(ast)]
+
+    def evaluate(self, columns, length=None):
+        present = [columns[path] for path in self.paths if path in columns]
+        lengths = set(len(values) for values in present)
+        if length is not None:
+            lengths.add(length)
+        if len(lengths) > 1:
+            raise Exception(f'Columns have different lengths: {sorted(lengths)}')
+        if not lengths:
+            raise Exception('Cannot infer the batch length: pass `length`')
+
+        length = lengths.pop()
+        if numpy is not None and any(isinstance(values, numpy.ndarray) for values in present):
+            batch = NumpyBatch(columns, length)
+        else:
+            batch = ListBatch(columns, length)
+        return self._mask(self.ast, batch)
+
+    def _mask(self, node, batch):
+        if not isinstance(node, ASTNode):
+            return self._truthiness(node, batch)
+
+        if node.type == ASTType.ROOT:
+            return self._mask(semantics.root_statement(node), batch)
+
+        if node.type == ASTType.STATEMENT:
+            groups = []
+            for group in semantics.disjunction(node):
+                masks = [self._mask(operand, batch) for operand in group]
+                groups.append(masks[0] if len(masks) == 1 else batch.conjunction(masks))
+            return groups[0] if len(groups) == 1 else batch.disjunction(groups)
+
+        if node.type == ASTType.GROUPING:
+            return self._mask(node.children[0], batch)
+
+        if node.type == ASTType.NOT:
+            return batch.negation(self._mask(node.children[0], batch))
+
+        if node.type == ASTType.CONDITIONAL:
+            return self._conditional(*node.children, batch)
+
+        if node.type == ASTType.FUNC:
+            return self._function(node, batch)
+
+        if node.type == ASTType.EXPR:
+            return self._truthiness(node.children[0], batch)
+
+        return self._truthiness(node, batch)
+
+    def _truthiness(self, node, batch):
+        is_literal, values = self._values(node, batch)
+        if is_literal:
+            return batch.constant(bool(values))
+        if isinstance(node, ASTNode) and node.type == ASTType.FUNC:
+            return values
+        return batch.truthy(values)
+
+    def _values(self, node, batch):
+        '''`(True, constant)` for literals and `(False, column)` for everything else.'''
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.EXPR:
+                return self._values(node.children[0], batch)
+            if node.type == ASTType.FUNC:
+                return False, self._function(node, batch)
+            if node.type == ASTType.PATH:
+                is_literal, value = semantics.path_literal(node)
+                if is_literal:
+                    return True, value
+                return False, batch.column('.'.join(semantics.path_keys(node)))
+            if node.type == ASTType.LIST:
+                return True, semantics.list_value(node)
+            return False, self._mask(node, batch)
+
+        is_literal, value = semantics.literal_value(node)
+        if is_literal:
+            return True, value
+        return False, batch.column('.'.join(semantics.path_keys(node)))
+
+    def _conditional(self, left, operator, right, batch):
+        operator = operator.value
+        if operator not in semantics.COMPARISON_OPERATORS:
+            raise Exception(f'Unsupported operator: {operator}')
+
+        left_is_literal, left_values = self._values(left, batch)
+        right_is_literal, right_values = self._values(right, batch)
+
+        if left_is_literal and right_is_literal:
+            return batch.constant(semantics.compare(operator, left_values, right_values))
+        if right_is_literal:
+            return batch.compare(operator, left_values, right_values)
+        if left_is_literal:
+            left_values = repeat(left_values, batch.length)
+        return batch.compare_columns(operator, left_values, right_values)
+
+    def _function(self, node, batch):
+        name = node.children[0].value
+        if name not in self.functions:
+            raise Exception(f'Unsupported function: {name}')
+
+        subject_is_literal, subject = self._values(node.children[1], batch)
+        pattern_is_literal, pattern = self._values(node.children[2], batch)
+        if not pattern_is_literal or type(pattern) is not str:
+            raise Exception(f'Expected string pattern in {name}()')
+
+        test = self.functions.matcher(name, pattern)
+        if subject_is_literal:
+            return batch.constant(type(subject) is str and bool(test(subject)))
+        return batch.function(test, subject)
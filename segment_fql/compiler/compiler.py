@@ -0,0 +1,252 @@
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.functions import default_registry
+
+
+class Compiler:
+    '''
+    Turns a parsed AST into a single `predicate(event) -> bool`. Paths, literals,
+    operators and function patterns are resolved once here, so evaluating an event
+    is a handful of nested closure calls with no tree walking.
+    '''
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.functions = default_registry
+
+    def compile(self):
+        return self._predicate(self.ast)
+
+    def _predicate(self, node):
+        if not isinstance(node, ASTNode):
+            return self._truthiness(node)
+
+        if node.type == ASTType.ROOT:
+            return self._predicate(semantics.root_statement(node))
+
+        if node.type == ASTType.STATEMENT:
+            groups = [
+                self._conjunction([self._predicate(operand) for operand in group])
+                for group in semantics.disjunction(node)
+            ]
+            return self._disjunction(groups)
+
+        if node.type == ASTType.GROUPING:
+            return self._predicate(node.children[0])
+
+        if node.type == ASTType.NOT:
+            inner = self._predicate(node.children[0])
+            return lambda event: not inner(event)
+
+        if node.type == ASTType.CONDITIONAL:
+            return self._conditional(*node.children)
+
+        if node.type == ASTType.FUNC:
+            return self._function(node)
+
+        if node.type == ASTType.EXPR:
+            return self._truthiness(node.children[0])
+
+        return self._truthiness(node)
+
+    def _truthiness(self, node):
+        is_literal, value = self._value(node)
+        if is_literal:
+            return self._constant(bool(value))
+        if isinstance(node, ASTNode) and node.type == ASTType.FUNC:
+            return value
+        return lambda event: bool(value(event))
+
+    def _value(self, node):
+        '''Returns `(True, constant)` for literals and `(False, getter)` for everything else.'''
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.EXPR:
+                return self._value(node.children[0])
+            if node.type == ASTType.FUNC:
+                return False, self._function(node)
+            if node.type == ASTType.PATH:
+                is_literal, value = semantics.path_literal(node)
+                if is_literal:
+                    return True, value
+                return False, self._getter(semantics.path_keys(node))
+            if node.type == ASTType.LIST:
+                return True, semantics.list_value(node)
+            return False, self._predicate(node)
+
+        is_literal, value = semantics.literal_value(node)
+        if is_literal:
+            return True, value
+        return False, self._getter(semantics.path_keys(node))
+
+    def _getter(self, keys):
+        if len(keys) == 1:
+            key = keys[0]
+            return lambda event: event.get(key)
+
+        if len(keys) == 2:
+            first, second = keys
+
+            def getter(event):
+                value = event.get(first)
+                return value.get(second) if isinstance(value, dict) else None
+            return getter
+
+        keys = tuple(keys)
+        return lambda event: semantics.resolve(event, keys)
+
+    def _conditional(self, left, operator, right):
+        operator = operator.value
+        if operator not in semantics.COMPARISON_OPERATORS:
+            raise Exception(f'Unsupported operator: {operator}')
+
+        left_is_literal, left_value = self._value(left)
+        right_is_literal, right_value = self._value(right)
+
+        if left_is_literal and right_is_literal:
+            return self._constant(semantics.compare(operator, left_value, right_value))
+
+        if left_is_literal or not right_is_literal:
+            # Field against field (or a literal on the left): fall back to the generic comparison.
+            get_left = (lambda event: left_value) if left_is_literal else left_value
+            get_right = (lambda event: right_value) if right_is_literal else right_value
+            return lambda event: semantics.compare(operator, get_left(event), get_right(event))
+
+        if operator in ['=', '!=']:
+            matches = self._equality(left, left_value, right_value)
+            if operator == '!=':
+                return lambda event: not matches(event)
+            return matches
+
+        return self._ordering(left_value, operator, right_value)
+
+    def _equality(self, left, get, constant):
+        if type(constant) is semantics.ValueSet:
+            return self._membership(get, constant)
+
+        if constant is None or constant is True or constant is False:
+            return lambda event: get(event) is constant
+
+        if semantics.is_number(constant):
+            def matches(event):
+                value = get(event)
+                return value == constant and value is not True and value is not False
+            return matches
+
+        # Strings (the common case): fuse short paths into the comparison itself.
+        keys = semantics.path_keys(left) if not isinstance(left, ASTNode) or left.type == ASTType.PATH else None
+        if keys and len(keys) == 1:
+            key = keys[0]
+            return lambda event: event.get(key) == constant
+
+        if keys and len(keys) == 2:
+            first, second = keys
+
+            def matches(event):
+                value = event.get(first)
+                return isinstance(value, dict) and value.get(second) == constant
+            return matches
+
+        return lambda event: get(event) == constant
+
+    def _membership(self, get, values):
+        if values.numbers or values.constants:
+            return lambda event: get(event) in values
+
+        # Lists of strings only: skip the type dispatch of `ValueSet`.
+        strings = values.strings
+
+        def matches(event):
+            value = get(event)
+            return type(value) is str and value in strings
+        return matches
+
+    def _ordering(self, get, operator, constant):
+        if semantics.is_number(constant):
+            kinds = (int, float)
+        elif type(constant) is str:
+            kinds = (str,)
+        else:
+            return self._constant(False)
+
+        if operator == '>':
+            def matches(event):
+                value = get(event)
+                return type(value) in kinds and value > constant
+        elif operator == '<':
+            def matches(event):
+                value = get(event)
+                return type(value) in kinds and value < constant
+        elif operator == '>=':
+            def matches(event):
+                value = get(event)
+                return type(value) in kinds and value >= constant
+        else:
+            def matches(event):
+                value = get(event)
+                return type(value) in kinds and value <= constant
+
+        return matches
+
+    def _function(self, node):
+        name = node.children[0].value
+        if name not in self.functions:
+            raise Exception(f'Unsupported function: {name}')
+
+        subject_is_literal, subject = self._value(node.children[1])
+        pattern_is_literal, pattern = self._value(node.children[2])
+        if not pattern_is_literal or type(pattern) is not str:
+            raise Exception(f'Expected string pattern in {name}()')
+
+        test = self.functions.matcher(name, pattern)
+        if subject_is_literal:
+            return self._constant(type(subject) is str and bool(test(subject)))
+
+        def call(event):
+            value = subject(event)
+            return type(value) is str and bool(test(value))
+        return call
+
+    def _constant(self, result):
+        return lambda event: result
+
+    def _conjunction(self, predicates):
+        if len(predicates) == 1:
+            return predicates[0]
+
+        if len(predicates) == 2:
+            first, second = predicates
+            return lambda event: first(event) and second(event)
+
+        if len(predicates) == 3:
+            first, second, third = predicates
+            return lambda event: first(event) and second(event) and third(event)
+
+        predicates = tuple(predicates)
+
+        def conjunction(event):
+            for predicate in predicates:
+                if not predicate(event):
+                    return False
+            return True
+        return conjunction
+
+    def _disjunction(self, predicates):
+        if len(predicates) == 1:
+            return predicates[0]
+
+        if len(predicates) == 2:
+            first, second = predicates
+            return lambda event: first(event) or second(event)
+
+        if len(predicates) == 3:
+            first, second, third = predicates
+            return lambda event: first(event) or second(event) or third(event)
+
+        predicates = tuple(predicates)
+
+        def disjunction(event):
+            for predicate in predicates:
+                if predicate(event):
+                    return True
+            return False
+        return disjunction
@@ -0,0 +1,257 @@
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.functions import default_registry
+
+UNSET = object()
+
+
+class Evaluation:
+    '''Per-event memo: every DAG node is computed at most once, on first use.'''
+
+    def __init__(self, dag, event):
+        self.event = event
+        self.nodes = dag.nodes
+        self.values = [UNSET] * len(dag.nodes)
+
+    def value(self, index):
+        value = self.values[index]
+        if value is UNSET:
+            value = self.values[index] = self.nodes[index](self)
+        return value
+
+
+class ProfiledEvaluation(Evaluation):
+    '''
+    Counts node computations. A memo hit saves as many computations as the node
+    cost when it was first computed, which is what a separate evaluation per
+    filter would have paid again.
+    '''
+
+    def __init__(self, dag, event):
+        super().__init__(dag, event)
+        self.costs = [0] * len(dag.nodes)
+        self.evaluations = 0
+        self.saved = 0
+
+    def value(self, index):
+        value = self.values[index]
+        if value is UNSET:
+            before = self.evaluations
+            self.evaluations += 1
+            value = self.values[index] = self.nodes[index](self)
+            self.costs[index] = self.evaluations - before
+        else:
+            self.saved += self.costs[index]
+        return value
+
+
+class PredicateDAG:
+    '''
+    Compiles many filters into one DAG. Identical paths, conditions, function
+    calls and `and`/`or`/`not` sub-trees (operands compared as sets) are
+    hash-consed into a single node, which is evaluated at most once per event
+    however many filters use it.
+    '''
+
+    def __init__(self, filters=None):
+        self.keys = {}
+        self.nodes = []
+        self.kinds = []
+        self.roots = {}
+        self.references = 0
+
+        filters = filters.items() if isinstance(filters, dict) else (filters or [])
+        for filter_id, ast in filters:
+            self.add(filter_id, ast)
+
+    def add(self, filter_id, ast):
+        if filter_id in self.roots:
+            raise Exception(f'Duplicate filter id: {filter_id}')
+        self.roots[filter_id] = self._predicate(ast)
+
+    def evaluate(self, event):
+        '''`{filter id: result}` for every filter.'''
+        evaluation = Evaluation(self, event)
+        return {filter_id: evaluation.value(root) for filter_id, root in self.roots.items()}
+
+    def match(self, event):
+        evaluation = Evaluation(self, event)
+        return [filter_id for filter_id, root in self.roots.items() if evaluation.value(root)]
+
+    def stats(self):
+        return {
+            'filters': len(self.roots),
+            'references': self.references,
+            'nodes': len(self.nodes),
+            'deduplication_ratio': self.references / len(self.nodes) if self.nodes else 1.0,
+        }
+
+    def profile(self, events):
+        '''Evaluates `events` and reports how many node computations sharing saved.'''
+        count = evaluations = saved = 0
+        for event in events:
+            evaluation = ProfiledEvaluation(self, event)
+            for root in self.roots.values():
+                evaluation.value(root)
+            count += 1
+            evaluations += evaluation.evaluations
+            saved += evaluation.saved
+
+        count = count or 1
+        return {
+            'events': count,
+            'evaluations_per_event': evaluations / count,
+            'saved_per_event': saved / count,
+            'unshared_per_event': (evaluations + saved) / count,
+        }
+
+    def _intern(self, key, kind, build):
+        self.references += 1
+        index = self.keys.get(key)
+        if index is None:
+            index = self.keys[key] = len(self.nodes)
+            self.nodes.append(None)
+            self.kinds.append(kind)
+            self.nodes[index] = build()
+        return index
+
+    def _predicate(self, node):
+        if not isinstance(node, ASTNode) or node.type in [ASTType.PATH, ASTType.EXPR]:
+            return self._truthiness(node)
+
+        if node.type == ASTType.ROOT:
+            return self._predicate(semantics.root_statement(node))
+
+        if node.type == ASTType.STATEMENT:
+            groups = [self._logical('and', [self._predicate(operand) for operand in group]) for group in semantics.disjunction(node)]
+            return self._logical('or', groups)
+
+        if node.type == ASTType.GROUPING:
+            return self._predicate(node.children[0])
+
+        if node.type == ASTType.NOT:
+            child = self._predicate(node.children[0])
+            return self._intern(('not', child), 'not', lambda: lambda evaluation: not evaluation.value(child))
+
+        if node.type == ASTType.CONDITIONAL:
+            return self._conditional(*node.children)
+
+        if node.type == ASTType.FUNC:
+            return self._function(node)
+
+        raise Exception(f'Unsupported node: {node.type}')
+
+    def _truthiness(self, node):
+        is_literal, value = self._value(node)
+        if is_literal:
+            result = bool(value)
+            return self._intern(('constant', result), 'constant', lambda: lambda evaluation: result)
+        if self.kinds[value] == 'function':
+            return value
+        return self._intern(('truthy', value), 'truthy', lambda: lambda evaluation: bool(evaluation.value(value)))
+
+    def _value(self, node):
+        '''`(True, constant)` for literals, `(False, node index)` for paths and functions.'''
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.EXPR:
+                return self._value(node.children[0])
+            if node.type == ASTType.FUNC:
+                return False, self._function(node)
+            if node.type == ASTType.LIST:
+                return True, semantics.list_value(node)
+            if node.type != ASTType.PATH:
+                return False, self._predicate(node)
+            is_literal, value = semantics.path_literal(node)
+        else:
+            is_literal, value = semantics.literal_value(node)
+
+        if is_literal:
+            return True, value
+        return False, self._path(tuple(semantics.path_keys(node)))
+
+    def _path(self, keys):
+        def build():
+            if len(keys) == 1:
+                key = keys[0]
+                return lambda evaluation: evaluation.event.get(key)
+            return lambda evaluation: semantics.resolve(evaluation.event, keys)
+        return self._intern(('path', keys), 'path', build)
+
+    def _conditional(self, left, operator, right):
+        operator = operator.value
+        if operator not in semantics.COMPARISON_OPERATORS:
+            raise Exception(f'Unsupported operator: {operator}')
+
+        left_is_literal, left_value = self._value(left)
+        right_is_literal, right_value = self._value(right)
+        # Literals are keyed with their type so that `1`, `1.0` and `true` stay distinct.
+        left_key = ('literal', type(left_value), left_value) if left_is_literal else left_value
+        right_key = ('literal', type(right_value), right_value) if right_is_literal else right_value
+
+        def build():
+            if right_is_literal and not left_is_literal and operator == '=' and type(right_value) is str:
+                return lambda evaluation: evaluation.value(left_value) == right_value
+            if right_is_literal and not left_is_literal and type(right_value) is semantics.ValueSet:
+                if operator == '=':
+                    return lambda evaluation: evaluation.value(left_value) in right_value
+                return lambda evaluation: evaluation.value(left_value) not in right_value
+
+            def operand(is_literal, value):
+                if is_literal:
+                    return lambda evaluation: value
+                return lambda evaluation: evaluation.value(value)
+
+            get_left = operand(left_is_literal, left_value)
+            get_right = operand(right_is_literal, right_value)
+            return lambda evaluation: semantics.compare(operator, get_left(evaluation), get_right(evaluation))
+
+        return self._intern(('conditional', operator, left_key, right_key), 'conditional', build)
+
+    def _function(self, node):
+        name = node.children[0].value
+        if name not in default_registry:
+            raise Exception(f'Unsupported function: {name}')
+
+        subject_is_literal, subject = self._value(node.children[1])
+        pattern_is_literal, pattern = self._value(node.children[2])
+        if not pattern_is_literal or type(pattern) is not str:
+            raise Exception(f'Expected string pattern in {name}()')
+
+        def build():
+            test = default_registry.matcher(name, pattern)
+
+            if subject_is_literal:
+                result = type(subject) is str and bool(test(subject))
+                return lambda evaluation: result
+
+            def call(evaluation):
+                value = evaluation.value(subject)
+                return type(value) is str and bool(test(value))
+            return call
+
+        subject_key = ('literal', type(subject), subject) if subject_is_literal else subject
+        return self._intern(('function', name, subject_key, pattern), 'function', build)
+
+    def _logical(self, connector, operands):
+        # Operands without side effects commute, so `a and b` and `b and a` share one node.
+        operands = list(dict.fromkeys(operands))
+        if len(operands) == 1:
+            return operands[0]
+
+        def build():
+            if connector == 'and':
+                def conjunction(evaluation):
+                    for operand in operands:
+                        if not evaluation.value(operand):
+                            return False
+                    return True
+                return conjunction
+
+            def disjunction(evaluation):
+                for operand in operands:
+                    if evaluation.value(operand):
+                        return True
+                return False
+            return disjunction
+
+        return self._intern((connector, frozenset(operands)), connector, build)
@@ -0,0 +1,80 @@
+import fnmatch
+
+from segment_fql.lexer import TokenType
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.functions import default_registry
+
+
+class Interpreter:
+    '''Reference tree-walking evaluator. Re-reads the AST on every event.'''
+
+    def __init__(self, ast):
+        self.ast = ast
+
+    def evaluate(self, event):
+        return self._evaluate(self.ast, event)
+
+    def _evaluate(self, node, event):
+        if not isinstance(node, ASTNode):
+            return bool(self._value(node, event))
+
+        if node.type == ASTType.ROOT:
+            return self._evaluate(semantics.root_statement(node), event)
+
+        if node.type == ASTType.STATEMENT:
+            for group in semantics.disjunction(node):
+                if all(self._evaluate(operand, event) for operand in group):
+                    return True
+            return False
+
+        if node.type == ASTType.GROUPING:
+            return self._evaluate(node.children[0], event)
+
+        if node.type == ASTType.NOT:
+            return not self._evaluate(node.children[0], event)
+
+        if node.type == ASTType.CONDITIONAL:
+            left, operator, right = node.children
+            return semantics.compare(operator.value, self._value(left, event), self._value(right, event))
+
+        if node.type == ASTType.EXPR:
+            return bool(self._value(node.children[0], event))
+
+        return bool(self._value(node, event))
+
+    def _value(self, node, event):
+        if not isinstance(node, ASTNode):
+            is_literal, value = semantics.literal_value(node)
+            if is_literal:
+                return value
+            return semantics.resolve(event, semantics.path_keys(node))
+
+        if node.type == ASTType.PATH:
+            is_literal, value = semantics.path_literal(node)
+            if is_literal:
+                return value
+            return semantics.resolve(event, semantics.path_keys(node))
+
+        if node.type == ASTType.EXPR:
+            return self._value(node.children[0], event)
+
+        if node.type == ASTType.LIST:
+            return semantics.list_value(node)
+
+        if node.type == ASTType.FUNC:
+            name = node.children[0].value
+            subject = self._value(node.children[1], event)
+            pattern = self._value(node.children[2], event)
+            if type(subject) is not str:
+                return False
+            # Spelled out rather than taken from the registry, as the reference for its matchers.
+            if name == 'contains':
+                return pattern in subject
+            if name == 'match':
+                return fnmatch.fnmatchcase(subject, pattern)
+            if name in default_registry:
+                return bool(default_registry.matcher(name, pattern)(subject))
+            raise Exception(f'Unsupported function: {name}')
+
+        return self._evaluate(node, event)
@@ -0,0 +1,131 @@
+import sys
+from collections import OrderedDict
+
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+
+
+class MemoizedFilter:
+    '''
+    Evaluates a filter through a bounded LRU cache of results keyed on the
+    values of the paths the filter reads, e.g. `event` and `properties.plan`.
+    Streams that repeat the same values in those fields evaluate each
+    combination once. Values other than strings and `null` are keyed with their
+    type, so `1`, `1.0` and `true` are cached apart.
+
+    The cache is bypassed for an event when the strings in its key are longer
+    than `max_key_length` characters in total, or when a value cannot be
+    hashed (an object or array); such events count as misses. After each
+    `window` lookups, at the next miss, the hit rate of the window is checked.
+    Below `min_hit_rate`, the cache is emptied and bypassed for the next
+    `retry_after` events, then tried again.
+
+    The cache and counters are updated on every call, so each thread needs its
+    own instance. Registered functions are assumed to be pure.
+    '''
+
+    def __init__(self, ast, maxsize=4096, max_key_length=256, min_hit_rate=0.3, window=1000, retry_after=100_000):
+        if maxsize < 1:
+            raise Exception(f'Cache size must be positive, got {maxsize}')
+
+        self.maxsize = maxsize
+        self.max_key_length = max_key_length
+        self.min_hit_rate = min_hit_rate
+        self.window = window
+        self.retry_after = retry_after
+        self.paths = semantics.query_paths(ast)
+        self.predicate = Compiler(ast).compile()
+        self.entries = OrderedDict()
+        self.bypass_left = 0
+        self.window_start = (0, 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        self.unhashable = 0
+        self.bypassed = 0
+        self.disabled = 0
+
+    def __call__(self, event):
+        if self.bypass_left:
+            self.bypass_left -= 1
+            return self.predicate(event)
+
+        # Resolves every path like `semantics.resolve`, inlined: this runs on every hit.
+        values = []
+        for keys in self.paths:
+            value = event
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            if type(value) is not str and value is not None:
+                value = (type(value), value)
+            values.append(value)
+
+        key = tuple(values)
+        try:
+            result = self.entries.get(key)
+        except TypeError:
+            self.unhashable += 1
+            self._check_window()
+            return self.predicate(event)
+
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        # Everything below only runs on misses: a low hit rate means frequent misses.
+        result = self.predicate(event)
+        if sum([len(value) for value in values if type(value) is str]) > self.max_key_length:
+            self.oversized += 1
+        else:
+            self.misses += 1
+            self.entries[key] = result
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        self._check_window()
+        return result
+
+    def lookups(self):
+        return self.hits + self.misses + self.oversized + self.unhashable
+
+    def _check_window(self):
+        hits, lookups = self.window_start
+        if self.lookups() - lookups < self.window:
+            return
+
+        if self.hits - hits < self.min_hit_rate * (self.lookups() - lookups):
+            self.entries.clear()
+            self.bypass_left = self.retry_after
+            self.bypassed += self.retry_after
+            self.disabled += 1
+        self.window_start = (self.hits, self.lookups())
+
+    def hit_rate(self):
+        lookups = self.lookups()
+        return self.hits / lookups if lookups else 0.0
+
+    def memory(self):
+        '''Approximate bytes held by the cache: the table, its keys and their values.'''
+        total = sys.getsizeof(self.entries)
+        for key in self.entries:
+            total += sys.getsizeof(key)
+            for value in key:
+                total += sys.getsizeof(value) + (sys.getsizeof(value[1]) if type(value) is tuple else 0)
+        return total
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'oversized': self.oversized,
+            'unhashable': self.unhashable,
+            'bypassed': self.bypassed - self.bypass_left,
+            'disabled': self.disabled,
+            'hit_rate': self.hit_rate(),
+            'entries': len(self.entries),
+            'memory_bytes': self.memory(),
+            'enabled': not self.bypass_left,
+        }
@@ -0,0 +1,300 @@
+from segment_fql.lexer import TokenType
+from segment_fql.lexer.shared_tokens import SYMBOL_TOKENS, RESERVED_KEYWORDS
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+
+# Internally a statement is a disjunction of `and` groups: a list of groups, each a
+# list of items. `[]` is false and `[[]]` is true. An item is `('leaf', node)` for
+# conditions and function calls, `('not', form)`, or `('form', form)` for a
+# disjunction nested in an `and` group.
+FALSE = []
+TRUE = [[]]
+
+
+def count_nodes(node):
+    '''Number of AST nodes and tokens in the tree under `node`.'''
+    count = 0
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        count += 1
+        if isinstance(node, ASTNode):
+            pending.extend(node.children)
+    return count
+
+
+def node_key(node):
+    '''A hashable structural key: equal keys mean identical sub-trees.'''
+    if not isinstance(node, ASTNode):
+        return (node.type, node.value)
+    return (node.type, tuple(node_key(child) for child in node.children))
+
+
+class Optimizer:
+    '''
+    Rewrites a parsed AST into a smaller one that evaluates the same way:
+
+    - double negations are removed, and `!(...)` around `=`/`!=` conditions is
+      pushed inside (`!(a = 1 or b = 2)` becomes `a != 1 and b != 2`);
+    - conditions without fields, such as `true`, `null` or `1 = 1`, are folded,
+      then `true and x` becomes `x`, `false or x` becomes `x`, and so on;
+    - repeated conditions and `or` branches are dropped;
+    - `and` groups that can never match, e.g. `a = "x" and a = "y"` or
+      `a = 1 and a != 1`, are dropped, and `x or !(x)` becomes `true`;
+    - `a = "x" or a = "y" or ...` becomes `a = ["x", "y", ...]`, and
+      `a != "x" and a != "y"` becomes `a != ["x", "y"]`.
+
+    The result has the parser's shape, so every evaluator accepts it. `and`/`or`
+    chains are flattened while rewriting and rebuilt as right-nested statements.
+    '''
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.nodes_before = None
+        self.nodes_after = None
+
+    def optimize(self):
+        form = self.normal_form()
+        root = ASTNode(ASTType.ROOT, [self._statement_node(form)])
+        self.nodes_before = count_nodes(self.ast)
+        self.nodes_after = count_nodes(root)
+        return root
+
+    def stats(self):
+        return {'nodes_before': self.nodes_before, 'nodes_after': self.nodes_after}
+
+    def normal_form(self):
+        '''The simplified disjunction of `and` groups (see `FALSE` and `TRUE` above) that `optimize()` rebuilds.'''
+        return self._statement(semantics.root_statement(self.ast))
+
+    def _statement(self, node):
+        groups = []
+        for group in semantics.disjunction(node):
+            groups.extend(self._conjunction([self._operand(operand) for operand in group]))
+        return self._disjunction(groups)
+
+    def _operand(self, node):
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.STATEMENT:
+                return self._statement(node)
+            if node.type == ASTType.GROUPING:
+                return self._operand(node.children[0])
+            if node.type == ASTType.NOT:
+                return self._negation(self._operand(node.children[0]))
+
+        if not semantics.query_paths(node):
+            # Nothing depends on the event: evaluate it once.
+            return TRUE if Compiler(node).compile()({}) else FALSE
+        return [[('leaf', node)]]
+
+    def _negation(self, form):
+        if form == FALSE:
+            return TRUE
+        if form == TRUE:
+            return FALSE
+
+        # De Morgan, when every condition can be negated without a `!`.
+        negated = [[self._negated(item) for item in group] for group in form]
+        if all(value is not None for group in negated for value in group):
+            if len(form) == 1:
+                return self._disjunction([group for value in negated[0] for group in value])
+            if all(len(group) == 1 for group in form):
+                return self._conjunction([group[0] for group in negated])
+        return [[('not', form)]]
+
+    def _negated(self, item):
+        kind, value = item
+        if kind == 'not':
+            return value
+        if kind == 'leaf':
+            flipped = self._flipped(value)
+            if flipped is not None:
+                return [[('leaf', flipped)]]
+        return None
+
+    def _flipped(self, node):
+        '''`x != y` for `x = y` and the other way round; `None` for anything else.'''
+        if not isinstance(node, ASTNode) or node.type != ASTType.CONDITIONAL:
+            return None
+        left, operator, right = node.children
+        if operator.value == '=':
+            return ASTNode(ASTType.CONDITIONAL, [left, SYMBOL_TOKENS['!='], right])
+        if operator.value == '!=':
+            return ASTNode(ASTType.CONDITIONAL, [left, SYMBOL_TOKENS['='], right])
+        return None
+
+    def _conjunction(self, forms):
+        '''The groups of `forms` joined by `and`.'''
+        items = []
+        for form in forms:
+            if form == FALSE:
+                return FALSE
+            if len(form) == 1:
+                items.extend(form[0])
+            else:
+                items.append(('form', form))
+
+        if len(items) == 1 and items[0][0] == 'form':
+            return items[0][1]
+        items = self._group(items)
+        return FALSE if items is None else [items]
+
+    def _group(self, items):
+        '''Simplifies the items of an `and` group; `None` when the group can never match.'''
+        unique = {}
+        for item in items:
+            unique.setdefault(self._key(item), item)
+        items = list(unique.values())
+        keys = set(unique)
+        for kind, value in items:
+            if kind == 'not' and len(value) == 1 and len(value[0]) == 1 and self._key(value[0][0]) in keys:
+                return None
+
+        equal = {}
+        unequal = {}
+        for index, item in enumerate(items):
+            equality = self._equality(item)
+            if equality is not None:
+                path, operator, values, _ = equality
+                (equal if operator == '=' else unequal).setdefault(path, []).append((index, values))
+
+        for path, constraints in equal.items():
+            allowed = constraints[0][1]
+            for _, values in constraints[1:]:
+                allowed = self._intersection(allowed, values)
+            # No value satisfies every `=` of the path without hitting one of its `!=`.
+            excluded = [values for _, values in unequal.get(path, [])]
+            if all(any(member in values for values in excluded) for member in allowed):
+                return None
+
+        return self._merge(items, unequal, '!=')
+
+    def _disjunction(self, groups):
+        if any(not group for group in groups):
+            return TRUE
+
+        unique = {}
+        for group in groups:
+            unique.setdefault(frozenset(self._key(item) for item in group), group)
+        groups = list(unique.values())
+
+        singles = set(self._key(group[0]) for group in groups if len(group) == 1)
+        for group in groups:
+            if len(group) == 1 and group[0][0] == 'not':
+                inner = group[0][1]
+                if len(inner) == 1 and len(inner[0]) == 1 and self._key(inner[0][0]) in singles:
+                    return TRUE
+
+        equal = {}
+        unequal = {}
+        for index, group in enumerate(groups):
+            equality = self._equality(group[0]) if len(group) == 1 else None
+            if equality is not None:
+                path, operator, values, _ = equality
+                (equal if operator == '=' else unequal).setdefault(path, []).append((index, values))
+
+        # `a = "x" or a != "x"`: every value that a `!=` branch rejects, an `=` branch accepts.
+        for path, constraints in unequal.items():
+            accepted = [values for _, values in equal.get(path, [])]
+            for _, values in constraints:
+                if all(any(member in found for found in accepted) for member in values):
+                    return TRUE
+
+        merged = self._merge([group[0] if len(group) == 1 else group for group in groups], equal, '=')
+        return [item if isinstance(item, list) else [item] for item in merged]
+
+    def _merge(self, items, constraints, operator):
+        '''Replaces two or more `path <operator> ...` items on one path by a single list condition.'''
+        replaced = {}
+        for path, found in constraints.items():
+            if len(found) < 2:
+                continue
+            tokens = {}
+            for index, _ in found:
+                for token in self._equality(items[index])[3]:
+                    tokens.setdefault((token.type, token.value), token)
+                replaced[index] = None
+            left = items[found[0][0]][1].children[0]
+            condition = ASTNode(ASTType.CONDITIONAL, [left, SYMBOL_TOKENS[operator], ASTNode(ASTType.LIST, list(tokens.values()))])
+            replaced[found[0][0]] = ('leaf', condition)
+
+        if not replaced:
+            return items
+        return [replaced.get(index, item) for index, item in enumerate(items) if replaced.get(index, item) is not None]
+
+    def _equality(self, item):
+        '''`(path, operator, ValueSet, literal tokens)` for `path = literal` and `path != literal` leaves.'''
+        if item[0] != 'leaf':
+            return None
+        node = item[1]
+        if not isinstance(node, ASTNode) or node.type != ASTType.CONDITIONAL:
+            return None
+
+        left, operator, right = node.children
+        if operator.value not in ['=', '!=']:
+            return None
+        if isinstance(left, ASTNode):
+            if left.type != ASTType.PATH or semantics.path_literal(left)[0]:
+                return None
+        elif left.type != TokenType.Ident or semantics.literal_value(left)[0]:
+            return None
+
+        if isinstance(right, ASTNode):
+            if right.type == ASTType.LIST:
+                tokens = list(right.children)
+            elif semantics.path_literal(right)[0]:
+                tokens = [right.children[0]]
+            else:
+                return None
+        elif semantics.literal_value(right)[0]:
+            tokens = [right]
+        else:
+            return None
+
+        values = semantics.ValueSet(semantics.literal_value(token)[1] for token in tokens)
+        return tuple(semantics.path_keys(left)), operator.value, values, tokens
+
+    def _intersection(self, left, right):
+        values = semantics.ValueSet([])
+        values.strings = left.strings & right.strings
+        values.numbers = left.numbers & right.numbers
+        values.constants = tuple(constant for constant in left.constants if constant in right.constants)
+        return values
+
+    def _key(self, item):
+        kind, value = item
+        if kind == 'leaf':
+            return node_key(value)
+        return (kind, self._form_key(value))
+
+    def _form_key(self, form):
+        return frozenset(frozenset(self._key(item) for item in group) for group in form)
+
+    def _statement_node(self, form):
+        if form == FALSE:
+            return ASTNode(ASTType.STATEMENT, [ASTNode(ASTType.EXPR, [RESERVED_KEYWORDS['false']])])
+        if form == TRUE:
+            return ASTNode(ASTType.STATEMENT, [ASTNode(ASTType.EXPR, [RESERVED_KEYWORDS['true']])])
+
+        pieces = []
+        for group in form:
+            for index, item in enumerate(group):
+                if pieces:
+                    pieces.append(RESERVED_KEYWORDS['and' if index else 'or'])
+                pieces.append(self._item_node(item))
+
+        node = ASTNode(ASTType.STATEMENT, [pieces[-1]])
+        for index in range(len(pieces) - 3, -1, -2):
+            node = ASTNode(ASTType.STATEMENT, [pieces[index], pieces[index + 1], node])
+        return node
+
+    def _item_node(self, item):
+        kind, value = item
+        if kind == 'leaf':
+            return value
+        if kind == 'not':
+            return ASTNode(ASTType.NOT, [ASTNode(ASTType.GROUPING, [self._statement_node(value)])])
+        # A disjunction inside an `and` group can only be written negated twice,
+        # or once around its complement, e.g. `!(a = 1 and b = 2)`.
+        return ASTNode(ASTType.NOT, [ASTNode(ASTType.GROUPING, [self._statement_node(self._negation(value))])])
@@ -0,0 +1,88 @@
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+from segment_fql.compiler.optimizer import Optimizer, FALSE, TRUE, count_nodes
+
+NESTED = frozenset([ASTType.STATEMENT, ASTType.GROUPING, ASTType.NOT])
+
+
+def frozen_copy(node):
+    '''
+    A frozen copy of `node` that leaves `node` itself untouched. Sub-trees that
+    are already frozen are shared instead of copied.
+    '''
+    if not isinstance(node, ASTNode) or type(node.children) is tuple:
+        return node
+
+    copies = {}
+    pending = [(node, False)]
+    while pending:
+        current, ready = pending.pop()
+        if ready:
+            copy = ASTNode(current.type)
+            copy.children = tuple(copies.get(id(child), child) for child in current.children)
+            copies[id(current)] = copy
+            continue
+        pending.append((current, True))
+        pending.extend(
+            (child, False) for child in current.children
+            if isinstance(child, ASTNode) and type(child.children) is not tuple and id(child) not in copies
+        )
+    return copies[id(node)]
+
+
+class Residual:
+    '''
+    What is left of a filter once some fields are known. `always` is `True` or
+    `False` when the known fields decide the filter, `None` otherwise. `ast` is
+    the frozen AST still to evaluate; calling the residual evaluates it. Nodes
+    kept from an unfrozen input AST are copied, so the input is never changed.
+    '''
+    __slots__ = ('ast', 'always', 'predicate')
+
+    def __init__(self, ast, always):
+        self.ast = frozen_copy(ast)
+        self.always = always
+        self.predicate = Compiler(self.ast).compile()
+
+    def __repr__(self):
+        return f'Residual(always={self.always!r})'
+
+    def __call__(self, event):
+        return self.predicate(event)
+
+
+class PartialEvaluator(Optimizer):
+    '''
+    Specializes a parsed AST for events whose top-level fields `known` are
+    already known, e.g. `{'event': 'Order Completed'}` at routing time. Each
+    known value must be the event's whole value for that field; `None` stands
+    for a missing field.
+
+    Conditions and function calls that only read known fields are evaluated
+    once and replaced by `true` or `false`, then `Optimizer` folds what is left:
+
+        PartialEvaluator(ast, {'event': 'A'}).specialize()
+
+    turns `event = "A" and properties.x > 1 or event = "B"` into
+    `properties.x > 1`. For events that agree with `known`, the residual
+    matches exactly when the original AST does.
+    '''
+
+    def __init__(self, ast, known):
+        super().__init__(ast)
+        self.known = known
+
+    def specialize(self):
+        form = self.normal_form()
+        root = ASTNode(ASTType.ROOT, [self._statement_node(form)])
+        self.nodes_before = count_nodes(self.ast)
+        self.nodes_after = count_nodes(root)
+        return Residual(root, True if form == TRUE else False if form == FALSE else None)
+
+    def _operand(self, node):
+        if not isinstance(node, ASTNode) or node.type not in NESTED:
+            paths = semantics.query_paths(node)
+            if paths and all(path[0] in self.known for path in paths):
+                return TRUE if Compiler(node).compile()(self.known) else FALSE
+        return super()._operand(node)
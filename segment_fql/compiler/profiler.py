@@ -0,0 +1,195 @@
+import json
+import time
+
+from segment_fql.lexer import TokenType
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler.compiler import Compiler
+
+# Counters of one profiled node, kept in a list so the closures update them in place.
+EVALUATIONS, MATCHES, SAMPLES, TIME_NS = range(4)
+
+
+def node_text(node):
+    '''FQL source for an AST node or token, e.g. `properties.revenue > 10`.'''
+    if not isinstance(node, ASTNode):
+        if node.type == TokenType.String:
+            return f'"{node.value}"'
+        return str(node.value)
+
+    if node.type == ASTType.PATH:
+        return ''.join(node_text(child) for child in node.children)
+    if node.type == ASTType.FUNC:
+        return f'{node.children[0].value}({", ".join(node_text(child) for child in node.children[1:])})'
+    if node.type == ASTType.LIST:
+        return f'[{", ".join(node_text(child) for child in node.children)}]'
+    if node.type == ASTType.NOT:
+        return f'!({node_text(node.children[0])})'
+    return ' '.join(node_text(child) for child in node.children)
+
+
+def node_kind(node):
+    '''`conditional`, `function`, `not`, `statement` or `value`, as reported for a profiled node.'''
+    if isinstance(node, ASTNode) and node.type == ASTType.EXPR:
+        node = node.children[0]
+    if not isinstance(node, ASTNode):
+        return 'value'
+    if node.type == ASTType.FUNC:
+        return 'function'
+    if node.type == ASTType.PATH:
+        return 'value'
+    return node.type.value
+
+
+class Profiler:
+    '''
+    Counts, per AST node, how often a filter evaluates it and how often it is
+    true, and samples its wall time; `trace(event)` shows which nodes one event
+    evaluated and which were skipped by `and`/`or` short-circuiting.
+
+    Profiled nodes are conditions, function calls, `!(...)` and `and`/`or`
+    statements, numbered in source order. A node is timed on every
+    `sample_every`-th evaluation (`None` never times), and its time includes its
+    children.
+
+    Instrumentation lives in a second predicate, compiled next to the plain one:
+    `profiler.predicate` is whichever is enabled, so a disabled profiler
+    evaluates exactly like the plain filter (calling `profiler(event)` adds one
+    Python call) and `Filter.predicate` is never affected. Counters are not
+    locked; profile from one thread at a time.
+    '''
+
+    def __init__(self, ast, sample_every=16):
+        self.ast = ast
+        self.sample_every = sample_every
+        # `(kind, text)` per profiled node.
+        self.nodes = []
+        self.counters = []
+        self.parents = []
+        self.tracing = None
+        self.plain = Compiler(ast).compile()
+        self.instrumented = InstrumentingCompiler(self).compile()
+        self.predicate = self.instrumented
+        self.enabled = True
+
+    def __call__(self, event):
+        return self.predicate(event)
+
+    def enable(self):
+        self.predicate = self.instrumented
+        self.enabled = True
+
+    def disable(self):
+        self.predicate = self.plain
+        self.enabled = False
+
+    def reset(self):
+        for counters in self.counters:
+            counters[:] = [0, 0, 0, 0]
+
+    def trace(self, event):
+        '''
+        Evaluates `event` once and returns `{'result': ..., 'nodes': [...]}`, with
+        per node its `result` (`None` if it was not evaluated) and whether it was
+        `short_circuited`: not evaluated although its parent was. The event is
+        counted in `stats()` like any other.
+        '''
+        self.tracing = results = {}
+        try:
+            result = self.instrumented(event)
+        finally:
+            self.tracing = None
+
+        nodes = []
+        for index, (kind, text) in enumerate(self.nodes):
+            parent = self.parents[index]
+            parent_evaluated = parent is None or parent in results
+            nodes.append({
+                'id': index,
+                'parent': parent,
+                'kind': kind,
+                'text': text,
+                'result': results.get(index),
+                'short_circuited': index not in results and parent_evaluated,
+            })
+        return {'result': result, 'nodes': nodes}
+
+    def stats(self):
+        '''`{node id: flat dict of counters}` in source order.'''
+        stats = {}
+        for index, (kind, text) in enumerate(self.nodes):
+            evaluations, matches, samples, time_ns = self.counters[index]
+            stats[index] = {
+                'id': index,
+                'parent': self.parents[index],
+                'kind': kind,
+                'text': text,
+                'evaluations': evaluations,
+                'matches': matches,
+                'match_rate': matches / evaluations if evaluations else 0.0,
+                'samples': samples,
+                'time_ns': time_ns,
+                'mean_ns': time_ns / samples if samples else 0.0,
+            }
+        return stats
+
+    def to_json_lines(self):
+        '''`stats()` as JSON lines, one node per line.'''
+        return ''.join(json.dumps(record) + '\n' for record in self.stats().values())
+
+    def _register(self, node, parent):
+        self.nodes.append((node_kind(node), node_text(node)))
+        self.counters.append([0, 0, 0, 0])
+        self.parents.append(parent)
+        return len(self.nodes) - 1
+
+    def _instrument(self, index, predicate):
+        profiler = self
+        counters = self.counters[index]
+        every = self.sample_every or 0
+        clock = time.perf_counter_ns
+
+        def profiled(event):
+            counters[EVALUATIONS] += 1
+            if every and not counters[EVALUATIONS] % every:
+                start = clock()
+                result = predicate(event)
+                counters[TIME_NS] += clock() - start
+                counters[SAMPLES] += 1
+            else:
+                result = predicate(event)
+            if result:
+                counters[MATCHES] += 1
+            if profiler.tracing is not None:
+                profiler.tracing[index] = bool(result)
+            return result
+        return profiled
+
+
+class InstrumentingCompiler(Compiler):
+    '''`Compiler` that wraps the predicate of every node `Profiler` reports on.'''
+
+    def __init__(self, profiler):
+        super().__init__(profiler.ast)
+        self.profiler = profiler
+        self.parent = None
+
+    def _predicate(self, node):
+        if not self._profiled(node):
+            return super()._predicate(node)
+
+        parent = self.parent
+        index = self.profiler._register(node, parent)
+        self.parent = index
+        try:
+            predicate = super()._predicate(node)
+        finally:
+            self.parent = parent
+        return self.profiler._instrument(index, predicate)
+
+    def _profiled(self, node):
+        if not isinstance(node, ASTNode):
+            return True
+        if node.type in [ASTType.ROOT, ASTType.GROUPING]:
+            return False
+        # A statement without `and`/`or` is just its operand, which is profiled itself.
+        return node.type != ASTType.STATEMENT or len(node.children) > 1
@@ -0,0 +1,279 @@
+import json
+import re
+
+from segment_fql.compiler import semantics
+from segment_fql.compiler.compiler import Compiler
+
+WHITESPACE = re.compile(rb'[ \t\n\r]*')
+STRING = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"', re.S)
+SCALAR = re.compile(rb'[^,}\] \t\n\r]*')
+# Everything up to the next bracket, jumping over whole strings (which may contain brackets).
+SKIP = re.compile(rb'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*', re.S)
+
+QUOTE, COLON, COMMA, BACKSLASH, SPACE = b'"'[0], b':'[0], b','[0], b'\\'[0], b' '[0]
+OPENING = frozenset(b'{[')
+WHITESPACE_BYTES = frozenset(b' \t\n\r')
+CLOSING = frozenset(b'}]')
+OBJECT_START, OBJECT_END, ARRAY_END = b'{'[0], b'}'[0], b']'[0]
+CLOSING_OF = {b'{': b'}', b'[': b']'}
+# `translate` tables deleting everything but quotes, backslashes and one kind of bracket.
+KEEP_ONLY = {
+    opening: bytes(char for char in range(256) if char not in b'"\\' + opening + closing)
+    for opening, closing in CLOSING_OF.items()
+}
+CONSTANTS = {b'true': True, b'false': False, b'null': None}
+
+
+def projection_trie(paths):
+    '''
+    Nested dict of the keys to decode: `None` marks a value needed whole. A path
+    that is a prefix of another, e.g. `properties` and `properties.url`, wins.
+    '''
+    trie = {}
+    for keys in paths:
+        node = trie
+        for key in keys[:-1]:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+    return trie
+
+
+class ProjectedEvaluator:
+    '''
+    Evaluates a filter straight from a JSON payload (`bytes`, `bytearray` or
+    `memoryview`). Only the paths the filter reads are decoded, into a sparse
+    dict such as `{'event': ..., 'properties': {'url': ...}}`; every other value
+    is skipped without being decoded, and scanning stops as soon as all paths
+    have been found.
+
+    Skipped values are not validated, so this is not a JSON validator. Because
+    of the early stop, a duplicated key resolves to its first occurrence.
+    '''
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.paths = semantics.query_paths(ast)
+        self.trie = projection_trie(self.paths)
+        self.predicate = Compiler(ast).compile()
+
+    def __call__(self, data):
+        return self.predicate(self.project(data))
+
+    def evaluate(self, data):
+        return self.predicate(self.project(data))
+
+    def project(self, data):
+        found = {}
+        if not self.trie:
+            return found
+
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        pos = self._whitespace(data, 0)
+        if data[pos:pos + 1] != b'{':
+            raise Exception('Expected a JSON object')
+        try:
+            self._object(data, pos, self.trie, found, False)
+        except IndexError:
+            raise Exception('Unexpected end of JSON')
+        return found
+
+    def _whitespace(self, data, pos):
+        if data[pos] not in WHITESPACE_BYTES:
+            return pos
+        # `json.dumps` separators put exactly one space after `,` and `:`.
+        if data[pos] == SPACE and data[pos + 1] not in WHITESPACE_BYTES:
+            return pos + 1
+        return WHITESPACE.match(data, pos).end()
+
+    def _error(self, data, pos):
+        if pos >= len(data):
+            raise Exception('Unexpected end of JSON')
+        raise Exception(f'Invalid JSON at position {pos}')
+
+    def _object(self, data, pos, trie, found, close):
+        '''
+        Collects the keys of `trie` from the object at `pos` into `found`.
+        Returns the position after the object or, once every key was found and
+        `close` is false, `None` without reading the rest.
+        '''
+        find = data.find
+        remaining = len(trie)
+        pos = self._whitespace(data, pos + 1)
+        if data[pos] == OBJECT_END:
+            return pos + 1
+
+        while True:
+            if data[pos] != QUOTE:
+                self._error(data, pos)
+            end = find(b'"', pos + 1)
+            if end != -1 and data[end - 1] != BACKSLASH:
+                # `_string` unescapes keys such as `"caf\u00e9"`, which `json.dumps` writes by default.
+                key = self._string(data[pos + 1:end])
+                pos = end + 1
+            else:
+                end = self._skip_string(data, pos)
+                key = self._string(data[pos + 1:end - 1])
+                pos = end
+
+            if data[pos] != COLON:
+                pos = self._whitespace(data, pos)
+                if data[pos] != COLON:
+                    self._error(data, pos)
+            pos = self._whitespace(data, pos + 1)
+
+            if key in trie and key not in found:
+                child = trie[key]
+                if child is None:
+                    end = self._skip(data, pos)
+                    found[key] = self._decode(data, pos, end)
+                elif data[pos] == OBJECT_START:
+                    found[key] = {}
+                    end = self._object(data, pos, child, found[key], True)
+                else:
+                    # Not an object, so none of the nested paths exist.
+                    end = self._skip(data, pos)
+                    found[key] = None
+
+                remaining -= 1
+                if remaining == 0:
+                    return self._close(data, end, b'{') if close else None
+                pos = end
+            elif data[pos] == QUOTE:
+                end = find(b'"', pos + 1)
+                pos = end + 1 if end != -1 and data[end - 1] != BACKSLASH else self._skip_string(data, pos)
+            else:
+                pos = self._skip(data, pos)
+
+            char = data[pos]
+            if char in WHITESPACE_BYTES:
+                pos = self._whitespace(data, pos)
+                char = data[pos]
+            if char == COMMA:
+                pos = self._whitespace(data, pos + 1)
+            elif char == OBJECT_END:
+                return pos + 1
+            else:
+                self._error(data, pos)
+
+    def _skip(self, data, pos):
+        '''Position after the value starting at `pos`.'''
+        char = data[pos]
+        if char == QUOTE:
+            return self._skip_string(data, pos)
+        if char in OPENING:
+            return self._close(data, pos + 1, data[pos:pos + 1])
+
+        end = SCALAR.match(data, pos).end()
+        if end == pos:
+            self._error(data, pos)
+        return end
+
+    def _skip_string(self, data, pos):
+        '''Position after the string starting at `pos`.'''
+        end = data.find(b'"', pos + 1)
+        if end != -1 and data[end - 1] != BACKSLASH:
+            return end + 1
+
+        matched = STRING.match(data, pos)
+        if matched is None:
+            self._error(data, len(data))
+        return matched.end()
+
+    def _close(self, data, pos, opening):
+        '''
+        Position after the `opening` container that is open at `pos`. Brackets are counted on a skeleton of each window that keeps only
+        quotes, backslashes and this kind of bracket: strings without brackets
+        or escapes reduce to `""` and are dropped, anything else falls back to
+        `_close_exactly`. Windows end on a closing bracket and double in size,
+        so only the one holding the match is walked bracket by bracket.
+        '''
+        closing = CLOSING_OF[opening]
+        delete = KEEP_ONLY[opening]
+        depth = 1
+        start = pos
+        window = 1024
+        while True:
+            end = data.find(closing, start + window)
+            if end == -1:
+                end = data.rfind(closing, start)
+                if end == -1:
+                    self._error(data, len(data))
+
+            skeleton = data[start:end + 1].translate(None, delete).replace(b'""', b'')
+            if b'"' in skeleton or b'\\' in skeleton:
+                return self._close_exactly(data, pos)
+
+            # Collapsing matched pairs leaves `]]...[[`: its closing brackets are
+            # how far below the window's starting depth it reaches.
+            reduced = skeleton
+            while True:
+                shorter = reduced.replace(opening + closing, b'')
+                if len(shorter) == len(reduced):
+                    break
+                reduced = shorter
+
+            lowest = reduced.count(closing)
+            if lowest < depth:
+                if data.find(closing, end + 1) == -1:
+                    self._error(data, len(data))
+                depth += len(reduced) - 2 * lowest
+                start = end + 1
+                window *= 2
+                continue
+
+            closed = 0
+            for char in skeleton:
+                if char == OBJECT_END or char == ARRAY_END:
+                    closed += 1
+                    depth -= 1
+                    if depth == 0:
+                        break
+                else:
+                    depth += 1
+
+            end = start - 1
+            for _ in range(closed):
+                end = data.find(closing, end + 1)
+            return end + 1
+
+    def _close_exactly(self, data, pos):
+        '''Position after the container that is open at `pos`, scanning every bracket.'''
+        depth = 1
+        length = len(data)
+        while True:
+            pos = SKIP.match(data, pos).end()
+            if pos >= length:
+                self._error(data, pos)
+
+            char = data[pos]
+            if char in OPENING:
+                depth += 1
+            elif char in CLOSING:
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            else:
+                # An unterminated string.
+                self._error(data, length)
+            pos += 1
+
+    def _string(self, raw):
+        if b'\\' in raw:
+            return json.loads(b'"' + raw + b'"')
+        return raw.decode('utf-8')
+
+    def _decode(self, data, start, end):
+        raw = bytes(data[start:end])
+        if raw[0] == QUOTE:
+            return self._string(raw[1:-1])
+        if raw in CONSTANTS:
+            return CONSTANTS[raw]
+        try:
+            return json.loads(raw)
+        except ValueError:
+            self._error(data, start)
@@ -0,0 +1,214 @@
+from segment_fql.lexer import TokenType
+from segment_fql.parser import ASTNode, ASTType
+
+LITERAL_IDENTIFIERS = {'true': True, 'false': False, 'null': None}
+COMPARISON_OPERATORS = ['=', '!=', '>', '<', '>=', '<=']
+MISSING = None
+
+
+def is_number(value):
+    return (type(value) is int or type(value) is float) and value is not True and value is not False
+
+
+def equals(left, right):
+    '''FQL equality: like `==`, but booleans never equal numbers.'''
+    if (left is True or left is False) != (right is True or right is False):
+        return False
+    return left == right
+
+
+class ValueSet:
+    '''
+    The values of a list literal, hashed so that membership costs the same for
+    ten values as for a hundred thousand. Strings, numbers and `true`/`false`/
+    `null` are kept apart, so that, as with `=`, booleans never equal numbers.
+    '''
+
+    __slots__ = ('strings', 'numbers', 'constants')
+
+    def __init__(self, values):
+        values = list(values)
+        self.strings = frozenset(value for value in values if type(value) is str)
+        self.numbers = frozenset(value for value in values if is_number(value))
+        self.constants = tuple(constant for constant in [None, True, False] if any(value is constant for value in values))
+
+    def __contains__(self, value):
+        if type(value) is str:
+            return value in self.strings
+        if value is None or value is True or value is False:
+            return value in self.constants
+        if is_number(value):
+            return value in self.numbers
+        return False
+
+    def __len__(self):
+        return len(self.strings) + len(self.numbers) + len(self.constants)
+
+    def __iter__(self):
+        yield from self.strings
+        yield from self.numbers
+        yield from self.constants
+
+    def __eq__(self, other):
+        if type(other) is not ValueSet:
+            return NotImplemented
+        return (self.strings, self.numbers, self.constants) == (other.strings, other.numbers, other.constants)
+
+    def __hash__(self):
+        return hash((self.strings, self.numbers, self.constants))
+
+    def __repr__(self):
+        return f'ValueSet({sorted(self.strings) + sorted(self.numbers) + list(self.constants)!r})'
+
+
+def compare(operator, left, right):
+    if operator == '=':
+        if type(right) is ValueSet:
+            return left in right
+        return equals(left, right)
+    if operator == '!=':
+        if type(right) is ValueSet:
+            return left not in right
+        return not equals(left, right)
+
+    # Ordering only makes sense between two numbers or two strings.
+    if not ((is_number(left) and is_number(right)) or (type(left) is str and type(right) is str)):
+        return False
+
+    if operator == '>':
+        return left > right
+    if operator == '<':
+        return left < right
+    if operator == '>=':
+        return left >= right
+    if operator == '<=':
+        return left <= right
+
+    raise Exception(f'Unsupported operator: {operator}')
+
+
+def resolve(event, keys):
+    value = event
+    for key in keys:
+        if not isinstance(value, dict):
+            return MISSING
+        value = value.get(key, MISSING)
+    return value
+
+
+def number_value(token):
+    try:
+        if '.' in token.value:
+            return float(token.value)
+        return int(token.value)
+    except ValueError:
+        raise Exception(f'Invalid number: {token.value}')
+
+
+def literal_value(token):
+    '''Returns `(True, value)` for literal tokens and `(False, None)` for field references.'''
+    if token.type == TokenType.String:
+        return True, token.value
+    if token.type == TokenType.Number:
+        return True, number_value(token)
+    if token.type == TokenType.Null:
+        return True, None
+    if token.type == TokenType.Ident and token.value in LITERAL_IDENTIFIERS:
+        return True, LITERAL_IDENTIFIERS[token.value]
+    return False, None
+
+
+def list_value(node):
+    '''The `ValueSet` of a `list` node.'''
+    values = []
+    for token in node.children:
+        is_literal, value = literal_value(token)
+        if not is_literal:
+            raise Exception(f'Unsupported list value: {token.type} ({token.value})')
+        values.append(value)
+    return ValueSet(values)
+
+
+def path_keys(node):
+    '''Field names of an identifier token or a `path` node, e.g. `['properties', 'url']`.'''
+    if not isinstance(node, ASTNode):
+        if node.type != TokenType.Ident:
+            raise Exception(f'Expected identifier, got {node.type} ({node.value})')
+        return [node.value]
+
+    keys = [child.value for child in node.children if child.type == TokenType.Ident]
+    if not keys or node.children[0].type != TokenType.Ident:
+        raise Exception(f'Invalid path: {node.children}')
+    return keys
+
+
+def path_literal(node):
+    '''`x = true` parses `true` as a one-element path; treat those as literals.'''
+    if isinstance(node, ASTNode) and node.type == ASTType.PATH and len(node.children) == 1:
+        return literal_value(node.children[0])
+    return False, None
+
+
+def query_paths(node):
+    '''Field paths a query reads, in order of first use, e.g. `[('event',), ('properties', 'url')]`.'''
+    paths = {}
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.PATH:
+                if not path_literal(node)[0]:
+                    paths[tuple(path_keys(node))] = True
+                continue
+            if node.type == ASTType.LIST:
+                continue
+            # A function's first child is its name, not a field.
+            children = node.children[1:] if node.type == ASTType.FUNC else node.children
+            stack.extend(reversed(children))
+        elif node.type == TokenType.Ident and not literal_value(node)[0]:
+            paths[(node.value,)] = True
+    return list(paths)
+
+
+def statement_chain(node):
+    '''
+    Flattens a right-nested `statement` into its operands and logical connectors,
+    e.g. `a and b or c` into `([a, b, c], ['and', 'or'])`.
+    '''
+    operands = []
+    connectors = []
+    while True:
+        operands.append(node.children[0])
+        if len(node.children) == 1:
+            return operands, connectors
+
+        if len(node.children) != 3 or node.children[1].type != TokenType.Logical:
+            raise Exception(f'Malformed statement: {node.children}')
+
+        connectors.append(node.children[1].value)
+        node = node.children[2]
+
+
+def disjunction(node):
+    '''
+    Groups a `statement` chain into a list of `and` groups joined by `or`, so `and`
+    binds tighter than `or`: `a and b or c` becomes `[[a, b], [c]]`.
+    '''
+    operands, connectors = statement_chain(node)
+    groups = [[operands[0]]]
+    for connector, operand in zip(connectors, operands[1:]):
+        if connector == 'and':
+            groups[-1].append(operand)
+        elif connector == 'or':
+            groups.append([operand])
+        else:
+            raise Exception(f'Unsupported logical operator: {connector}')
+    return groups
+
+
+def root_statement(node):
+    if node.type != ASTType.ROOT:
+        return node
+    if len(node.children) != 1:
+        raise Exception(f'Unsupported root node: {node.children}')
+    return node.children[0]
@@ -0,0 +1,365 @@
+import json
+from abc import ABC, abstractmethod
+
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import semantics
+from segment_fql.functions import default_registry
+
+# Normalized JSON types, as `SQLDialect.type_of` reports them.
+NUMBER, STRING, TRUE, FALSE, NULL, OBJECT, ARRAY = 'number', 'string', 'true', 'false', 'null', 'object', 'array'
+
+MIRRORED = {'>': '<', '<': '>', '>=': '<=', '<=': '>='}
+
+
+def sqlite_glob(pattern):
+    '''
+    The SQLite `GLOB` pattern for an `fnmatch` glob: `[!...]` becomes `[^...]`,
+    a leading `^` in a set is moved so it stays literal, and an unclosed `[` is
+    matched literally, as `fnmatch` does.
+    '''
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        index += 1
+        if char != '[':
+            parts.append(char)
+            continue
+
+        end = index
+        if end < len(pattern) and pattern[end] == '!':
+            end += 1
+        if end < len(pattern) and pattern[end] == ']':
+            end += 1
+        end = pattern.find(']', end)
+        if end == -1:
+            parts.append('[[]')
+            continue
+
+        members = pattern[index:end]
+        index = end + 1
+        negated = members.startswith('!')
+        body = members[1:] if negated else members
+        for position in range(len(body) - 2):
+            if body[position + 1] == '-' and (body[position] > body[position + 2] or body[position] == ']'):
+                # `fnmatch` drops reversed ranges, and SQLite reads `]-` differently.
+                raise Exception(f'Unsupported glob in SQL: {pattern}')
+
+        if negated:
+            parts.append(f'[^{body}]')
+        elif body.startswith('^'):
+            # A literal `^` must not come first in SQLite, nor follow a `-`; it cannot move if it starts a range.
+            rest = body.lstrip('^')
+            if rest.startswith('-'):
+                raise Exception(f'Unsupported glob in SQL: {pattern}')
+            if not rest:
+                parts.append('^')
+            elif rest.endswith('-'):
+                parts.append(f'[{rest[:-1]}^-]')
+            else:
+                parts.append(f'[{rest}^]')
+        else:
+            parts.append(f'[{body}]')
+    return ''.join(parts)
+
+
+class SQLDialect(ABC):
+    '''
+    How one database reads JSON. Events live in a JSON column; the compiler asks
+    the dialect for the type and value at a path and for the SQL of functions.
+    Subclass it for other databases; `SQLiteDialect` is the reference. A
+    subclass missing one of the abstract methods cannot be instantiated.
+
+    Every method returns `(sql, params)`, and every condition it returns must be
+    true or false, never NULL, so that `NOT` works as in FQL.
+    '''
+
+    placeholder = '?'
+    true = '1'
+    false = '0'
+
+    @abstractmethod
+    def type_of(self, column, keys):
+        '''One of `number`, `string`, `true`, `false`, `null`, `object` or `array`; missing paths are `null`.'''
+        raise NotImplementedError
+
+    def type_in(self, column, keys, kinds):
+        sql, params = self.type_of(column, keys)
+        return f'{sql} IN ({", ".join(self.placeholder for _ in kinds)})', params + list(kinds)
+
+    @abstractmethod
+    def value_of(self, column, keys):
+        '''The SQL value at a path: text for strings, a number for numbers.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    def truthy(self, column, keys):
+        raise NotImplementedError
+
+    def in_values(self, value, params, values):
+        '''`value IN (...)`, for a non-empty list of strings or of numbers.'''
+        return f'{value} IN ({", ".join(self.placeholder for _ in values)})', params + list(values)
+
+    @abstractmethod
+    def contains(self, value, params, substring):
+        raise NotImplementedError
+
+    @abstractmethod
+    def match(self, value, params, pattern):
+        raise NotImplementedError
+
+
+class SQLiteDialect(SQLDialect):
+    '''SQLite with the JSON1 functions (built in since SQLite 3.38).'''
+
+    # Longer lists are bound as one JSON array, since SQLite limits the number of parameters.
+    MAXIMUM_BOUND_VALUES = 100
+    TYPES = {NUMBER: ['integer', 'real'], STRING: ['text'], TRUE: ['true'], FALSE: ['false'], NULL: ['null'], OBJECT: ['object'], ARRAY: ['array']}
+
+    def path(self, keys):
+        return '$' + ''.join(f'."{key}"' for key in keys)
+
+    def type_of(self, column, keys):
+        json_type = f"IFNULL(json_type({column}, ?), 'null')"
+        sql = f"CASE {json_type} WHEN 'integer' THEN 'number' WHEN 'real' THEN 'number' WHEN 'text' THEN 'string' ELSE {json_type} END"
+        return sql, [self.path(keys), self.path(keys)]
+
+    def type_in(self, column, keys, kinds):
+        names = [name for kind in kinds for name in self.TYPES[kind]]
+        return f"IFNULL(json_type({column}, ?), 'null') IN ({', '.join('?' for _ in names)})", [self.path(keys)] + names
+
+    def value_of(self, column, keys):
+        return f'json_extract({column}, ?)', [self.path(keys)]
+
+    def truthy(self, column, keys):
+        path = self.path(keys)
+        sql = (
+            f"CASE IFNULL(json_type({column}, ?), 'null') "
+            f"WHEN 'true' THEN 1 WHEN 'integer' THEN json_extract({column}, ?) != 0 WHEN 'real' THEN json_extract({column}, ?) != 0 "
+            f"WHEN 'text' THEN json_extract({column}, ?) != '' WHEN 'object' THEN json_extract({column}, ?) != '{{}}' "
+            f"WHEN 'array' THEN json_extract({column}, ?) != '[]' ELSE 0 END"
+        )
+        return sql, [path] * 6
+
+    def in_values(self, value, params, values):
+        if len(values) <= self.MAXIMUM_BOUND_VALUES:
+            return super().in_values(value, params, values)
+        return f'{value} IN (SELECT value FROM json_each(?))', params + [json.dumps(list(values))]
+
+    def contains(self, value, params, substring):
+        return f'instr({value}, ?) > 0', params + [substring]
+
+    def match(self, value, params, pattern):
+        return f'{value} GLOB ?', params + [sqlite_glob(pattern)]
+
+
+class SQLCompiler:
+    '''
+    Translates a parsed AST into a parameterized SQL `WHERE` condition over
+    events stored as JSON in `column`, for filtering rows inside the database:
+
+        sql, params = SQLCompiler(ast).compile()
+        connection.execute(f'SELECT * FROM events WHERE {sql}', params)
+
+    Paths become JSON extraction, lists `IN (...)`, `contains` a substring test
+    and `match` a glob, and the FQL rules are kept: missing paths are null,
+    booleans never equal numbers and ordering needs two numbers or two strings.
+    Two fields holding objects or arrays are compared as JSON text.
+    '''
+
+    def __init__(self, ast, dialect=None, column='payload'):
+        self.ast = ast
+        self.dialect = dialect or SQLiteDialect()
+        self.column = column
+        self.functions = {
+            'contains': self.dialect.contains,
+            'match': self.dialect.match,
+        }
+
+    def compile(self):
+        '''`(sql, params)` for the whole filter.'''
+        return self._condition(self.ast)
+
+    def _condition(self, node):
+        if not isinstance(node, ASTNode):
+            return self._truthiness(node)
+
+        if node.type == ASTType.ROOT:
+            return self._condition(semantics.root_statement(node))
+
+        if node.type == ASTType.STATEMENT:
+            groups = [self._join('AND', [self._condition(operand) for operand in group]) for group in semantics.disjunction(node)]
+            return self._join('OR', groups)
+
+        if node.type == ASTType.GROUPING:
+            return self._condition(node.children[0])
+
+        if node.type == ASTType.NOT:
+            sql, params = self._condition(node.children[0])
+            return f'NOT ({sql})', params
+
+        if node.type == ASTType.CONDITIONAL:
+            return self._conditional(*node.children)
+
+        if node.type == ASTType.FUNC:
+            return self._function(node)
+
+        if node.type == ASTType.EXPR:
+            return self._truthiness(node.children[0])
+
+        return self._truthiness(node)
+
+    def _join(self, connector, conditions):
+        if len(conditions) == 1:
+            return conditions[0]
+        return f' {connector} '.join(f'({sql})' for sql, _ in conditions), [param for _, params in conditions for param in params]
+
+    def _constant(self, result):
+        return (self.dialect.true if result else self.dialect.false), []
+
+    def _operand(self, node):
+        '''`('literal', value)`, `('field', keys)` or `('boolean', (sql, params))` for functions.'''
+        if isinstance(node, ASTNode):
+            if node.type == ASTType.EXPR:
+                return self._operand(node.children[0])
+            if node.type == ASTType.FUNC:
+                return 'boolean', self._function(node)
+            if node.type == ASTType.LIST:
+                return 'literal', semantics.list_value(node)
+            if node.type == ASTType.PATH:
+                is_literal, value = semantics.path_literal(node)
+                if is_literal:
+                    return 'literal', value
+                return 'field', semantics.path_keys(node)
+            return 'boolean', self._condition(node)
+
+        is_literal, value = semantics.literal_value(node)
+        if is_literal:
+            return 'literal', value
+        return 'field', semantics.path_keys(node)
+
+    def _truthiness(self, node):
+        kind, value = self._operand(node)
+        if kind == 'literal':
+            return self._constant(bool(value))
+        if kind == 'boolean':
+            return value
+        return self.dialect.truthy(self.column, value)
+
+    def _conditional(self, left, operator, right):
+        operator = operator.value
+        if operator not in semantics.COMPARISON_OPERATORS:
+            raise Exception(f'Unsupported operator: {operator}')
+
+        left = self._operand(left)
+        right = self._operand(right)
+        if left[0] == 'literal' and right[0] == 'literal':
+            return self._constant(semantics.compare(operator, left[1], right[1]))
+        if left[0] == 'literal':
+            left, right = right, left
+            operator = MIRRORED.get(operator, operator)
+
+        if operator in ['=', '!=']:
+            sql, params = self._equality(left, right)
+            return (f'NOT ({sql})', params) if operator == '!=' else (sql, params)
+        return self._ordering(left, operator, right)
+
+    def _equality(self, left, right):
+        kind, value = left
+        other_kind, other = right
+
+        if kind == 'boolean':
+            if other_kind == 'literal':
+                members = other if type(other) is semantics.ValueSet else semantics.ValueSet([other])
+                conditions = []
+                if True in members:
+                    conditions.append(value)
+                if False in members:
+                    conditions.append((f'NOT ({value[0]})', value[1]))
+                return self._join('OR', conditions) if conditions else self._constant(False)
+            if other_kind == 'boolean':
+                return f'({value[0]}) = ({other[0]})', value[1] + other[1]
+            return self._equality(right, left)
+
+        if other_kind == 'literal':
+            return self._field_equals(value, other)
+
+        if other_kind == 'boolean':
+            is_true = self.dialect.type_in(self.column, value, [TRUE])
+            is_false = self.dialect.type_in(self.column, value, [FALSE])
+            return self._join('OR', [self._join('AND', [is_true, other]), self._join('AND', [is_false, (f'NOT ({other[0]})', other[1])])])
+
+        left_type, left_params = self.dialect.type_of(self.column, value)
+        right_type, right_params = self.dialect.type_of(self.column, other)
+        left_value, left_value_params = self.dialect.value_of(self.column, value)
+        right_value, right_value_params = self.dialect.value_of(self.column, other)
+        # Types must agree; `true`, `false` and `null` need nothing more.
+        sql = f"({left_type}) = ({right_type}) AND (({left_type}) IN ('true', 'false', 'null') OR {left_value} = {right_value})"
+        return sql, left_params + right_params + left_params + left_value_params + right_value_params
+
+    def _field_equals(self, keys, constant):
+        values = constant if type(constant) is semantics.ValueSet else semantics.ValueSet([constant])
+        conditions = []
+        for kind, members in [(STRING, values.strings), (NUMBER, values.numbers)]:
+            if members:
+                value, params = self.dialect.value_of(self.column, keys)
+                conditions.append(self._join('AND', [
+                    self.dialect.type_in(self.column, keys, [kind]),
+                    self.dialect.in_values(value, params, sorted(members)),
+                ]))
+        kinds = [{None: NULL, True: TRUE, False: FALSE}[member] for member in values.constants]
+        if kinds:
+            conditions.append(self.dialect.type_in(self.column, keys, kinds))
+
+        if not conditions:
+            return self._constant(False)
+        return self._join('OR', conditions)
+
+    def _ordering(self, left, operator, right):
+        kind, value = left
+        other_kind, other = right
+        if kind == 'boolean' or other_kind == 'boolean':
+            return self._constant(False)
+
+        if other_kind == 'literal':
+            if semantics.is_number(other):
+                kinds = NUMBER
+            elif type(other) is str:
+                kinds = STRING
+            else:
+                return self._constant(False)
+            field, params = self.dialect.value_of(self.column, value)
+            return self._join('AND', [
+                self.dialect.type_in(self.column, value, [kinds]),
+                (f'{field} {operator} {self.dialect.placeholder}', params + [other]),
+            ])
+
+        left_value, left_params = self.dialect.value_of(self.column, value)
+        right_value, right_params = self.dialect.value_of(self.column, other)
+        conditions = []
+        for kinds in [NUMBER, STRING]:
+            conditions.append(self._join('AND', [
+                self.dialect.type_in(self.column, value, [kinds]),
+                self.dialect.type_in(self.column, other, [kinds]),
+                (f'{left_value} {operator} {right_value}', left_params + right_params),
+            ]))
+        return self._join('OR', conditions)
+
+    def _function(self, node):
+        name = node.children[0].value
+        if name not in self.functions:
+            raise Exception(f'Unsupported function in SQL: {name}')
+
+        subject_kind, subject = self._operand(node.children[1])
+        pattern_kind, pattern = self._operand(node.children[2])
+        if pattern_kind != 'literal' or type(pattern) is not str:
+            raise Exception(f'Expected string pattern in {name}()')
+
+        if subject_kind == 'literal':
+            return self._constant(type(subject) is str and default_registry.matcher(name, pattern)(subject))
+
+        value, params = self.dialect.value_of(self.column, subject)
+        return self._join('AND', [
+            self.dialect.type_in(self.column, subject, [STRING]),
+            self.functions[name](value, params, pattern),
+        ])
@@ -0,0 +1,6 @@
+from segment_fql.filter.filter import Filter
+from segment_fql.filter.filter_set import FilterSet
+from segment_fql.filter.cache import FilterCache, ResidualCache, CacheInfo, get_filter, configure_filter_cache, filter_cache_info
+from segment_fql.filter.streaming import afilter
+from segment_fql.filter.artifact import FilterArtifact
+from segment_fql.filter.batch import match_many
@@ -0,0 +1,245 @@
+import mmap
+import struct
+import sys
+import threading
+from array import array
+
+from segment_fql.parser.flat_ast import FlatAST, NODE_TYPES, TOKEN_TYPES
+from segment_fql.filter.filter import Filter
+
+MAGIC = b'FQLA'
+VERSION = 1
+# Magic, version, flags, filters, strings, entries, the size of the type names,
+# and the typecodes of the first child, child count and value sections.
+HEADER = struct.Struct('<4sHHIIII4s')
+# Per filter: id and query (string indexes), first entry and entry count.
+FILTER_RECORD = struct.Struct('<IIII')
+
+
+def type_names():
+    '''Type codes are positions in this list; it is stored so loading can reject mismatched enums.'''
+    return '\n'.join(f'{type(entry_type).__name__}.{entry_type.name}' for entry_type in NODE_TYPES + TOKEN_TYPES).encode()
+
+
+def padding(size):
+    return b'\0' * (-size % 4)
+
+
+def narrowest(values):
+    '''The smallest unsigned array holding `values`, so typical filters use one or two bytes per field.'''
+    largest = max(values, default=0)
+    for typecode in ['B', 'H', 'I']:
+        if largest < 256 ** array(typecode).itemsize:
+            return array(typecode, values)
+    raise Exception(f'Value too large for a filter artifact: {largest}')
+
+
+def little_endian(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class StringTable:
+    '''Strings of an artifact, decoded from the blob on first access.'''
+
+    def __init__(self, data, offsets, blob, count):
+        self.data = data
+        self.offsets = offsets
+        self.blob = blob
+        self.count = count
+        self.cache = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        value = self.cache.get(index)
+        if value is None:
+            if not 0 <= index < self.count:
+                raise IndexError(index)
+            start, end = struct.unpack_from('<II', self.data, self.offsets + 4 * index)
+            value = self.cache[index] = str(self.data[self.blob + start:self.blob + end], 'utf-8')
+        return value
+
+
+class FilterArtifact:
+    '''
+    Parsed filters in a compact, versioned binary file, so workers can start
+    without lexing and parsing every query. Layout (little-endian, sections
+    aligned to 4 bytes):
+
+        header          magic, version, flags, counts and section typecodes
+        type names      `ASTType` and `TokenType` names, one per code
+        filters         id, query, first entry and entry count per filter
+        string offsets  one more than the number of strings
+        first child     per entry, relative to its filter (`FlatAST` layout)
+        child counts    per entry
+        values          per entry, a string index plus one, or 0
+        codes           per entry, one byte
+        strings         UTF-8 blob shared by all filters
+
+    Per-entry sections use 1, 2 or 4 bytes per item, whichever fits.
+
+    `load()` memory-maps the file and reads only the filter table; a `Filter`
+    is rebuilt from its entries and compiled on first use, then cached.
+    '''
+
+    def __init__(self, data, source=None):
+        self.data = data
+        self.source = source
+        self.lock = threading.Lock()
+        self.filters = {}
+        self.tokens = {}
+
+        if len(data) < HEADER.size:
+            raise Exception('Not a filter artifact: file too short')
+        magic, version, _, filter_count, string_count, entry_count, names_size, typecodes = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise Exception('Not a filter artifact')
+        if version != VERSION:
+            raise Exception(f'Unsupported filter artifact version: {version}')
+
+        pos = HEADER.size
+        if bytes(data[pos:pos + names_size]) != type_names():
+            raise Exception('Filter artifact was built with different AST or token types')
+        pos += names_size + (-names_size % 4)
+
+        records = pos
+        offsets = records + FILTER_RECORD.size * filter_count
+        pos = offsets + 4 * (string_count + 1)
+        self.sections = {}
+        for name, typecode in zip(['first_child', 'child_counts', 'values', 'codes'], typecodes.decode('ascii')[:3] + 'B'):
+            size = array(typecode).itemsize * entry_count
+            self.sections[name] = (typecode, pos)
+            pos += size + (-size % 4)
+        blob = pos
+        blob_size = struct.unpack_from('<I', data, offsets + 4 * string_count)[0]
+        if len(data) < blob + blob_size:
+            raise Exception('Filter artifact is truncated')
+
+        self.strings = StringTable(data, offsets, blob, string_count)
+        self.records = {}
+        for index in range(filter_count):
+            record = FILTER_RECORD.unpack_from(data, records + FILTER_RECORD.size * index)
+            self.records[self.strings[record[0]]] = record
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as source:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    @classmethod
+    def loads(cls, data):
+        return cls(data)
+
+    @classmethod
+    def dump(cls, filters, path):
+        with open(path, 'wb') as target:
+            target.write(cls.dumps(filters))
+
+    @classmethod
+    def dumps(cls, filters):
+        '''Serializes `{filter id: query or Filter}`; ids must be strings.'''
+        strings = []
+        string_indexes = {}
+
+        def intern(value):
+            index = string_indexes.get(value)
+            if index is None:
+                index = string_indexes[value] = len(strings)
+                strings.append(value)
+            return index
+
+        records = array('I')
+        first_child = []
+        child_counts = []
+        values = []
+        codes = array('B')
+        for filter_id, query in filters.items():
+            if type(filter_id) is not str:
+                raise Exception(f'Filter ids must be strings, got {filter_id!r}')
+            compiled = query if isinstance(query, Filter) else Filter(query)
+            flat = FlatAST.from_node(compiled.ast)
+            records.extend([intern(filter_id), intern(compiled.query), len(codes), len(flat)])
+            first_child.extend(flat.first_child)
+            child_counts.extend(flat.child_counts)
+            # Stored plus one, so that "no value" (-1) is 0 and the section can be unsigned.
+            values.extend(intern(flat.strings[value]) + 1 if value >= 0 else 0 for value in flat.values)
+            codes.extend(flat.codes)
+
+        encoded = [value.encode('utf-8') for value in strings]
+        offsets = array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+
+        sections = [narrowest(first_child), narrowest(child_counts), narrowest(values), codes]
+        typecodes = ''.join(section.typecode for section in sections[:3]).encode('ascii') + b'\0'
+        names = type_names()
+        parts = [
+            HEADER.pack(MAGIC, VERSION, 0, len(filters), len(strings), len(codes), len(names), typecodes),
+            names, padding(len(names)),
+            little_endian(records),
+            little_endian(offsets),
+        ]
+        for section in sections:
+            data = little_endian(section)
+            parts.extend([data, padding(len(data))])
+        return b''.join(parts + encoded)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, filter_id):
+        return filter_id in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, filter_id):
+        compiled = self.filters.get(filter_id)
+        if compiled is None:
+            with self.lock:
+                compiled = self.filters.get(filter_id)
+                if compiled is None:
+                    ast = self.flat(filter_id).to_node(self.tokens)
+                    compiled = self.filters[filter_id] = Filter.from_ast(self.query(filter_id), ast)
+        return compiled
+
+    def ids(self):
+        return list(self.records)
+
+    def query(self, filter_id):
+        return self.strings[self.records[filter_id][1]]
+
+    def flat(self, filter_id):
+        '''The `FlatAST` of one filter, copied out of the artifact.'''
+        _, _, start, count = self.records[filter_id]
+        return FlatAST(
+            self._array('codes', start, count),
+            self._array('first_child', start, count),
+            self._array('child_counts', start, count),
+            array('i', [value - 1 for value in self._array('values', start, count)]),
+            self.strings,
+        )
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _array(self, name, start, count):
+        typecode, section = self.sections[name]
+        values = array(typecode)
+        values.frombytes(self.data[section + values.itemsize * start:section + values.itemsize * (start + count)])
+        if values.itemsize > 1 and sys.byteorder != 'little':
+            values.byteswap()
+        return values
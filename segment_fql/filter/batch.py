@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from segment_fql.filter.filter import Filter
+from segment_fql.filter.filter_set import FilterSet
+
+
+def filter_set(filters):
+    '''A `FilterSet` for `{id: Filter, query text or AST}`; a `FilterSet` is used as it is.'''
+    if isinstance(filters, FilterSet):
+        return filters
+    asts = {}
+    for filter_id, value in filters.items():
+        if isinstance(value, str):
+            value = Filter(value)
+        asts[filter_id] = value.ast if isinstance(value, Filter) else value
+    return FilterSet(asts)
+
+
+def match_chunk(filters, events):
+    match = filters.match
+    return [match(event) for event in events]
+
+
+def match_many(filters, events, workers=None, chunk_size=512, executor=None):
+    '''
+    For each of `events`, in order, the ids of the `filters` it matches:
+
+        match_many({'orders': 'event = "Order Completed"'}, events) # [['orders'], [], ...]
+
+    `filters` maps ids to filters, query texts or ASTs, or is a `FilterSet`.
+    The filters are compiled once, then chunks of `chunk_size` events are
+    matched on a thread pool of `workers` threads (`ThreadPoolExecutor`'s
+    default when `None`), or on `executor` if given. Nothing is written while
+    matching, so the result does not depend on the number of threads. Threads
+    only run in parallel on a free-threaded Python build; with the GIL, use
+    `workers=1` unless predicates release it.
+    '''
+    filters = filter_set(filters)
+    events = events if isinstance(events, (list, tuple)) else list(events)
+    chunks = [events[start:start + chunk_size] for start in range(0, len(events), chunk_size)]
+    if executor is None and (workers == 1 or len(chunks) <= 1):
+        return match_chunk(filters, events)
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(match_chunk, [filters] * len(chunks), chunks))
+    else:
+        results = list(executor.map(match_chunk, [filters] * len(chunks), chunks))
+    return [matches for result in results for matches in result]
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from segment_fql.filter.filter import Filter
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'expirations', 'maxsize', 'currsize'])
+
+
+class FilterCache:
+    '''
+    Bounded, thread-safe LRU cache of query string to `Filter`. With `ttl` set,
+    entries older than `ttl` seconds are rebuilt on their next lookup.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        if maxsize < 1:
+            raise Exception(f'Cache size must be positive, got {maxsize}')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, query):
+        return self._lookup(query, Filter, query)
+
+    def _lookup(self, key, build, *arguments):
+        '''The entry for `key`, or `build(*arguments)` stored under it.'''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                created, cached = entry
+                if self.ttl is None or self.clock() - created < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return cached
+
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Built outside the lock so one slow query does not block other lookups.
+        built = build(*arguments)
+
+        with self.lock:
+            self.entries[key] = (self.clock(), built)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return built
+
+    def cache_info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.expirations, self.maxsize, len(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+
+def frozen(value):
+    '''A hashable key for a JSON value that tells `1`, `1.0` and `true` apart.'''
+    if isinstance(value, dict):
+        return ('object', tuple(sorted((key, frozen(item)) for key, item in value.items())))
+    if isinstance(value, (list, tuple)):
+        return ('array', tuple(frozen(item) for item in value))
+    return (type(value).__name__, value)
+
+
+class ResidualCache(FilterCache):
+    '''
+    Bounded, thread-safe LRU cache of `Filter.specialize(known)` residuals, one
+    per filter query and known field values. Filters may be given as query text.
+    '''
+
+    def get(self, compiled, known):
+        query = compiled if isinstance(compiled, str) else compiled.query
+        key = (query, tuple(sorted((field, frozen(value)) for field, value in known.items())))
+        return self._lookup(key, self._specialize, compiled, known)
+
+    def _specialize(self, compiled, known):
+        if isinstance(compiled, str):
+            compiled = Filter(compiled)
+        return compiled.specialize(dict(known))
+
+
+default_cache = FilterCache()
+
+
+def get_filter(query):
+    '''Returns the shared `Filter` for `query` from the process-wide cache.'''
+    return default_cache.get(query)
+
+
+def configure_filter_cache(maxsize=1024, ttl=None):
+    '''Replaces the process-wide cache with an empty one of the given size and TTL.'''
+    global default_cache
+    default_cache = FilterCache(maxsize, ttl)
+
+
+def filter_cache_info():
+    return default_cache.cache_info()
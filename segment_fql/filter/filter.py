@@ -0,0 +1,55 @@
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Optimizer, Profiler, PartialEvaluator
+
+
+class Filter:
+    '''
+    A query lexed, parsed and compiled once. The filter cannot be modified, its
+    AST is frozen and the predicate keeps no state, so one instance can be
+    shared between threads. With `optimize`, the AST is rewritten by
+    `Optimizer` before it is compiled.
+    '''
+    __slots__ = ('query', 'ast', 'predicate')
+
+    def __init__(self, query, optimize=False):
+        self._build(query, Parser(Scanner(query).lex()).parse(), optimize)
+
+    @classmethod
+    def from_ast(cls, query, ast, optimize=False):
+        '''A filter for an already parsed `query`, e.g. one loaded from an artifact.'''
+        instance = cls.__new__(cls)
+        instance._build(query, ast, optimize)
+        return instance
+
+    def _build(self, query, ast, optimize):
+        ast = (Optimizer(ast).optimize() if optimize else ast).freeze()
+        object.__setattr__(self, 'query', query)
+        object.__setattr__(self, 'ast', ast)
+        object.__setattr__(self, 'predicate', Compiler(ast).compile())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'Filter is immutable, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'Filter is immutable, cannot delete {name}')
+
+    def __repr__(self):
+        return f'Filter({self.query!r})'
+
+    def __call__(self, event):
+        return self.predicate(event)
+
+    def matches(self, event):
+        return self.predicate(event)
+
+    def profiler(self, sample_every=16):
+        '''A `Profiler` with per-node counters for this filter; the filter itself stays uninstrumented.'''
+        return Profiler(self.ast, sample_every)
+
+    def specialize(self, known):
+        '''
+        The `Residual` of this filter for events whose top-level fields `known`
+        are already known, e.g. `{'event': 'Order Completed'}`; see `PartialEvaluator`.
+        '''
+        return PartialEvaluator(self.ast, known).specialize()
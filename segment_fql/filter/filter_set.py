@@ -0,0 +1,111 @@
+from collections import Counter
+
+from segment_fql.lexer import TokenType
+from segment_fql.parser import ASTNode, ASTType
+from segment_fql.compiler import Compiler, semantics
+
+
+def equality_conjuncts(group):
+    '''`(path keys, value)` for every `path = "string"` condition in an `and` group.'''
+    conjuncts = []
+    for operand in group:
+        if not isinstance(operand, ASTNode) or operand.type != ASTType.CONDITIONAL:
+            continue
+
+        left, operator, right = operand.children
+        if operator.value != '=' or isinstance(right, ASTNode) or right.type != TokenType.String:
+            continue
+        if isinstance(left, ASTNode):
+            if left.type != ASTType.PATH or semantics.path_literal(left)[0]:
+                continue
+        elif left.type != TokenType.Ident or semantics.literal_value(left)[0]:
+            continue
+
+        conjuncts.append((tuple(semantics.path_keys(left)), right.value))
+    return conjuncts
+
+
+class FilterSet:
+    '''
+    Matches one event against many filters without evaluating all of them.
+
+    Each `or` branch of a filter that requires some `path = "string"` is filed
+    under that path and string in a hash index. Looking up an event reads each
+    indexed path once and only evaluates the filters found in the matching
+    buckets, plus the filters that could not be indexed.
+    '''
+
+    def __init__(self, filters=None):
+        self.predicates = {}
+        self.order = {}
+        self.indexes = {}
+        self.fallback = []
+        self.path_counts = Counter()
+
+        filters = list(filters.items()) if isinstance(filters, dict) else list(filters or [])
+        groups = {}
+        for filter_id, ast in filters:
+            self._check_id(filter_id, groups)
+            groups[filter_id] = self._groups(ast)
+        for branches in groups.values():
+            self._count(branches)
+        for filter_id, ast in filters:
+            self._register(filter_id, ast, groups[filter_id])
+
+    def __len__(self):
+        return len(self.predicates)
+
+    def __contains__(self, filter_id):
+        return filter_id in self.predicates
+
+    def add(self, filter_id, ast):
+        # Checked before `_count`, so a rejected filter leaves `path_counts` alone.
+        self._check_id(filter_id, self.predicates)
+        groups = self._groups(ast)
+        self._count(groups)
+        self._register(filter_id, ast, groups)
+
+    def _groups(self, ast):
+        return [equality_conjuncts(group) for group in semantics.disjunction(semantics.root_statement(ast))]
+
+    def _count(self, groups):
+        for conjuncts in groups:
+            self.path_counts.update(set(path for path, _ in conjuncts))
+
+    def _check_id(self, filter_id, known):
+        if filter_id in known:
+            raise Exception(f'Duplicate filter id: {filter_id}')
+
+    def _register(self, filter_id, ast, groups):
+        self.predicates[filter_id] = Compiler(ast).compile()
+        self.order[filter_id] = len(self.order)
+
+        if not groups or not all(groups):
+            # Some `or` branch has no equality to index on, so any event could match it.
+            self.fallback.append(filter_id)
+            return
+
+        for conjuncts in groups:
+            # Prefer the path most filters can be indexed on, so lookups touch few paths.
+            path, value = max(conjuncts, key=lambda conjunct: (self.path_counts[conjunct[0]], conjunct[0] in self.indexes))
+            bucket = self.indexes.setdefault(path, {}).setdefault(value, [])
+            if filter_id not in bucket:
+                bucket.append(filter_id)
+
+    def candidates(self, event):
+        '''Filter ids that may match `event`; every other filter certainly does not.'''
+        found = set(self.fallback)
+        for path, buckets in self.indexes.items():
+            value = event.get(path[0]) if len(path) == 1 else semantics.resolve(event, path)
+            if isinstance(value, str):
+                bucket = buckets.get(value)
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def match(self, event):
+        '''Ids of the filters matching `event`, in the order the filters were added.'''
+        predicates = self.predicates
+        matched = [filter_id for filter_id in self.candidates(event) if predicates[filter_id](event)]
+        matched.sort(key=self.order.__getitem__)
+        return matched
@@ -0,0 +1,122 @@
+import asyncio
+
+from segment_fql.filter.filter import Filter
+from segment_fql.filter.cache import get_filter
+
+END = object()
+
+
+def filter_batch(query, batch):
+    '''Matching events of `batch`. Runs in executors, so it takes the query text and uses the filter cache.'''
+    predicate = get_filter(query).predicate
+    return [event for event in batch if predicate(event)]
+
+
+async def iterate(source):
+    for event in source:
+        yield event
+
+
+async def produce(source, queue, batch_size, max_delay, submit):
+    '''
+    Reads `source` into batches and puts them on `queue`, waiting while it is
+    full. A timer flushes a partial batch `max_delay` seconds after its first
+    event if there is room in the queue, so slow sources do not hold events back.
+    '''
+    loop = asyncio.get_running_loop()
+    batch = []
+    timer = None
+
+    def flush_late():
+        nonlocal batch, timer
+        timer = None
+        if not batch:
+            return
+        if queue.full():
+            timer = loop.call_later(max_delay, flush_late)
+            return
+        ready, batch = batch, []
+        queue.put_nowait(submit(ready))
+
+    try:
+        async for event in source:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                if timer is not None:
+                    timer.cancel()
+                    timer = None
+                ready, batch = batch, []
+                await queue.put(submit(ready))
+            elif timer is None and max_delay is not None:
+                timer = loop.call_later(max_delay, flush_late)
+
+        if timer is not None:
+            timer.cancel()
+            timer = None
+        if batch:
+            await queue.put(submit(batch))
+        await queue.put(END)
+    except Exception as error:
+        await queue.put(error)
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+async def afilter(query, source, batch_size=256, max_delay=0.005, max_batches=4, executor=None):
+    '''
+    Yields the events of `source` (an async or plain iterable) that match
+    `query`, in order:
+
+        async for event in afilter('event = "Order Completed"', source):
+            ...
+
+    Events are evaluated in batches of up to `batch_size`; a partial batch is
+    evaluated after `max_delay` seconds (`None` waits for full batches). At most
+    `max_batches` batches wait in a bounded queue: when the consumer falls
+    behind, the source is not read any further.
+
+    With an `executor` (a thread or process pool), batches are evaluated there
+    instead of on the event loop, up to `max_batches` at a time. Closing the
+    stream early cancels the batches the executor has not started.
+    '''
+    compiled = Filter(query) if isinstance(query, str) else query
+    predicate = compiled.predicate
+    text = compiled.query
+    submitted = set()
+    if executor is None:
+        def submit(batch):
+            return batch
+    else:
+        def submit(batch):
+            future = executor.submit(filter_batch, text, batch)
+            submitted.add(future)
+            return future
+
+    if not hasattr(source, '__aiter__'):
+        source = iterate(source)
+
+    queue = asyncio.Queue(max_batches)
+    producer = asyncio.ensure_future(produce(source, queue, batch_size, max_delay, submit))
+    try:
+        while True:
+            item = await queue.get()
+            if item is END:
+                return
+            if isinstance(item, Exception):
+                raise item
+
+            if executor is None:
+                matches = [event for event in item if predicate(event)]
+            else:
+                matches = await asyncio.wrap_future(item)
+                submitted.discard(item)
+            for event in matches:
+                yield event
+    finally:
+        # When the consumer stops early, stop reading the source, cancel the batches
+        # not started yet and wait for the running ones, so no work outlives the stream.
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        running = [future for future in submitted if not future.cancel()]
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in running], return_exceptions=True)
@@ -0,0 +1,2 @@
+from segment_fql.functions.matchers import contains, match
+from segment_fql.functions.function_registry import FunctionRegistry, default_registry, register_function, function_cache_info
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from segment_fql.functions.matchers import contains, match
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+RESERVED_NAMES = ['true', 'false', 'null', 'and', 'or']
+
+
+class FunctionRegistry:
+    '''
+    FQL functions, such as `contains(path, "text")`, by name. A function is
+    registered as a factory: it receives the string pattern once, when a filter
+    is compiled, and returns a `test(value) -> bool` that is called with the
+    subject of every event. Subjects that are not strings never match, so tests
+    are only ever called with strings.
+
+    Tests are cached by function name and pattern in a bounded, thread-safe LRU,
+    so every filter using the same pattern shares one.
+    '''
+
+    def __init__(self, factories=None, maxsize=4096):
+        if maxsize < 1:
+            raise Exception(f'Cache size must be positive, got {maxsize}')
+
+        self.factories = {}
+        self.maxsize = maxsize
+        self.matchers = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        for name, factory in (factories or {}).items():
+            self.register(name, factory)
+
+    def __contains__(self, name):
+        return name in self.factories
+
+    def names(self):
+        return list(self.factories)
+
+    def register(self, name, factory):
+        '''Adds or replaces the function `name`; queries can call it once this returns.'''
+        if not name.isidentifier() or name in RESERVED_NAMES:
+            raise Exception(f'Invalid function name: {name}')
+
+        with self.lock:
+            self.factories[name] = factory
+            self._forget(name)
+
+    def unregister(self, name):
+        with self.lock:
+            if self.factories.pop(name, None) is None:
+                raise Exception(f'Unsupported function: {name}')
+            self._forget(name)
+
+    def _forget(self, name):
+        for key in [key for key in self.matchers if key[0] == name]:
+            del self.matchers[key]
+
+    def matcher(self, name, pattern):
+        '''The shared test for `name(subject, pattern)`.'''
+        key = (name, pattern)
+        with self.lock:
+            test = self.matchers.get(key)
+            if test is not None:
+                self.matchers.move_to_end(key)
+                self.hits += 1
+                return test
+            self.misses += 1
+            factory = self.factories.get(name)
+
+        if factory is None:
+            raise Exception(f'Unsupported function: {name}')
+        built = factory(pattern)
+
+        with self.lock:
+            # Another thread may have built it meanwhile; keep the first so tests stay shared.
+            test = self.matchers.setdefault(key, built)
+            while len(self.matchers) > self.maxsize:
+                self.matchers.popitem(last=False)
+                self.evictions += 1
+        return test
+
+    def cache_info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self.matchers))
+
+    def clear(self):
+        with self.lock:
+            self.matchers.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+default_registry = FunctionRegistry({'contains': contains, 'match': match})
+
+
+def register_function(name, factory):
+    '''Makes `name(path, "pattern")` available to every query parsed from now on.'''
+    default_registry.register(name, factory)
+
+
+def function_cache_info():
+    return default_registry.cache_info()
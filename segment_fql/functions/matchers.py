@@ -0,0 +1,59 @@
+import fnmatch
+import re
+
+STARS = re.compile(r'\*+')
+
+
+def contains(substring):
+    '''`contains(path, "text")`: a case-sensitive substring test.'''
+    def test(value):
+        return substring in value
+    return test
+
+
+def match(pattern):
+    '''
+    `match(path, "glob")`, with the semantics of `fnmatch.fnmatchcase`. Globs
+    whose only wildcard is `*` never need a regex: `abc` is an equality,
+    `abc*` a prefix, `*abc` a suffix and `*abc*` a substring test, and any other
+    mix of literal text and `*` is a prefix, a suffix and ordered `find`s in
+    between. Globs with `?` or `[...]` are compiled to a regex.
+    '''
+    if '?' in pattern or '[' in pattern:
+        matcher = re.compile(fnmatch.translate(pattern)).match
+        return lambda value: matcher(value) is not None
+
+    parts = STARS.sub('*', pattern).split('*')
+    if len(parts) == 1:
+        return lambda value: value == pattern
+
+    prefix, middles, suffix = parts[0], [part for part in parts[1:-1] if part], parts[-1]
+    if not middles:
+        if not prefix and not suffix:
+            return lambda value: True
+        if not suffix:
+            return lambda value: value.startswith(prefix)
+        if not prefix:
+            return lambda value: value.endswith(suffix)
+        minimum = len(prefix) + len(suffix)
+        return lambda value: len(value) >= minimum and value.startswith(prefix) and value.endswith(suffix)
+
+    if not prefix and not suffix and len(middles) == 1:
+        middle = middles[0]
+        return lambda value: middle in value
+
+    minimum = len(prefix) + len(suffix)
+
+    def test(value):
+        if len(value) < minimum or not value.startswith(prefix) or not value.endswith(suffix):
+            return False
+        # Leftmost matches leave the most room for the parts after them.
+        pos = len(prefix)
+        end = len(value) - len(suffix)
+        for middle in middles:
+            pos = value.find(middle, pos, end)
+            if pos == -1:
+                return False
+            pos += len(middle)
+        return True
+    return test
@@ -1,3 +1,4 @@
 from segment_fql.lexer.lexer import Lexer
+from segment_fql.lexer.scanner import Scanner, lex
 from segment_fql.lexer.token import Token
 from segment_fql.lexer.token_type import TokenType
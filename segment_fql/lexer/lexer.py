@@ -1,5 +1,9 @@
+import copy
+import sys
+
 from segment_fql.lexer.token import Token
 from segment_fql.lexer.token_type import TokenType
+from segment_fql.lexer.shared_tokens import SYMBOL_TOKENS, RESERVED_KEYWORDS, EOS_TOKEN
 
 class Lexer:
     def __init__(self, text):
@@ -8,19 +12,19 @@ class Lexer:
         self.MAXIMUM_STRING_LENGTH = 100000
         self.text = text
         self.pos = 0
-        self.current_char = self.text[self.pos]
-        self.reserved_keywords = {
-            'true': Token(TokenType.Ident, 'true'),
-            'false': Token(TokenType.Ident, 'false'),
-            'null': Token(TokenType.Null, 'null'),
-            'event': Token(TokenType.Ident, 'event'),
-            'contains': Token(TokenType.Ident, 'contains'),
-            'match': Token(TokenType.Ident, 'match'),
-            'and': Token(TokenType.Logical, 'and'),
-            'or': Token(TokenType.Logical, 'or')
-        }
+        self.current_char = self.text[self.pos] if self.text else None
+        self.reserved_keywords = RESERVED_KEYWORDS
 
     def lex(self):
+        '''
+        Tokens of `text`. Each call moves its own copy of the cursor, so a lexer
+        can be lexed again or shared between threads.
+        '''
+        return copy.copy(self)._lex()
+
+    def _lex(self):
+        self.pos = 0
+        self.current_char = self.text[0] if self.text else None
         tokens = []
         while True:
             token = self._get_next_token()
@@ -57,31 +61,28 @@ class Lexer:
     def _lex_identifier(self, previous):
         result = ''
         char = previous
-        while True:
-            if char is None:
-                break
-
+        while char is not None:
             if char == '\\':
                 self._advance()
                 char = self.current_char
                 if char is None:
                     raise Exception('Unexpected end of string')
-
-                char = self.current_char
+            elif not self._is_identifier_character(char):
+                break
 
             result += char
 
             if len(result) > self.MAXIMUM_STRING_LENGTH:
                 raise Exception('Unreasonable string length')
 
-            if not self._is_identifier_character(char):
-                break
-
             self._advance()
             char = self.current_char
 
+        if not result:
+            self.error()
+
         coming_up = self.current_char
-        if coming_up is not None and not (self._is_terminator(coming_up) or coming_up in ['!', '=', '(', '.']):
+        if coming_up is not None and not (self._is_terminator(coming_up) or coming_up in ['!', '=', '>', '<', '(', '.']):
             raise Exception(f'Expected termination character after identifier, got {coming_up}')
 
         result = result.strip().strip('.')
@@ -89,7 +90,7 @@ class Lexer:
         if result in self.reserved_keywords:
             return self.reserved_keywords[result]
 
-        return Token(TokenType.Ident, result)
+        return Token(TokenType.Ident, sys.intern(result))
 
     def _lex_number(self, previous):
         result = ''
@@ -121,37 +122,44 @@ class Lexer:
     def _lex_operator_or_conditional(self, previous):
         if previous == '=':
             self._advance()
-            return Token(TokenType.Operator, '=')
+            return SYMBOL_TOKENS['=']
  
         if previous == '!':
-            next_char = self.text[self.pos + 1]
+            next_char = self.text[self.pos + 1] if self.pos + 1 < len(self.text) else None
             if next_char == '(':
                 self._advance()
-                return Token(TokenType.Operator, '!')
+                return SYMBOL_TOKENS['!']
             elif next_char == '=':
                 self._advance()
                 self._advance()
-                return Token(TokenType.Operator, '!=')
+                return SYMBOL_TOKENS['!=']
 
         if previous == '=':
             self._advance()
-            return Token(TokenType.Operator, '=')
+            return SYMBOL_TOKENS['=']
+
+        if previous in ['>', '<']:
+            self._advance()
+            if self.current_char == '=':
+                self._advance()
+                return SYMBOL_TOKENS[previous + '=']
+            return SYMBOL_TOKENS[previous]
 
         if previous == '+':
             self._advance()
-            return Token(TokenType.Operator, '+')
+            return SYMBOL_TOKENS['+']
 
         if previous == '-':
             self._advance()
-            return Token(TokenType.Operator, '-')
+            return SYMBOL_TOKENS['-']
 
         if previous == '*':
             self._advance()
-            return Token(TokenType.Operator, '*')
+            return SYMBOL_TOKENS['*']
 
         if previous == '/':
             self._advance()
-            return Token(TokenType.Operator, '/')
+            return SYMBOL_TOKENS['/']
 
         return self._lex_identifier(previous)
 
@@ -179,27 +187,27 @@ class Lexer:
 
             if self.current_char == '.':
                 self._advance()
-                return Token(TokenType.Dot, '.')
+                return SYMBOL_TOKENS['.']
 
             if self.current_char == ',':
                 self._advance()
-                return Token(TokenType.Comma, ',')
+                return SYMBOL_TOKENS[',']
 
             if self.current_char == '[':
                 self._advance()
-                return Token(TokenType.BrackLeft, '[')
+                return SYMBOL_TOKENS['[']
 
             if self.current_char == ']':
                 self._advance()
-                return Token(TokenType.BrackRight, ']')
+                return SYMBOL_TOKENS[']']
 
             if self.current_char == '(':
                 self._advance()
-                return Token(TokenType.ParenLeft, '(')
+                return SYMBOL_TOKENS['(']
 
             if self.current_char == ')':
                 self._advance()
-                return Token(TokenType.ParenRight, ')')
+                return SYMBOL_TOKENS[')']
 
             if self.current_char == '"':
                 return self._lex_string()
@@ -209,7 +217,7 @@ class Lexer:
 
             self.error()
 
-        return Token(TokenType.EOS, 'eos')
+        return EOS_TOKEN
 
     def error(self):
         raise Exception('Invalid character')
\ No newline at end of file
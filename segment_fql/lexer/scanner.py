@@ -0,0 +1,217 @@
+import re
+import sys
+
+from segment_fql.lexer.token import Token
+from segment_fql.lexer.token_type import TokenType
+from segment_fql.lexer.shared_tokens import SYMBOL_TOKENS, RESERVED_KEYWORDS, EOS_TOKEN
+
+# One match per token for the common, all-ASCII shapes. The lookaheads reject
+# identifiers and numbers that `Lexer` would treat specially (escapes, decimal
+# points, non-ASCII letters or digits, bad terminators); those, and invalid
+# characters, fall back to exact character-level handling below, so the output
+# is always the same as `Lexer`.
+TOKEN_PATTERN = re.compile(r'''
+    \s*
+    (?:
+        (?P<ident>[A-Za-z_][A-Za-z0-9_\-]*)(?=[\s!=<>()\[\],."]|$)
+      | "(?P<string>[^"]*)"?
+      | (?P<number>[0-9+\-][0-9]*)(?![0-9.\x80-\U0010ffff])
+      | (?P<symbol>!=|!(?=\()|[<>]=?|[=.,\[\]()])
+    )?
+''', re.VERBOSE)
+
+TERMINATORS = frozenset(['(', ')', '[', ']', ',', '.', '"'])
+
+
+class Scanner:
+    '''
+    Single-pass tokenizer producing exactly the same tokens as `Lexer.lex()`.
+    Tokens are sliced straight from the source instead of being built character by character.
+    '''
+
+    def __init__(self, text):
+        self.MAXIMUM_NUMBER_LENGTH = 100000
+        self.MAXIMUM_STRING_LENGTH = 100000
+        self.text = text
+        self.reserved_keywords = RESERVED_KEYWORDS
+
+    def lex(self):
+        return list(self.iter_tokens())
+
+    def iter_tokens(self):
+        text = self.text
+        length = len(text)
+        reserved_keywords = self.reserved_keywords
+        intern = sys.intern
+        maximum_length = self.MAXIMUM_STRING_LENGTH
+        pos = 0
+
+        while True:
+            for found in TOKEN_PATTERN.finditer(text, pos):
+                kind = found.lastgroup
+                if kind == 'ident':
+                    value = found.group(kind)
+                    if len(value) > maximum_length:
+                        raise Exception('Unreasonable string length')
+                    yield reserved_keywords.get(value) or Token(TokenType.Ident, intern(value))
+                elif kind == 'symbol':
+                    yield SYMBOL_TOKENS[found.group(kind)]
+                elif kind == 'string':
+                    yield Token(TokenType.String, found.group(kind))
+                elif kind == 'number':
+                    value = found.group(kind)
+                    if len(value) - 1 > self.MAXIMUM_NUMBER_LENGTH:
+                        raise Exception('Unreasonable number length')
+                    yield Token(TokenType.Number, value)
+                else:
+                    pos = found.end()
+                    break
+
+            if pos >= length:
+                yield EOS_TOKEN
+                return
+
+            token, pos, error = self._fallback(pos)
+            if error is not None:
+                raise Exception(error[1])
+            yield token
+
+    def scan(self, with_spans=True):
+        '''
+        Tokens with their source spans, without raising: returns `(tokens, spans,
+        error)`, where `spans[i]` is the `(start, end)` offset of `tokens[i]` and
+        `error` is `None` or `(code, message, start, end)` for the first invalid
+        token, which ends the list. `spans` stays empty without `with_spans`.
+        '''
+        text = self.text
+        length = len(text)
+        reserved_keywords = self.reserved_keywords
+        intern = sys.intern
+        tokens = []
+        spans = []
+        add_token = tokens.append
+        add_span = spans.append
+        pos = 0
+
+        while True:
+            for found in TOKEN_PATTERN.finditer(text, pos):
+                kind = found.lastgroup
+                if kind is None:
+                    pos = found.end()
+                    break
+
+                start, end = found.span(kind)
+                if kind == 'ident':
+                    if end - start > self.MAXIMUM_STRING_LENGTH:
+                        return tokens, spans, ('too-long', 'Identifier is too long', start, end)
+                    value = text[start:end]
+                    add_token(reserved_keywords.get(value) or Token(TokenType.Ident, intern(value)))
+                elif kind == 'symbol':
+                    add_token(SYMBOL_TOKENS[text[start:end]])
+                elif kind == 'string':
+                    add_token(Token(TokenType.String, text[start:end]))
+                    # Include the quotes.
+                    start -= 1
+                    end = found.end()
+                else:
+                    if end - start - 1 > self.MAXIMUM_NUMBER_LENGTH:
+                        return tokens, spans, ('too-long', 'Number is too long', start, end)
+                    add_token(Token(TokenType.Number, text[start:end]))
+                if with_spans:
+                    add_span((start, end))
+
+            if pos >= length:
+                add_token(EOS_TOKEN)
+                if with_spans:
+                    add_span((length, length))
+                return tokens, spans, None
+
+            token, end, error = self._fallback(pos)
+            if error is not None:
+                return tokens, spans, error + (pos, max(end, pos + 1))
+            add_token(token)
+            if with_spans:
+                add_span((pos, end))
+            pos = end
+
+    def _is_terminator(self, char):
+        return char is None or char.isspace() or char in TERMINATORS
+
+    def _is_identifier_character(self, char):
+        return char.isalpha() or char.isdigit() or char in ['-', '\\', '_']
+
+    def _char_at(self, pos):
+        return self.text[pos] if pos < len(self.text) else None
+
+    def _check_number(self, start, value):
+        '''Applies `Lexer`'s decimal point and length rules to an already matched number; returns `(code, message)` or `None`.'''
+        is_decimal = False
+        dot = value.find('.', 1)
+        while dot != -1 and dot - 1 <= self.MAXIMUM_NUMBER_LENGTH:
+            if self._is_terminator(self._char_at(start + dot + 1)):
+                return 'invalid-number', 'Unexpected terminator after decimal point'
+            if is_decimal:
+                return 'invalid-number', 'Multiple decimal points in one number'
+            is_decimal = True
+            dot = value.find('.', dot + 1)
+
+        if len(value) - 1 > self.MAXIMUM_NUMBER_LENGTH:
+            return 'too-long', 'Unreasonable number length'
+        return None
+
+    def _number(self, start):
+        end = start + 1
+        char = self._char_at(end)
+        while char is not None and (char.isdigit() or char == '.'):
+            end += 1
+            char = self._char_at(end)
+
+        value = self.text[start:end]
+        return Token(TokenType.Number, value), end, self._check_number(start, value)
+
+    def _identifier(self, start):
+        parts = []
+        size = 0
+        pos = start
+        char = self._char_at(pos)
+        while char is not None:
+            if char == '\\':
+                pos += 1
+                char = self._char_at(pos)
+                if char is None:
+                    return None, pos, ('unexpected-end', 'Unexpected end of string')
+            elif not self._is_identifier_character(char):
+                break
+
+            parts.append(char)
+            size += 1
+            if size > self.MAXIMUM_STRING_LENGTH:
+                return None, pos, ('too-long', 'Unreasonable string length')
+
+            pos += 1
+            char = self._char_at(pos)
+
+        if not parts:
+            return None, pos, ('invalid-character', 'Invalid character')
+
+        if char is not None and not (self._is_terminator(char) or char in ['!', '=', '>', '<', '(', '.']):
+            return None, pos, ('invalid-identifier', f'Expected termination character after identifier, got {char}')
+
+        value = ''.join(parts).strip().strip('.')
+        if value in self.reserved_keywords:
+            return self.reserved_keywords[value], pos, None
+        return Token(TokenType.Ident, sys.intern(value)), pos, None
+
+    def _fallback(self, pos):
+        '''`(token, end, error)` at `pos`, where `error` is `None` or `(code, message)`.'''
+        char = self.text[pos]
+        if char.isdigit() or char in ['+', '-']:
+            return self._number(pos)
+        if char.isalpha() or char in ['\\', '_']:
+            return self._identifier(pos)
+        return None, pos, ('invalid-character', 'Invalid character')
+
+
+def lex(text):
+    '''Tokens of `text` as a tuple. Nothing is shared between calls, so any thread may call it.'''
+    return tuple(Scanner(text).iter_tokens())
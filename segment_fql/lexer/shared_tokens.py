@@ -0,0 +1,38 @@
+from segment_fql.lexer.token import Token
+from segment_fql.lexer.token_type import TokenType
+
+# Tokens without a variable part are created once and shared by every lexed query.
+# Treat them as immutable.
+
+SYMBOL_TOKENS = {
+    '=': Token(TokenType.Operator, '='),
+    '!=': Token(TokenType.Operator, '!='),
+    '!': Token(TokenType.Operator, '!'),
+    '>': Token(TokenType.Operator, '>'),
+    '>=': Token(TokenType.Operator, '>='),
+    '<': Token(TokenType.Operator, '<'),
+    '<=': Token(TokenType.Operator, '<='),
+    '+': Token(TokenType.Operator, '+'),
+    '-': Token(TokenType.Operator, '-'),
+    '*': Token(TokenType.Operator, '*'),
+    '/': Token(TokenType.Operator, '/'),
+    '.': Token(TokenType.Dot, '.'),
+    ',': Token(TokenType.Comma, ','),
+    '[': Token(TokenType.BrackLeft, '['),
+    ']': Token(TokenType.BrackRight, ']'),
+    '(': Token(TokenType.ParenLeft, '('),
+    ')': Token(TokenType.ParenRight, ')')
+}
+
+RESERVED_KEYWORDS = {
+    'true': Token(TokenType.Ident, 'true'),
+    'false': Token(TokenType.Ident, 'false'),
+    'null': Token(TokenType.Null, 'null'),
+    'event': Token(TokenType.Ident, 'event'),
+    'contains': Token(TokenType.Ident, 'contains'),
+    'match': Token(TokenType.Ident, 'match'),
+    'and': Token(TokenType.Logical, 'and'),
+    'or': Token(TokenType.Logical, 'or')
+}
+
+EOS_TOKEN = Token(TokenType.EOS, 'eos')
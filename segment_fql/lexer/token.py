@@ -1,4 +1,6 @@
 class Token:
+    __slots__ = ('type', 'value')
+
     def __init__(self, type, value=None):
         self.type = type
         self.value = value
@@ -1,3 +1,5 @@
-from segment_fql.parser.parser import Parser
+from segment_fql.parser.parser import Parser, parse
 from segment_fql.parser.ast_node import ASTNode
 from segment_fql.parser.ast_type import ASTType
+from segment_fql.parser.flat_ast import FlatAST
+from segment_fql.parser.document import Document
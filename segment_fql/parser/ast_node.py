@@ -1,4 +1,6 @@
 class ASTNode:
+    __slots__ = ('type', 'children')
+
     def __init__(self, node_type, children=None):
         self.type = node_type
         self.children = children or []
@@ -11,3 +13,12 @@ class ASTNode:
 
     def is_leaf(self):
         return not self.children
+
+    def freeze(self):
+        '''Turns every `children` list in this tree into a tuple, in place, so the tree can be shared safely.'''
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            node.children = tuple(node.children)
+            pending.extend(child for child in node.children if isinstance(child, ASTNode))
+        return self
@@ -10,4 +10,5 @@ class ASTType(str, Enum):
     OPERATOR = 'operator',
     CONDITIONAL = 'conditional',
     STATEMENT = 'statement',
-    GROUPING = 'grouping'
\ No newline at end of file
+    GROUPING = 'grouping',
+    LIST = 'list'
\ No newline at end of file
@@ -0,0 +1,435 @@
+from bisect import bisect_right
+
+from segment_fql.lexer import Scanner, TokenType
+from segment_fql.parser.ast_node import ASTNode
+from segment_fql.parser.ast_type import ASTType
+from segment_fql.parser.parser import Parser
+
+# Characters lexed past the end of an edit before looking for tokens that did not change; doubled until some are found.
+WINDOW = 64
+
+
+class Offsets:
+    '''
+    A sorted list of integers where adding a delta to every value from some
+    index on is deferred: values from `boundary` on are stored without the
+    pending `shift`. Moving the boundary costs the distance moved, so a run of
+    nearby edits, such as typing, costs the same however long the list is.
+    '''
+
+    __slots__ = ('values', 'boundary', 'shift')
+
+    def __init__(self, values):
+        self.values = values
+        self.boundary = len(values)
+        self.shift = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if index >= self.boundary:
+            return self.values[index] + self.shift
+        return self.values[index]
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self.values)))
+
+    def find(self, value):
+        '''Index of the last value not above `value`, or -1.'''
+        boundary = self.boundary
+        index = bisect_right(self.values, value, 0, boundary)
+        if index < boundary:
+            return index - 1
+        return bisect_right(self.values, value - self.shift, boundary) - 1
+
+    def replace(self, start, stop, values, delta):
+        '''Replaces the values from `start` to `stop` with `values` and adds `delta` to the ones after.'''
+        self._move(stop)
+        self.values[start:stop] = values
+        self.boundary = start + len(values)
+        self.shift += delta
+
+    def _move(self, index):
+        values, boundary, shift = self.values, self.boundary, self.shift
+        if index > boundary:
+            values[boundary:index] = [value + shift for value in values[boundary:index]]
+        elif index < boundary:
+            values[index:boundary] = [value - shift for value in values[index:boundary]]
+        self.boundary = index
+
+
+class Chain:
+    '''
+    One `and`/`or` chain of the tree, at the top or inside `!(...)`: its
+    right-nested `statement` nodes, where each operand starts relative to the
+    chain's first token, the chains of `!(...)` operands, and its length in
+    tokens, without the closing parenthesis.
+    '''
+
+    __slots__ = ('statements', 'starts', 'chains', 'size')
+
+    def __init__(self, statements, starts, chains, size):
+        self.statements = statements
+        self.starts = starts
+        self.chains = chains
+        self.size = size
+
+
+class Frame:
+    '''A chain being parsed.'''
+
+    __slots__ = ('start', 'opened', 'operands', 'starts', 'chains', 'connectors')
+
+    def __init__(self, start, opened=None):
+        self.start = start
+        self.opened = opened
+        self.operands = []
+        self.starts = []
+        self.chains = []
+        self.connectors = []
+
+    def add(self, operand, start, chain):
+        self.operands.append(operand)
+        self.starts.append(start)
+        self.chains.append(chain)
+
+    def statements(self, last):
+        '''The statement nodes of the operands, the last one followed by `last` if given, like `Parser._chain`.'''
+        operands, connectors = self.operands, self.connectors
+        if last is None:
+            node = ASTNode(ASTType.STATEMENT, [operands[-1]])
+            indexes = range(len(operands) - 2, -1, -1)
+        else:
+            node = last
+            indexes = range(len(operands) - 1, -1, -1)
+        statements = [node]
+        for index in indexes:
+            node = ASTNode(ASTType.STATEMENT, [operands[index], connectors[index], node])
+            statements.append(node)
+        if last is not None:
+            statements.pop(0)
+        statements.reverse()
+        return statements
+
+    def chain(self, end):
+        statements = self.statements(None)
+        return Chain(statements, Offsets([start - self.start for start in self.starts]), self.chains, end - self.start)
+
+
+class Irregular(Exception):
+    '''The tokens parse into something other than one chain; `Parser.parse()` handles those.'''
+
+
+def scan(text, start, stop):
+    '''
+    Tokens of `text[start:stop]` with their offsets in `text`, lexing on after
+    invalid tokens: returns `(tokens, starts, ends, errors)`, with errors as
+    `(code, message, start, end)`. The `eos` token is only kept when `stop` is
+    the end of `text`.
+    '''
+    tokens, starts, ends, errors = [], [], [], []
+    position = start
+    while True:
+        found, spans, error = Scanner(text[position:stop]).scan()
+        tokens.extend(found)
+        starts.extend(position + span[0] for span in spans)
+        ends.extend(position + span[1] for span in spans)
+        if error is None:
+            break
+        code, message, error_start, error_end = error
+        errors.append((code, message, position + error_start, position + error_end))
+        position += error_end
+
+    if stop < len(text):
+        del tokens[-1], starts[-1], ends[-1]
+    return tokens, starts, ends, errors
+
+
+class Document:
+    '''
+    A query being edited, e.g. in a filter editor validating every keystroke.
+    `edit(start, end, text)` replaces `text[start:end]`; afterwards `tokens`,
+    `ast` and `error` are the same as for lexing and parsing the whole new text:
+
+        document = Document('event = "A" and properties.x > 1')
+        document.edit(31, 32, '2')
+        document.ast    # the new tree, or `None` when `error` is set
+        document.error  # `None`, or the message `Scanner`/`Parser` would raise
+
+    Only the tokens around an edit are lexed again, until lexing reaches
+    tokens that were there before the edit. Then only the operands of the
+    innermost `and`/`or` chain (at the top or inside `!(...)`) that hold
+    changed tokens are parsed again, until parsing reaches an operand that was
+    there before; their new nodes are linked into the existing tree, which is
+    updated in place. Edits that change which chain a token belongs to, such
+    as adding a parenthesis, parse the enclosing `!(...)` again. Once the tree
+    is frozen, e.g. by `Filter.from_ast(query, document.ast)`, the next edit
+    parses the whole text into a new one.
+
+    Invalid text keeps the tree of the last valid one, so the operands changed
+    meanwhile are parsed once the text is valid again.
+    '''
+
+    def __init__(self, text=''):
+        self.text = text
+        tokens, starts, ends, errors = scan(text, 0, len(text))
+        self.tokens = tokens
+        self.starts = Offsets(starts)
+        self.ends = Offsets(ends)
+        self.errors = errors
+        self.root = None
+        self.chain = None
+        self.error = None
+        # Tokens changed since `chain` was parsed, as `(start, end)` in `tokens`, and how many tokens they added.
+        self.dirty = None
+        self.moved = 0
+        self.relexed_tokens = len(tokens)
+        self.reparsed_tokens = 0
+        self.full_parses = 0
+        self._parse()
+
+    @property
+    def ast(self):
+        return self.root if self.error is None else None
+
+    def span(self, index):
+        '''`(start, end)` offsets of `tokens[index]` in `text`.'''
+        return self.starts[index], self.ends[index]
+
+    def spans(self):
+        return list(zip(self.starts, self.ends))
+
+    def token_at(self, offset):
+        '''Index of the token starting at or before `offset`.'''
+        return max(0, self.starts.find(offset))
+
+    def stats(self):
+        '''Sizes of the last edit's work, to check that it stays local.'''
+        return {
+            'tokens': len(self.tokens),
+            'relexed_tokens': self.relexed_tokens,
+            'reparsed_tokens': self.reparsed_tokens,
+            'full_parses': self.full_parses,
+        }
+
+    def edit(self, start, end, text):
+        '''Replaces the characters from `start` to `end` with `text`.'''
+        if not 0 <= start <= end <= len(self.text):
+            raise Exception(f'Invalid edit range: {start}-{end} in a text of length {len(self.text)}')
+        old_length = len(self.text)
+        self.text = self.text[:start] + text + self.text[end:]
+        delta = len(text) - (end - start)
+        self._relex(start, start + len(text), delta, old_length)
+        self._parse()
+
+    def _relex(self, start, new_end, delta, old_length):
+        tokens, starts, ends = self.tokens, self.starts, self.ends
+        # From the token before the first one touching the edit, as a token's end depends on the character after it.
+        first = ends.find(start - 1) + 1
+        first = first - 1 if first > 0 else 0
+        restart = starts[first] if first > 0 else 0
+
+        stop = min(len(self.text), new_end + WINDOW)
+        while True:
+            found, found_starts, found_ends, found_errors = scan(self.text, restart, stop)
+            resumed = None
+            for index, found_start in enumerate(found_starts):
+                if found_start < new_end:
+                    continue
+                old = starts.find(found_start - delta)
+                if old >= 0 and starts[old] == found_start - delta:
+                    resumed = index, old
+                    break
+            if resumed is not None or stop == len(self.text):
+                break
+            stop = min(len(self.text), restart + 2 * (stop - restart))
+
+        if resumed is None:
+            resumed = len(found), len(tokens)
+            resumed_at = old_length + 1
+        else:
+            resumed_at = found_starts[resumed[0]] - delta
+        count, old = resumed
+        tokens[first:old] = found[:count]
+        starts.replace(first, old, found_starts[:count], delta)
+        ends.replace(first, old, found_ends[:count], delta)
+        self.errors = (
+            [error for error in self.errors if error[2] < restart]
+            + [error for error in found_errors if error[2] < resumed_at + delta]
+            + [(code, message, error_start + delta, error_end + delta) for code, message, error_start, error_end in self.errors if error_start >= resumed_at]
+        )
+        self.relexed_tokens = len(found)
+
+        added = count - (old - first)
+        if self.dirty is None:
+            self.dirty = (first, first + count)
+        else:
+            dirty_start, dirty_end = self.dirty
+            self.dirty = (min(dirty_start, first), dirty_end + added if dirty_end > old else first + count)
+        self.moved += added
+
+    def _parse(self):
+        self.reparsed_tokens = 0
+        if self.errors:
+            self.error = self.errors[0][1]
+            return
+        if self.chain is None or type(self.root.children) is tuple:
+            self._parse_all()
+            return
+        try:
+            self._update()
+        except Irregular:
+            self._parse_all()
+        except Exception as error:
+            self.error = str(error)
+
+    def _parser(self, position):
+        parser = Parser(self.tokens)
+        parser.pos = position
+        return parser
+
+    def _parse_all(self):
+        self.full_parses += 1
+        self.chain = None
+        self.root = None
+        self.dirty = None
+        self.moved = 0
+        self.reparsed_tokens = len(self.tokens)
+        try:
+            parser = self._parser(0)
+            try:
+                frame, _, end = self._chain(parser, 0, None)
+                if self.tokens[end].type != TokenType.EOS:
+                    raise Irregular()
+            except Irregular:
+                self.root = Parser(self.tokens).parse()
+                self.error = None
+                return
+        except Exception as error:
+            self.error = str(error)
+            return
+
+        self.chain = frame.chain(end)
+        self.root = ASTNode(ASTType.ROOT, [self.chain.statements[0]])
+        self.error = None
+
+    def _update(self):
+        '''Parses the operands holding `dirty` tokens again, in the innermost chain around them.'''
+        dirty_start, dirty_end = self.dirty
+        moved = self.moved
+        # `(chain, first token, operand holding the next chain)` from the top down.
+        path = []
+        chain, start = self.chain, 0
+        while True:
+            index = max(0, chain.starts.find(dirty_start - 1 - start))
+            inner = chain.chains[index]
+            if inner is None:
+                break
+            inner_start = start + chain.starts[index] + 2
+            if dirty_start < inner_start or dirty_end - moved > inner_start + inner.size:
+                break
+            path.append((chain, start, index))
+            chain, start = inner, inner_start
+
+        while True:
+            first = max(0, chain.starts.find(dirty_start - 1 - start))
+            position = start + chain.starts[first]
+            parser = self._parser(position)
+
+            def resync(position):
+                if position < dirty_end:
+                    return None
+                relative = position - moved - start
+                index = chain.starts.find(relative)
+                if index >= 0 and chain.starts[index] == relative:
+                    return index
+                return None
+
+            frame, resumed, end = self._chain(parser, len(path), resync)
+            self.reparsed_tokens += end - position
+            if resumed is not None:
+                self._splice(chain, first, resumed, frame, start, moved)
+                break
+            if end >= dirty_end and end - moved == start + chain.size:
+                if not path and self.tokens[end].type != TokenType.EOS:
+                    raise Irregular()
+                self._splice(chain, first, len(chain.statements), frame, start, moved)
+                break
+            # The chain now ends elsewhere: parse the operand holding it in the enclosing chain.
+            if not path:
+                raise Irregular()
+            chain, start, _ = path.pop()
+
+        owner = self.root
+        for parent, parent_start, index in path:
+            parent.starts.replace(index + 1, index + 1, [], moved)
+            parent.size += moved
+        if first == 0:
+            if path:
+                parent, _, index = path[-1]
+                owner = parent.statements[index].children[0].children[0]
+            owner.children[0] = chain.statements[0]
+
+        self.error = None
+        self.dirty = None
+        self.moved = 0
+
+    def _splice(self, chain, first, resumed, frame, start, moved):
+        '''Replaces operands `first` to `resumed` of `chain` with the ones parsed in `frame`.'''
+        statements = frame.statements(chain.statements[resumed] if resumed < len(chain.statements) else None)
+        if first > 0:
+            chain.statements[first - 1].children[2] = statements[0]
+        chain.statements[first:resumed] = statements
+        chain.starts.replace(first, resumed, [position - start for position in frame.starts], moved)
+        chain.chains[first:resumed] = frame.chains
+        chain.size += moved
+
+    def _chain(self, parser, depth, resync):
+        '''
+        Parses one chain, `depth` groupings deep, from `parser.pos` the way
+        `Parser._statement` does, also recording where operands start. Returns `(frame, resumed, end)`:
+        parsing stops at the end of the chain, at token `end`, or once
+        `resync(position)` returns the index of an old operand starting there.
+        '''
+        frames = [Frame(parser.pos)]
+        while True:
+            position = parser.pos
+            expression = parser._expression()
+            if expression is None:
+                if depth + len(frames) > parser.MAXIMUM_GROUPING_DEPTH:
+                    raise Exception(f'Maximum grouping depth of {parser.MAXIMUM_GROUPING_DEPTH} exceeded')
+                frames.append(Frame(parser.pos, position))
+                continue
+
+            inner = None
+            while True:
+                frame = frames[-1]
+                frame.add(expression, position, inner)
+                next_token = parser._peek()
+
+                if next_token.type == TokenType.Logical:
+                    frame.connectors.append(parser._next())
+                    if resync is not None and len(frames) == 1:
+                        resumed = resync(parser.pos)
+                        if resumed is not None:
+                            return frame, resumed, parser.pos
+                    break
+
+                if next_token.type != TokenType.EOS and next_token.type != TokenType.ParenRight:
+                    first_child = expression.children[0]
+                    expression_is_function = first_child is not None and first_child.type == ASTType.FUNC
+                    if not (expression_is_function and next_token.type == TokenType.Conditional):
+                        raise Exception(f'Unexpected token in statement: {next_token.type} ({next_token.value})')
+
+                if len(frames) == 1:
+                    return frame, None, parser.pos
+
+                frames.pop()
+                inner = frame.chain(parser.pos)
+                testing_right_paren = parser._next()
+                if testing_right_paren.type != TokenType.ParenRight:
+                    raise Exception(f'Expected "\\)", got {testing_right_paren.type} ({testing_right_paren.value})')
+
+                expression = ASTNode(ASTType.NOT, [ASTNode(ASTType.GROUPING, [inner.statements[0]])])
+                position = frame.opened
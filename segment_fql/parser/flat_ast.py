@@ -0,0 +1,123 @@
+from array import array
+
+from segment_fql.lexer import Token, TokenType
+from segment_fql.lexer.shared_tokens import SYMBOL_TOKENS, RESERVED_KEYWORDS
+from segment_fql.parser.ast_node import ASTNode
+from segment_fql.parser.ast_type import ASTType
+
+# One code space for both kinds of entries: AST node types first, then token types.
+NODE_TYPES = list(ASTType)
+TOKEN_TYPES = list(TokenType)
+NODE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+TOKEN_CODES = {token_type: len(NODE_TYPES) + code for code, token_type in enumerate(TOKEN_TYPES)}
+
+
+class FlatAST:
+    '''
+    An AST stored as parallel arrays instead of objects. Entries are laid out
+    breadth-first, so the children of entry `i` are the `child_counts[i]`
+    entries starting at `first_child[i]`. Token entries keep their value as an
+    index into `strings`; node entries have a value of -1.
+    '''
+
+    def __init__(self, codes, first_child, child_counts, values, strings):
+        self.codes = codes
+        self.first_child = first_child
+        self.child_counts = child_counts
+        self.values = values
+        self.strings = strings
+
+    @classmethod
+    def from_node(cls, root):
+        codes = []
+        first_child = []
+        child_counts = []
+        values = []
+        strings = []
+        string_indexes = {}
+
+        entries = [root]
+        index = 0
+        while index < len(entries):
+            entry = entries[index]
+            if isinstance(entry, ASTNode):
+                codes.append(NODE_CODES[entry.type])
+                first_child.append(len(entries))
+                child_counts.append(len(entry.children))
+                values.append(-1)
+                entries.extend(entry.children)
+            else:
+                if entry.value not in string_indexes:
+                    string_indexes[entry.value] = len(strings)
+                    strings.append(entry.value)
+                codes.append(TOKEN_CODES[entry.type])
+                first_child.append(0)
+                child_counts.append(0)
+                values.append(string_indexes[entry.value])
+            index += 1
+
+        # Arrays built in one go are sized exactly, unlike arrays grown by appending.
+        return cls(array('B', codes), array('I', first_child), array('I', child_counts), array('i', values), strings)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __eq__(self, other):
+        if not isinstance(other, FlatAST):
+            return NotImplemented
+        return (
+            self.codes == other.codes and self.first_child == other.first_child
+            and self.child_counts == other.child_counts
+            and [self.strings[value] if value >= 0 else None for value in self.values]
+            == [other.strings[value] if value >= 0 else None for value in other.values]
+        )
+
+    def is_token(self, index):
+        return self.codes[index] >= len(NODE_TYPES)
+
+    def type_of(self, index):
+        code = self.codes[index]
+        if code < len(NODE_TYPES):
+            return NODE_TYPES[code]
+        return TOKEN_TYPES[code - len(NODE_TYPES)]
+
+    def children_of(self, index):
+        start = self.first_child[index]
+        return range(start, start + self.child_counts[index])
+
+    def token_at(self, index):
+        token_type = self.type_of(index)
+        value = self.strings[self.values[index]]
+        shared = SYMBOL_TOKENS.get(value) or RESERVED_KEYWORDS.get(value)
+        if shared is not None and shared.type == token_type:
+            return shared
+        return Token(token_type, value)
+
+    def to_node(self, tokens=None):
+        '''
+        Rebuilds the equivalent `ASTNode` tree, without recursion. Tokens are
+        shared by `(code, value)` within the tree, and across calls when the same
+        `tokens` dict is passed.
+        '''
+        if tokens is None:
+            tokens = {}
+        node_count = len(NODE_TYPES)
+        strings = self.strings
+
+        entries = []
+        for index, code in enumerate(self.codes):
+            if code < node_count:
+                entries.append(ASTNode(NODE_TYPES[code]))
+                continue
+
+            key = (code, self.values[index])
+            token = tokens.get(key)
+            if token is None:
+                token = tokens[key] = self.token_at(index)
+            entries.append(token)
+
+        for index, count in enumerate(self.child_counts):
+            if count:
+                start = self.first_child[index]
+                entries[index].children = entries[start:start + count]
+        return entries[0]
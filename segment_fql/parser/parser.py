@@ -1,76 +1,102 @@
-from segment_fql.lexer import TokenType, Token
+import copy
+
+from segment_fql.lexer import TokenType, lex
+from segment_fql.lexer.shared_tokens import EOS_TOKEN
+from segment_fql.functions import default_registry
 from segment_fql.parser.ast_node import ASTNode
 from segment_fql.parser.ast_type import ASTType
 
+LIST_VALUE_TYPES = frozenset([TokenType.String, TokenType.Number, TokenType.Null])
+
+
 class Parser:
     def __init__(self, tokens):
-        self.supported_functions = ['contains', 'match']
-        self.queue = tokens
+        self.MAXIMUM_GROUPING_DEPTH = 1000
+        self.supported_functions = default_registry.names()
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return EOS_TOKEN
 
     def _next(self):
-        upcoming = self.queue[0]
+        upcoming = self._peek()
         if upcoming.type != TokenType.EOS:
-            return self.queue.pop(0)
-        return Token(TokenType.EOS, 'eos')
-        
-    def _statement(self):
-        node = ASTNode(ASTType.STATEMENT)
-        expression = self._expression()
-        node.children.append(expression)
-        next_token = self.queue[0]
-
-        # End of statement, or right parenthesis, to be solved by parent `grouping`.
-        if next_token.type == TokenType.EOS or next_token.type == TokenType.ParenRight:
-            return node
+            self.pos += 1
+            return upcoming
+        return EOS_TOKEN
 
-        if next_token.type == TokenType.Logical:
-            node.children.append(self._next())
-            node.children.append(self._statement())
-            return node
-
-        first_child = expression.children[0]
-        expression_is_function = first_child is not None and first_child.type == ASTType.FUNC
-        if expression_is_function and next_token.type == TokenType.Conditional:
-            return node
-
-        raise Exception(f'Unexpected token in statement: {next_token.type} ({next_token.value})')
+    def _statement(self):
+        # Each frame collects one logical chain as [expression, logical, expression, ...].
+        # `!(` opens a new frame instead of recursing, so nesting is bounded by
+        # MAXIMUM_GROUPING_DEPTH rather than by the Python stack.
+        frames = [[]]
+        while True:
+            expression = self._expression()
+            if expression is None:
+                if len(frames) > self.MAXIMUM_GROUPING_DEPTH:
+                    raise Exception(f'Maximum grouping depth of {self.MAXIMUM_GROUPING_DEPTH} exceeded')
+                frames.append([])
+                continue
+
+            while True:
+                frames[-1].append(expression)
+                next_token = self._peek()
+
+                if next_token.type == TokenType.Logical:
+                    frames[-1].append(self._next())
+                    break
+
+                # End of statement, or right parenthesis, to be solved by the enclosing `grouping`.
+                if next_token.type != TokenType.EOS and next_token.type != TokenType.ParenRight:
+                    first_child = expression.children[0]
+                    expression_is_function = first_child is not None and first_child.type == ASTType.FUNC
+                    if not (expression_is_function and next_token.type == TokenType.Conditional):
+                        raise Exception(f'Unexpected token in statement: {next_token.type} ({next_token.value})')
+
+                statement = self._chain(frames.pop())
+                if not frames:
+                    return statement
+
+                testing_right_paren = self._next()
+                if testing_right_paren.type != TokenType.ParenRight:
+                    raise Exception(f'Expected "\\)", got {testing_right_paren.type} ({testing_right_paren.value})')
+
+                expression = ASTNode(ASTType.NOT, [ASTNode(ASTType.GROUPING, [statement])])
+
+    def _chain(self, pieces):
+        '''Builds the right-nested `statement` nodes for `[expression, logical, expression, ...]`.'''
+        node = ASTNode(ASTType.STATEMENT, [pieces[-1]])
+        for index in range(len(pieces) - 3, -1, -2):
+            node = ASTNode(ASTType.STATEMENT, [pieces[index], pieces[index + 1], node])
+        return node
 
     def _conditional(self, left_operand):
         node = ASTNode(ASTType.CONDITIONAL)
         node.children.append(left_operand)
         operator = self._next()
         node.children.append(operator)
-        right_operand = self.queue[0]
+        right_operand = self._peek()
 
         # Paths or functions
         if right_operand.type == TokenType.Ident:
             node.children.append(self._pathOrFunction(self._next()))
         # Lists
         elif right_operand.type == TokenType.BrackLeft:
+            if operator.value not in ['=', '!=']:
+                raise Exception(f'Unsupported operator for list: {operator.value}')
             node.children.append(self._list())
         else:
             node.children.append(self._next())
 
         return node
 
-    def _grouping(self):
-        node = ASTNode(ASTType.GROUPING)
-        testing_left_paren = self._next()
-        
-        if testing_left_paren.type != TokenType.ParenLeft:
-            raise Exception(f'Expected "\(", got {testing_left_paren.type} ({testing_left_paren.value})')
-
-        node.children.append(self._statement())
-        testing_right_paren = self._next()
-
-        if testing_right_paren.type != TokenType.ParenRight:
-            raise Exception(f'Expected "\)", got {testing_right_paren.type} ({testing_right_paren.value})')
-        
-        return node
-
     def _expression(self):
+        '''Returns `None` after consuming the `!(` of a grouping, which `_statement` then opens.'''
         left_operand = self._next()
-        upcoming = self.queue[0]
+        upcoming = self._peek()
 
         if upcoming.type not in [
             TokenType.Operator, 
@@ -85,14 +111,15 @@ class Parser:
         ]:
             raise Exception(f'Unsupported token: {upcoming.type} ({upcoming.value})')
 
-        if upcoming.type == TokenType.Dot or upcoming.type == TokenType.Ident:
+        is_function_call = left_operand.type == TokenType.Ident and upcoming.type == TokenType.ParenLeft
+        if upcoming.type == TokenType.Dot or upcoming.type == TokenType.Ident or is_function_call:
             left_operand = self._pathOrFunction(left_operand)
-            upcoming = self.queue[0]
+            upcoming = self._peek()
         if upcoming.type == TokenType.Operator:
             return self._conditional(left_operand)
         elif left_operand.type == TokenType.Operator and upcoming.type == TokenType.ParenLeft:
-            node = ASTNode(ASTType.NOT)
-            node.children.append(self._grouping())
+            self._next()
+            return None
         else: # Unary operator
             node = ASTNode(ASTType.EXPR)
             node.children.append(left_operand)
@@ -107,7 +134,7 @@ class Parser:
 
     def _pathOrFunction(self, previous):
         '''things like `message.event` or `contains(...)`'''
-        next_token = self.queue[0]
+        next_token = self._peek()
 
         if next_token.type == TokenType.ParenLeft:
             return self._function(previous)
@@ -118,11 +145,39 @@ class Parser:
         node = ASTNode(ASTType.PATH)
         node.children.append(previous)
 
-        while self.queue[0].type == TokenType.Dot or self.queue[0].type == TokenType.Ident:
+        while self._peek().type == TokenType.Dot or self._peek().type == TokenType.Ident:
             node.children.append(self._next())
 
         return node
 
+    def _list(self):
+        '''things like `["a", "b"]`: strings, numbers, `true`, `false` and `null`'''
+        # Lists may hold many thousands of values, so the tokens are indexed directly.
+        tokens = self.tokens
+        count = len(tokens)
+        pos = self.pos + 1
+        node = ASTNode(ASTType.LIST)
+        if pos < count and tokens[pos].type == TokenType.BrackRight:
+            self.pos = pos + 1
+            return node
+
+        values = node.children
+        while True:
+            value = tokens[pos] if pos < count else EOS_TOKEN
+            if value.type not in LIST_VALUE_TYPES and not (value.type == TokenType.Ident and value.value in ['true', 'false']):
+                self.pos = pos
+                raise Exception(f'Unsupported list value: {value.type} ({value.value})')
+            values.append(value)
+
+            separator = tokens[pos + 1] if pos + 1 < count else EOS_TOKEN
+            pos += 2
+            if separator.type == TokenType.BrackRight:
+                self.pos = pos
+                return node
+            if separator.type != TokenType.Comma:
+                self.pos = pos - 1
+                raise Exception(f'Expected "," or "]", got {separator.type} ({separator.value})')
+
     def _function(self, previous):
         if previous.type != TokenType.Ident or previous.value not in self.supported_functions:
             raise Exception(f'Unsupported function: {previous.value}')
@@ -135,7 +190,7 @@ class Parser:
             raise Exception(f'Expected "\(", got {testing_left_paren.type} ({testing_left_paren.value})')
 
         left_operand = ASTNode(ASTType.EXPR)
-        upcoming = self.queue[0]
+        upcoming = self._peek()
         if upcoming.type == TokenType.String:
             left_operand.children.append(self._next())
         elif upcoming.type == TokenType.Ident:
@@ -164,10 +219,20 @@ class Parser:
         return node
 
     def parse(self):
+        '''
+        The AST of `tokens`. Each call reads the tokens with its own copy of the
+        cursor and never modifies them, so a parser can be parsed again or shared
+        between threads.
+        '''
+        return copy.copy(self)._parse()
+
+    def _parse(self):
+        self.pos = 0
         root_node = ASTNode(ASTType.ROOT)
         root_node.children.append(self._statement())
-        while self.queue:
-            token = self.queue.pop(0)
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            self.pos += 1
             if token.type == TokenType.EOS:
                 return root_node
 
@@ -175,4 +240,9 @@ class Parser:
             root_node.children.append(self._statement())
 
         raise Exception(f'Unexpected token of type "type" and value "value"')
-            
\ No newline at end of file
+            
+
+
+def parse(query):
+    '''The frozen AST of `query`, given as text or tokens. Safe to call from any thread.'''
+    return Parser(lex(query) if isinstance(query, str) else query).parse().freeze()
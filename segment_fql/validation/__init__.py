@@ -0,0 +1 @@
+from segment_fql.validation.validator import Validator, Diagnostic, ValidationResult, CODES, validate, validate_many
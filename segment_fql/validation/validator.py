@@ -0,0 +1,321 @@
+import multiprocessing
+import re
+
+from segment_fql.lexer import Scanner, TokenType
+from segment_fql.compiler.semantics import COMPARISON_OPERATORS
+from segment_fql.functions import default_registry
+
+# Diagnostic codes. `too-long`, `unexpected-end`, `invalid-character`,
+# `invalid-identifier` and `invalid-number` also come from lexing.
+CODES = {
+    'invalid-character': 'a character that cannot start a token',
+    'invalid-identifier': 'an identifier followed by a character that cannot end it',
+    'invalid-number': 'a malformed number, such as `1.` or `+`',
+    'too-long': 'an identifier or number over the lexer limits',
+    'unexpected-end': 'the query ends where a value or field is expected',
+    'unexpected-token': 'a token that cannot appear here, including an unmatched `)`',
+    'unclosed-group': 'a `!(` without its `)`',
+    'nesting-too-deep': 'more nested `!(...)` groups than the parser allows',
+    'unsupported-function': 'a call to a function that is not registered',
+    'invalid-function-call': 'function arguments other than `(field or string, "pattern")`',
+    'invalid-list': 'a list with something other than strings, numbers, booleans and null',
+    'list-operator': 'a list compared with an operator other than `=` or `!=`',
+    'unsupported-operator': 'a comparison operator that is not `=`, `!=`, `>`, `<`, `>=` or `<=`',
+    'expected-value': 'a token used as a value that is not a literal or a field',
+    'invalid-path': 'a path that does not start with a field name',
+}
+
+# What `int()`/`float()` accept among the numbers the lexer produces.
+NUMBER_PATTERN = re.compile(r'[+\-]?(?:\d+(?:\.\d*)?|\.\d+)')
+LIST_VALUE_TYPES = frozenset([TokenType.String, TokenType.Number, TokenType.Null])
+UNSUPPORTED_AFTER_OPERAND = frozenset([TokenType.Logical, TokenType.Comma, TokenType.BrackRight, TokenType.ParenRight])
+
+
+class Diagnostic:
+    '''An error in a query: a code from `CODES`, a message and the `[start, end)` character span.'''
+    __slots__ = ('code', 'message', 'start', 'end')
+
+    def __init__(self, code, message, start, end):
+        self.code = code
+        self.message = message
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f'Diagnostic({self.code!r}, {self.message!r}, {self.start}, {self.end})'
+
+    def __eq__(self, other):
+        return isinstance(other, Diagnostic) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        return {'code': self.code, 'message': self.message, 'start': self.start, 'end': self.end}
+
+
+class ValidationResult:
+    __slots__ = ('query', 'diagnostics')
+
+    def __init__(self, query, diagnostics):
+        self.query = query
+        self.diagnostics = diagnostics
+
+    @property
+    def valid(self):
+        return not self.diagnostics
+
+    def __repr__(self):
+        return f'ValidationResult({self.query!r}, {self.diagnostics!r})'
+
+    def to_dict(self):
+        return {'query': self.query, 'valid': self.valid, 'diagnostics': [diagnostic.to_dict() for diagnostic in self.diagnostics]}
+
+
+class Validator:
+    '''
+    Checks a query without building an AST or raising: `validate()` returns the
+    list of `Diagnostic`s, empty exactly when `Filter(query)` would compile. It
+    follows `Scanner`, `Parser` and the checks `Compiler` makes on values, on
+    the tokens with their source spans.
+
+    Parsing stops at the first syntax error; value errors before it (e.g. an
+    invalid number or path) are reported too. Very deep groupings within
+    `MAXIMUM_GROUPING_DEPTH` are accepted, although compiling them may still
+    exhaust the Python stack.
+    '''
+
+    def __init__(self, query, functions=None):
+        self.MAXIMUM_GROUPING_DEPTH = 1000
+        self.query = query
+        self.functions = functions or default_registry
+        self.supported_functions = self.functions.names()
+        self.tokens = None
+        self.spans = None
+        self.pos = 0
+        self.diagnostics = []
+
+    def validate(self):
+        # Spans are only needed for diagnostics, so valid queries skip them.
+        tokens, _, error = Scanner(self.query).scan(with_spans=False)
+        if error is not None:
+            return [Diagnostic(*error)]
+
+        self.tokens = tokens
+        if self._statement() and tokens[self.pos].type != TokenType.EOS:
+            self._fail('unexpected-token', 'Unmatched ")"', self.pos)
+        return self.diagnostics
+
+    def _statement(self):
+        tokens = self.tokens
+        # Token indexes of the `!(` of each open grouping, for their spans.
+        openings = []
+        while True:
+            operand = self._operand()
+            if operand is None:
+                return False
+            if operand == 'group':
+                if len(openings) >= self.MAXIMUM_GROUPING_DEPTH:
+                    return self._fail('nesting-too-deep', f'Maximum grouping depth of {self.MAXIMUM_GROUPING_DEPTH} exceeded', self.pos - 2, self.pos - 1)
+                openings.append(self.pos - 2)
+                continue
+
+            while True:
+                upcoming = tokens[self.pos].type
+                if upcoming == TokenType.Logical:
+                    self.pos += 1
+                    break
+                if upcoming != TokenType.EOS and upcoming != TokenType.ParenRight:
+                    return self._fail('unexpected-token', f'Expected "and", "or" or the end of the query, got {self._describe(self.pos)}', self.pos)
+                if not openings:
+                    return True
+                if upcoming != TokenType.ParenRight:
+                    return self._fail('unclosed-group', 'Expected ")" to close "!("', openings[-1], self.pos)
+                openings.pop()
+                self.pos += 1
+
+    def _operand(self):
+        '''`'group'` after the `!(` of a grouping, `None` on a syntax error, `True` otherwise.'''
+        tokens = self.tokens
+        start = self.pos
+        left = tokens[start]
+        if left.type != TokenType.EOS:
+            self.pos += 1
+        upcoming = tokens[self.pos].type
+        if upcoming in UNSUPPORTED_AFTER_OPERAND:
+            if left.type != TokenType.Operator and left.type != TokenType.EOS:
+                return self._fail('unexpected-token', f'Expected an operator after {self._describe(start)}, got {self._describe(self.pos)}', self.pos)
+            return self._fail('unexpected-token', f'Unexpected {self._describe(self.pos)}', self.pos)
+
+        kind = 'token'
+        if upcoming == TokenType.Dot or upcoming == TokenType.Ident:
+            self._path_tail()
+            kind = 'path'
+        elif upcoming == TokenType.ParenLeft and left.type == TokenType.Ident:
+            if not self._function(start):
+                return None
+            kind = 'function'
+        end = self.pos
+
+        upcoming = tokens[self.pos].type
+        if upcoming == TokenType.Operator:
+            return self._conditional(start, end, kind)
+        if left.type == TokenType.Operator and upcoming == TokenType.ParenLeft:
+            self.pos += 1
+            return 'group'
+
+        self._check_value(start, end, kind)
+        return True
+
+    def _conditional(self, left_start, left_end, left_kind):
+        tokens = self.tokens
+        operator = self.pos
+        self.pos += 1
+
+        right_start = self.pos
+        right = tokens[right_start]
+        if right.type == TokenType.Ident:
+            self.pos += 1
+            if tokens[self.pos].type == TokenType.ParenLeft:
+                if not self._function(right_start):
+                    return None
+                right_kind = 'function'
+            else:
+                self._path_tail()
+                right_kind = 'path'
+        elif right.type == TokenType.BrackLeft:
+            if tokens[operator].value not in ['=', '!=']:
+                return self._fail('list-operator', f'Lists can only be compared with "=" or "!=", not "{tokens[operator].value}"', operator)
+            if not self._list():
+                return None
+            right_kind = 'list'
+        else:
+            if right.type != TokenType.EOS:
+                self.pos += 1
+            right_kind = 'token'
+
+        if tokens[operator].value not in COMPARISON_OPERATORS:
+            self._report('unsupported-operator', f'Unsupported operator: {tokens[operator].value}', operator)
+        self._check_value(left_start, left_end, left_kind)
+        self._check_value(right_start, self.pos, right_kind)
+        return True
+
+    def _path_tail(self):
+        tokens = self.tokens
+        while tokens[self.pos].type == TokenType.Dot or tokens[self.pos].type == TokenType.Ident:
+            self.pos += 1
+
+    def _function(self, name):
+        '''Checks a call whose name is at `name` and `(` follows; `False` on a syntax error.'''
+        tokens = self.tokens
+        if tokens[name].value not in self.supported_functions:
+            return self._fail('unsupported-function', f'Unsupported function: {tokens[name].value}', name)
+        self.pos = name + 2
+
+        subject = tokens[self.pos].type
+        if subject == TokenType.String:
+            self.pos += 1
+        elif subject == TokenType.Ident:
+            self.pos += 1
+            self._path_tail()
+        else:
+            return self._fail('invalid-function-call', f'Expected a field or a string as the first argument, got {self._describe(self.pos)}', self.pos)
+
+        for expected, description in [(TokenType.Comma, '","'), (TokenType.String, 'a string pattern'), (TokenType.ParenRight, '")"')]:
+            if tokens[self.pos].type != expected:
+                return self._fail('invalid-function-call', f'Expected {description} in {tokens[name].value}(), got {self._describe(self.pos)}', self.pos)
+            self.pos += 1
+        return True
+
+    def _list(self):
+        tokens = self.tokens
+        pos = self.pos + 1
+        if tokens[pos].type == TokenType.BrackRight:
+            self.pos = pos + 1
+            return True
+
+        while True:
+            value = tokens[pos]
+            if value.type not in LIST_VALUE_TYPES and not (value.type == TokenType.Ident and value.value in ['true', 'false']):
+                return self._fail('invalid-list', f'Lists can only hold strings, numbers, booleans and null, got {self._describe(pos)}', pos)
+            if value.type == TokenType.Number:
+                self._check_number(pos)
+
+            separator = tokens[pos + 1].type
+            pos += 2
+            if separator == TokenType.BrackRight:
+                self.pos = pos
+                return True
+            if separator != TokenType.Comma:
+                return self._fail('invalid-list', f'Expected "," or "]", got {self._describe(pos - 1)}', pos - 1)
+
+    def _check_value(self, start, end, kind):
+        '''The checks `Compiler` makes on an operand: a literal or a field, and a valid number.'''
+        if kind == 'path':
+            if self.tokens[start].type != TokenType.Ident:
+                self._report('invalid-path', f'A path must start with a field name, got {self._describe(start)}', start, end - 1)
+            return
+        if kind != 'token':
+            return
+
+        token = self.tokens[start]
+        if token.type == TokenType.Number:
+            self._check_number(start)
+        elif token.type == TokenType.EOS:
+            self._report('unexpected-end', 'Unexpected end of query, expected a field or a value', start)
+        elif token.type not in [TokenType.String, TokenType.Null, TokenType.Ident]:
+            self._report('expected-value', f'Expected a field or a value, got {self._describe(start)}', start)
+
+    def _check_number(self, index):
+        if NUMBER_PATTERN.fullmatch(self.tokens[index].value) is None:
+            self._report('invalid-number', f'Invalid number: {self.tokens[index].value}', index)
+
+    def _describe(self, index):
+        token = self.tokens[index]
+        if token.type == TokenType.EOS:
+            return 'the end of the query'
+        start, end = self._spans()[index]
+        if token.type == TokenType.String:
+            return self.query[start:end]
+        return f'"{self.query[start:end]}"'
+
+    def _spans(self):
+        if self.spans is None:
+            self.spans = Scanner(self.query).scan()[1]
+        return self.spans
+
+    def _report(self, code, message, first, last=None):
+        '''Records a diagnostic spanning the tokens `first` to `last` (inclusive).'''
+        spans = self._spans()
+        start = spans[first][0]
+        end = spans[first if last is None else last][1]
+        self.diagnostics.append(Diagnostic(code, message, start, end))
+
+    def _fail(self, code, message, first, last=None):
+        '''Records a syntax error, after dropping value errors at or after it, and returns `None`.'''
+        start = self._spans()[first][0]
+        self.diagnostics = [diagnostic for diagnostic in self.diagnostics if diagnostic.start < start]
+        self._report(code, message, first, last)
+        return None
+
+
+def validate(query, functions=None):
+    '''A `ValidationResult` for one query; never raises on invalid input.'''
+    return ValidationResult(query, Validator(query, functions).validate())
+
+
+def _diagnostics(query):
+    return Validator(query).validate()
+
+
+def validate_many(queries, workers=1, chunk_size=2000):
+    '''
+    `ValidationResult`s for `queries`, in order. With `workers` other than 1
+    (`None` for one per CPU) and more than `chunk_size` queries, chunks of
+    `chunk_size` are validated in a process pool; functions registered after
+    the workers start are not seen by them.
+    '''
+    queries = list(queries)
+    if workers == 1 or len(queries) <= chunk_size:
+        return [ValidationResult(query, Validator(query).validate()) for query in queries]
+
+    with multiprocessing.Pool(workers) as pool:
+        found = pool.map(_diagnostics, queries, chunk_size)
+    return [ValidationResult(query, result) for query, result in zip(queries, found)]
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import AdaptiveFilter, Compiler
+
+from tests.test_compiler import EVENTS, QUERIES
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+def clause_order(adaptive):
+    return [repr(operand.node) for operand in adaptive.plan.operands[0].operands]
+
+
+class TestAdaptiveFilter:
+    def test_adaptive_moves_selective_clause_first(self):
+        adaptive = AdaptiveFilter(parse('contains(properties.description, "x") and event = "Click"'), reorder_every=100, sample_every=1)
+        events = [{'event': 'Click' if index % 10 == 0 else 'View', 'properties': {'description': 'x' * 2000 + 'y'}} for index in range(300)]
+        results = [adaptive(event) for event in events]
+        assert results == [event['event'] == 'Click' for event in events]
+        assert 'Click' in clause_order(adaptive)[0]
+
+    def test_adaptive_reorders_or_chains(self):
+        adaptive = AdaptiveFilter(parse('event = "a" or event = "b" or event = "c"'), reorder_every=1000)
+        for index in range(500):
+            adaptive({'event': 'c' if index % 5 else 'a'})
+        adaptive.reorder()
+        first = adaptive.plan.operands[0]
+        assert first.key == '/2'
+
+    def test_adaptive_export_and_load(self):
+        ast = parse('properties.plan = "pro" and type = "track" or !(event = "a" and contains(properties.url, "x"))')
+        adaptive = AdaptiveFilter(ast, reorder_every=50, sample_every=1)
+        for index in range(200):
+            adaptive({'type': 'page', 'event': 'a', 'properties': {'plan': 'pro' if index % 7 else 'free', 'url': 'xyz'}})
+
+        exported = json.loads(json.dumps(adaptive.export_stats()))
+        restored = AdaptiveFilter(parse('properties.plan = "pro" and type = "track" or !(event = "a" and contains(properties.url, "x"))'))
+        restored.load_stats(exported)
+        assert restored.export_stats() == adaptive.export_stats()
+        assert repr(restored.to_ast()) == repr(adaptive.to_ast())
+
+        with pytest.raises(Exception):
+            AdaptiveFilter(parse('event = "a"')).load_stats(exported)
+
+    @pytest.mark.parametrize('order', [
+        {'/0': ['/0/0']},
+        {'/0': ['/0/0', '/0/0']},
+        {'/0': ['/0/1', '/0/0'], '/0/1': ['/0/0']},
+        {'/': ['/0/0'], '/0': ['/0', '/0/1']},
+    ])
+    def test_adaptive_rejects_tampered_order(self, order):
+        adaptive = AdaptiveFilter(parse('a = 1 and b = 2'))
+        exported = adaptive.export_stats()
+        exported['order'].update(order)
+        with pytest.raises(Exception, match='different filter'):
+            adaptive.load_stats(exported)
+        assert not adaptive({'a': 1, 'b': 3}) and adaptive({'a': 1, 'b': 2})
+
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_adaptive_results_do_not_change(self, query):
+        ast = parse(query)
+        events = EVENTS * 3
+        expected = [Compiler(ast).compile()(event) for event in events]
+        adaptive = AdaptiveFilter(ast, reorder_every=3, sample_every=1)
+        for _ in range(3):
+            assert [adaptive(event) for event in events] == expected
+            assert [adaptive.compile()(event) for event in events] == expected
@@ -0,0 +1,176 @@
+import random
+
+import pytest
+
+from segment_fql.compiler import Compiler, FilterAnalysis
+from segment_fql.compiler.analysis import canonical_key, equivalent, implies
+from benchmarks.bench_analysis import workspace
+
+from tests.test_optimizer import DOMAIN_EVENTS, parse, random_query
+
+
+def brute_implies(stronger, weaker, events):
+    stronger, weaker = Compiler(parse(stronger)).compile(), Compiler(parse(weaker)).compile()
+    return all(weaker(event) for event in events if stronger(event))
+
+
+class TestAnalysis:
+    def test_implies_agrees_with_brute_force(self):
+        rng = random.Random(21)
+        decided = 0
+        for _ in range(500):
+            stronger, weaker = random_query(rng), random_query(rng)
+            result = implies(parse(stronger), parse(weaker))
+            if result is True:
+                assert brute_implies(stronger, weaker, DOMAIN_EVENTS), (stronger, weaker)
+            decided += result is not None
+        assert decided > 450
+
+    @pytest.mark.parametrize('first, second', [
+        ('a = 1 and b = "x"', 'b = "x" and a = 1'),
+        ('a = 1', '1 = a'),
+        ('a > 1.0', '1 < a'),
+        ('a = ["x", 1, null]', 'a = [null, "x", 1.0]'),
+        ('!(a = 1 or b = 2)', 'a != 1 and b != 2'),
+        ('contains(a, "x") or b = 1', 'b = 1 or contains(a, "x")'),
+    ])
+    def test_canonical_key(self, first, second):
+        assert canonical_key(parse(first)) == canonical_key(parse(second))
+
+    @pytest.mark.parametrize('first, second', [
+        ('a = 1', 'a = true'),
+        ('a = 1', 'a = "1"'),
+        ('a.b = 1', 'a = 1'),
+        ('a > 1', 'a >= 1'),
+    ])
+    def test_canonical_key_differs(self, first, second):
+        assert canonical_key(parse(first)) != canonical_key(parse(second))
+
+    @pytest.mark.parametrize('stronger, weaker, expected', [
+        ('event = "A" and properties.x = 1', 'event = "A"', True),
+        ('event = "A"', 'event = "A" and properties.x = 1', False),
+        ('a > 5', 'a > 3', True),
+        ('a > 3', 'a > 5', False),
+        ('a > 3 and a < 4', 'a != 3', True),
+        ('a = "b"', 'a >= "a" and a < "c"', True),
+        ('a = ["x", "y"]', 'a != "z"', True),
+        ('a = ["x", "y"]', 'a', True),
+        ('a = 1', 'a != null', True),
+        ('a != null', 'a = 1', False),
+        ('a = 1', 'a = true', False),
+        ('a = 1 and a = 2', 'b = 3', True),
+        ('b = 3', 'a = 1 or !(a = 1)', True),
+        ('a.b = 1', 'a', None),
+        ('contains(a, "x") and b = 1', 'b = 1 or c = 2', True),
+        ('contains(a, "x") and b = 1', 'contains(a, "x")', True),
+        ('b = 1', 'contains(a, "x")', False),
+        ('contains(a, "x")', 'a != null', None),
+        ('contains(a, "xy")', 'contains(a, "x")', None),
+        ('a = b', 'b = a', None),
+    ])
+    def test_implies(self, stronger, weaker, expected):
+        assert implies(parse(stronger), parse(weaker)) is expected
+
+    def test_equivalent(self):
+        assert equivalent(parse('a > 1 and a < 3 and a != 2 and a = [1, 2, 2.5]'), parse('a = 2.5')) is True
+        assert equivalent(parse('a = 1'), parse('a = 1 or a = 2')) is False
+        assert equivalent(parse('contains(a, "x")'), parse('contains(a, "x") and a')) is None
+
+    def test_too_many_worlds_is_unknown(self):
+        stronger = ' and '.join(f'f{index} = [1, 2]' for index in range(13))
+        weaker = ' or '.join(f'f{index} = 1' for index in range(13))
+        analysis = FilterAnalysis({'stronger': parse(stronger), 'weaker': parse(weaker)})
+        assert analysis.implies('stronger', 'weaker') is None
+        analysis.MAXIMUM_WORLDS = 10 ** 4
+        assert analysis.implies('stronger', 'weaker') is False
+
+    def test_duplicates_and_implications(self):
+        analysis = FilterAnalysis({
+            'a': parse('event = "A"'),
+            'b': parse('event = "A" and properties.x = 1'),
+            'c': parse('properties.x = 1 and "A" = event'),
+            'd': parse('event = "A" and properties.x > 0 and properties.x < 2 and properties.x = [1, 1.5]'),
+            'e': parse('event = "B"'),
+            'f': parse('event = ["A", "B"]'),
+        })
+        assert analysis.duplicates() == [['b', 'c']]
+        assert analysis.implications() == [('b', 'a'), ('d', 'a'), ('b', 'd'), ('a', 'f'), ('b', 'f'), ('d', 'f'), ('e', 'f')]
+        assert analysis.equivalent('b', 'd') is False
+
+    @pytest.mark.parametrize('query, expected', [
+        ('a = 1', False),
+        ('a > 2 and a < 1', True),
+        ('a > 7 and a = "v7"', True),
+        ('contains(a, "x") and a = null', None),
+    ])
+    def test_never_matches(self, query, expected):
+        assert FilterAnalysis({0: parse(query)}).never_matches(0) is expected
+
+    def test_duplicate_id(self):
+        analysis = FilterAnalysis({'a': parse('a = 1')})
+        with pytest.raises(Exception, match='Duplicate filter id'):
+            analysis.add('a', parse('a = 2'))
+
+    def test_workspace_against_pairwise(self):
+        asts = {index: parse(query) for index, query in enumerate(workspace(150))}
+        analysis = FilterAnalysis(asts)
+        duplicates = analysis.duplicates()
+        for group in duplicates:
+            assert all(analysis.equivalent(group[0], filter_id) is True for filter_id in group[1:])
+
+        representatives = [filter_id for filter_id in asts if not any(filter_id in group[1:] for group in duplicates)]
+        expected = [
+            (stronger, weaker)
+            for weaker in representatives for stronger in representatives
+            if stronger != weaker and analysis.never_matches(stronger) is not True and analysis.implies(stronger, weaker) is True
+        ]
+        assert analysis.implications() == expected
+        assert len(expected) > 20
+
+    def test_workload_without_equalities(self):
+        shapes = [
+            lambda index: f'event = "A" and properties.x != {index}',
+            lambda index: f'properties.x > {index} and properties.x < {index + 5}',
+            lambda index: f'event = "B" or properties.y = {index}',
+            lambda index: f'properties.x < {index} and properties.x > -{index}',
+        ]
+        asts = {index: parse(shapes[index % 4](index)) for index in range(400)}
+        enumerated = []
+
+        class Counting(FilterAnalysis):
+            def _implies(self, stronger, weaker):
+                enumerated.append((stronger.filter_id, weaker.filter_id))
+                return super()._implies(stronger, weaker)
+
+        analysis = Counting(asts)
+        assert analysis.duplicates() == []
+        found = analysis.implications()
+        # Every pair is decided from the regions: nothing is compared pairwise.
+        assert enumerated == [] and analysis.unchecked == 0
+        assert len(found) == 9900
+        assert all(analysis.implies(stronger, weaker) is True for stronger, weaker in found)
+
+        small = {index: ast for index, ast in asts.items() if index < 60}
+        analysis = FilterAnalysis(small)
+        expected = [
+            (stronger, weaker)
+            for weaker in small for stronger in small
+            if stronger != weaker and analysis.never_matches(stronger) is not True and analysis.implies(stronger, weaker) is True
+        ]
+        assert analysis.implications() == expected
+
+    def test_nested_bands(self):
+        analysis = FilterAnalysis({index: parse(f'a < {index} and a > -{index}') for index in range(50)})
+        assert analysis.never_matches(0) is True
+        assert analysis.implications() == [(stronger, weaker) for weaker in range(50) for stronger in range(1, weaker)]
+
+    def test_comparison_budget(self):
+        queries = {index: parse(f'contains(a, "{index}") and b > {index}') for index in range(30)}
+        queries['weak'] = parse('contains(a, "1")')
+        analysis = FilterAnalysis(queries)
+        expected = analysis.implications()
+        assert (1, 'weak') in expected and analysis.unchecked == 0
+
+        analysis.MAXIMUM_COMPARISONS = 1
+        assert set(analysis.implications()) <= set(expected)
+        assert analysis.unchecked > 0
@@ -0,0 +1,76 @@
+import struct
+
+import pytest
+
+from segment_fql import Filter, FilterArtifact
+from segment_fql.parser import FlatAST
+from segment_fql.filter.artifact import HEADER
+
+from tests.test_compiler import EVENTS, QUERIES
+
+FILTERS = {f'filter-{index}': query for index, query in enumerate(QUERIES)}
+
+
+class TestFilterArtifact:
+    def test_artifact_round_trip(self):
+        artifact = FilterArtifact.loads(FilterArtifact.dumps(FILTERS))
+        assert len(artifact) == len(FILTERS)
+        assert artifact.ids() == list(FILTERS)
+        for filter_id, query in FILTERS.items():
+            loaded = artifact[filter_id]
+            assert loaded.query == query
+            assert FlatAST.from_node(loaded.ast) == FlatAST.from_node(Filter(query).ast)
+            assert [loaded(event) for event in EVENTS] == [Filter(query)(event) for event in EVENTS]
+
+    def test_artifact_memory_mapped_file(self, tmp_path):
+        path = tmp_path / 'filters.fqla'
+        FilterArtifact.dump({'orders': 'event = "Order Completed"', 'pages': Filter('type = "page"')}, str(path))
+        with FilterArtifact.load(str(path)) as artifact:
+            assert 'orders' in artifact and 'missing' not in artifact
+            assert artifact['orders']({'event': 'Order Completed'})
+            assert artifact['pages']({'type': 'page'})
+        assert artifact.source is None
+
+    def test_artifact_builds_filters_lazily(self):
+        artifact = FilterArtifact.loads(FilterArtifact.dumps(FILTERS))
+        assert artifact.filters == {}
+        first = artifact['filter-1']
+        assert list(artifact.filters) == ['filter-1']
+        assert artifact['filter-1'] is first
+        assert artifact.query('filter-2') == QUERIES[2]
+
+    def test_artifact_shares_strings_and_tokens(self):
+        data = FilterArtifact.dumps({'a': 'properties.plan = "pro"', 'b': 'properties.plan = "free"'})
+        assert data.count(b'plan') == 3  # Once in the string table, plus the two query texts.
+        artifact = FilterArtifact.loads(data)
+        first = artifact['a'].ast.children[0].children[0].children[0]
+        second = artifact['b'].ast.children[0].children[0].children[0]
+        assert first.children[2] is second.children[2]
+
+    def test_artifact_narrow_sections(self):
+        data = FilterArtifact.dumps({'a': 'event = "a"'})
+        assert HEADER.unpack_from(data, 0)[-1] == b'BBB\0'
+        long_path = '.'.join(['field'] * 300) + ' = "x"'
+        data = FilterArtifact.dumps({'a': long_path})
+        assert HEADER.unpack_from(data, 0)[-1] == b'BHB\0'
+        assert FilterArtifact.loads(data)['a'].query == long_path
+
+    def test_artifact_rejects_invalid_data(self):
+        data = FilterArtifact.dumps(FILTERS)
+        with pytest.raises(Exception):
+            FilterArtifact.loads(b'FQ')
+        with pytest.raises(Exception):
+            FilterArtifact.loads(b'XXXX' + data[4:])
+        with pytest.raises(Exception):
+            FilterArtifact.loads(data[:4] + struct.pack('<H', 99) + data[6:])
+        with pytest.raises(Exception):
+            FilterArtifact.loads(data[:-10])
+        names_start = HEADER.size
+        with pytest.raises(Exception):
+            FilterArtifact.loads(data[:names_start] + b'Other' + data[names_start + 5:])
+
+    def test_artifact_rejects_invalid_filters(self):
+        with pytest.raises(Exception):
+            FilterArtifact.dumps({1: 'event = "a"'})
+        with pytest.raises(Exception):
+            FilterArtifact.dumps({'a': 'event = #'})
@@ -0,0 +1,36 @@
+import pytest
+
+from segment_fql import Filter
+from benchmarks import harness
+from benchmarks.generator import QueryGenerator
+
+
+class TestBenchmarks:
+    def test_generator_is_deterministic(self):
+        assert QueryGenerator(seed=3).queries(5) == QueryGenerator(seed=3).queries(5)
+        assert QueryGenerator(seed=3).events(5) == QueryGenerator(seed=3).events(5)
+
+    @pytest.mark.parametrize('name', list(harness.SCENARIOS))
+    def test_generated_queries_compile(self, name):
+        generator = QueryGenerator(**harness.SCENARIOS[name])
+        events = generator.events(50)
+        for query in generator.queries(5):
+            assert query.count(' and ') + query.count(' or ') == generator.clauses - 1
+            predicate = Filter(query)
+            for event in events:
+                predicate(event)
+
+    def test_compare(self):
+        baseline = {'scenarios': {'small': {'lex': {'ops_per_second': 1000, 'p50_us': 10.0, 'peak_bytes': 100}}}}
+        faster = {'scenarios': {'small': {'lex': {'ops_per_second': 1500, 'p50_us': 8.0, 'peak_bytes': 100}}}}
+        slower = {'scenarios': {'small': {'lex': {'ops_per_second': 700, 'p50_us': 13.0, 'peak_bytes': 100}}}}
+        assert harness.compare(faster, baseline, 0.2) == []
+        assert len(harness.compare(slower, baseline, 0.2)) == 2
+        assert harness.compare(slower, baseline, 0.5) == []
+
+    def test_run_quick(self, tmp_path):
+        results = harness.run(['small'], quick=True)
+        assert set(results['scenarios']['small']) == set(harness.STAGES)
+        path = tmp_path / 'results.json'
+        harness.save(results, path)
+        assert harness.compare(harness.load(path), results) == []
@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+from segment_fql.cli import main
+from segment_fql.cli.filter_command import file_chunks, stream_chunks, run_filter
+
+QUERY = 'event = "a" and properties.n > 2'
+
+
+def ndjson(count):
+    return ''.join(
+        json.dumps({'event': 'a' if index % 2 else 'b', 'properties': {'n': index}}) + '\n'
+        for index in range(count)
+    ).encode()
+
+
+def expected(data):
+    return [line for line in data.splitlines(keepends=True) if json.loads(line)['event'] == 'a' and json.loads(line)['properties']['n'] > 2]
+
+
+class TestCommandLine:
+    def test_file_chunks_are_line_aligned(self, tmp_path):
+        data = ndjson(100)
+        path = tmp_path / 'events.ndjson'
+        path.write_bytes(data)
+
+        chunks = list(file_chunks(str(path), 100))
+        assert len(chunks) > 1
+        assert chunks[0][1] == 0 and chunks[-1][2] == len(data)
+        for (_, _, end), (_, start, _) in zip(chunks, chunks[1:]):
+            assert end == start and data[end - 1:end] == b'\n'
+
+    def test_file_chunks_of_empty_file(self, tmp_path):
+        path = tmp_path / 'empty.ndjson'
+        path.write_bytes(b'')
+        assert list(file_chunks(str(path), 100)) == []
+
+    def test_stream_chunks_are_line_aligned(self):
+        data = ndjson(100)
+        chunks = list(stream_chunks(io.BytesIO(data), 100))
+        assert len(chunks) > 1
+        assert b''.join(chunks) == data
+        assert all(chunk.endswith(b'\n') for chunk in chunks)
+
+    def test_filter_stdin_in_process(self):
+        data = ndjson(50)
+        output = io.BytesIO()
+        events, matches, errors = run_filter(QUERY, [], io.BytesIO(data), output, workers=1, chunk_size=64)
+        assert output.getvalue().splitlines(keepends=True) == expected(data)
+        assert (events, matches, errors) == (50, len(expected(data)), 0)
+
+    @pytest.mark.parametrize('ordered', [True, False])
+    def test_filter_files_with_process_pool(self, tmp_path, ordered):
+        data = ndjson(300)
+        paths = []
+        for index in range(2):
+            path = tmp_path / f'events-{index}.ndjson'
+            path.write_bytes(data)
+            paths.append(str(path))
+
+        output = io.BytesIO()
+        run_filter(QUERY, paths, None, output, workers=2, chunk_size=256, ordered=ordered)
+        lines = output.getvalue().splitlines(keepends=True)
+        if ordered:
+            assert lines == expected(data) * 2
+        else:
+            assert sorted(lines) == sorted(expected(data) * 2)
+
+    def test_invalid_lines_are_counted(self):
+        data = b'{"event": "a", "properties": {"n": 3}}\nnot json\n\n[1, 2]\n{"event": "a", "properties": {"n": 4}}'
+        output = io.BytesIO()
+        events, matches, errors = run_filter(QUERY, [], io.BytesIO(data), output, workers=1)
+        assert (events, matches, errors) == (4, 2, 1)
+        assert output.getvalue().endswith(b'4}}\n')
+
+    def test_main_reports_summary(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        path.write_bytes(ndjson(10))
+        output, report = io.BytesIO(), io.StringIO()
+
+        assert main(['filter', QUERY, str(path), '--workers', '1'], stdout=output, stderr=report) == 0
+        assert len(output.getvalue().splitlines()) == 4
+        assert '10 events, 4 matched (40.00%)' in report.getvalue()
+        assert 'events/s' in report.getvalue()
+
+    def test_main_rejects_invalid_query(self):
+        report = io.StringIO()
+        assert main(['filter', 'event = #', '--workers', '1'], stdin=io.BytesIO(), stdout=io.BytesIO(), stderr=report) == 1
+        assert report.getvalue().startswith('error:')
@@ -0,0 +1,105 @@
+import array
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, ColumnarEvaluator, columns_from_events
+
+from tests.test_compiler import EVENTS, QUERIES
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+class TestColumnarEvaluator:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_columnar_matches_compiler(self, query):
+        ast = parse(query)
+        evaluator = ColumnarEvaluator(ast)
+        predicate = Compiler(ast).compile()
+        columns = columns_from_events(EVENTS, evaluator.paths)
+        assert evaluator.evaluate(columns, length=len(EVENTS)) == [predicate(event) for event in EVENTS]
+
+    def test_columnar_paths(self):
+        evaluator = ColumnarEvaluator(parse('event = "a" and contains(properties.url, "x") or traits.flag = true'))
+        assert evaluator.paths == ['event', 'properties.url', 'traits.flag']
+
+    def test_columnar_missing_columns_are_null(self):
+        evaluator = ColumnarEvaluator(parse('properties.plan = null and event = "a"'))
+        assert evaluator.evaluate({'event': ['a', 'b', 'a']}) == [True, False, True]
+        assert ColumnarEvaluator(parse('properties.plan != null')).evaluate({}, length=2) == [False, False]
+
+    def test_columnar_array_columns(self):
+        evaluator = ColumnarEvaluator(parse('properties.revenue > 10 and properties.revenue != 30'))
+        revenue = array.array('d', [5, 20, 30, 40])
+        assert evaluator.evaluate({'properties.revenue': revenue}) == [False, True, False, True]
+
+    def test_columnar_numbers_are_not_booleans(self):
+        evaluator = ColumnarEvaluator(parse('traits.count = 1'))
+        assert evaluator.evaluate({'traits.count': [1, True, 1.0, None]}) == [True, False, True, False]
+
+    def test_columnar_field_against_field(self):
+        evaluator = ColumnarEvaluator(parse('properties.price < properties.limit'))
+        columns = {'properties.price': [1, 5, None, 'a'], 'properties.limit': [2, 2, 3, 'b']}
+        assert evaluator.evaluate(columns) == [True, False, False, True]
+
+    def test_columnar_length_mismatch(self):
+        evaluator = ColumnarEvaluator(parse('event = "a" and type = "track"'))
+        with pytest.raises(Exception):
+            evaluator.evaluate({'event': ['a'], 'type': ['track', 'page']})
+        with pytest.raises(Exception):
+            evaluator.evaluate({})
+
+    def test_columnar_functions_agree_on_str_subclasses(self):
+        class Text(str):
+            pass
+
+        evaluator = ColumnarEvaluator(parse('contains(context.ip, "10.") or match(event, "Order *")'))
+        events = [
+            {'context': {'ip': Text('10.0.0.1')}, 'event': 'x'},
+            {'context': {'ip': '192.168.0.1'}, 'event': Text('Order Completed')},
+            {'context': {'ip': '10.0.0.1'}, 'event': 1},
+        ]
+        predicate = Compiler(evaluator.ast).compile()
+        columns = columns_from_events(events, ['context.ip', 'event'])
+        assert evaluator.evaluate(columns) == [predicate(event) for event in events] == [False, False, True]
+
+    def test_columnar_numpy_unicode_functions(self):
+        numpy = pytest.importorskip('numpy')
+        evaluator = ColumnarEvaluator(parse('contains(context.ip, "10.") and match(event, "Order *")'))
+        events = [
+            {'event': 'Order Completed', 'context': {'ip': '10.0.0.1'}},
+            {'event': 'Order Started', 'context': {'ip': '192.168.0.1'}},
+            {'event': 'Signed Up', 'context': {'ip': '10.0.0.2'}},
+        ]
+        columns = {
+            'event': numpy.array([event['event'] for event in events]),
+            'context.ip': numpy.array([event['context']['ip'] for event in events]),
+        }
+        assert columns['event'].dtype.kind == 'U'
+        predicate = Compiler(evaluator.ast).compile()
+        assert list(evaluator.evaluate(columns)) == [predicate(event) for event in events] == [True, False, False]
+
+    def test_columnar_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        evaluator = ColumnarEvaluator(parse(
+            'event = "a" and properties.revenue >= 10 or !(traits.flag = true) and contains(context.ip, "10.")'
+        ))
+        events = [
+            {'event': 'a', 'properties': {'revenue': 10}, 'traits': {'flag': True}, 'context': {'ip': '10.0.0.1'}},
+            {'event': 'b', 'properties': {'revenue': 50}, 'traits': {'flag': False}, 'context': {'ip': '10.0.0.2'}},
+            {'event': 'a', 'properties': {'revenue': 5}, 'traits': {'flag': True}, 'context': {'ip': '192.168.0.1'}},
+            {'event': 'b', 'properties': {'revenue': 1}, 'traits': {'flag': False}},
+        ]
+        columns = {
+            'event': numpy.array(['a', 'b', 'a', 'b']),
+            'properties.revenue': numpy.array([10, 50, 5, 1]),
+            'traits.flag': numpy.array([True, False, True, False]),
+            'context.ip': numpy.array(['10.0.0.1', '10.0.0.2', '192.168.0.1', None], dtype=object),
+        }
+        mask = evaluator.evaluate(columns)
+        predicate = Compiler(evaluator.ast).compile()
+        assert isinstance(mask, numpy.ndarray) and mask.dtype == bool
+        assert mask.tolist() == [predicate(event) for event in events]
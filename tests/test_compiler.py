@@ -0,0 +1,126 @@
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Interpreter
+
+EVENTS = [
+    {'event': 'Order Completed', 'type': 'track', 'properties': {'revenue': 25, 'plan': 'pro', 'url': 'https://segment.com/docs'}},
+    {'event': 'Order Completed', 'type': 'track', 'properties': {'revenue': 5.5, 'plan': 'free'}},
+    {'event': 'Page Viewed', 'type': 'page', 'properties': {'url': 'https://example.com'}, 'traits': {'flag': True}},
+    {'event': 'Signed Up', 'type': 'track', 'properties': None, 'context': {'library': {'name': 'analytics.js'}}},
+    {'type': 'identify', 'traits': {'flag': False, 'count': 1}},
+]
+
+QUERIES = [
+    'true',
+    'event = "Order Completed"',
+    'event != "Order Completed"',
+    'properties.plan = "pro"',
+    'properties.revenue > 10',
+    'properties.revenue < 10',
+    'properties.revenue >= 25',
+    'properties.plan != null',
+    'traits.flag = true',
+    'traits.flag = false',
+    'traits.count = 1',
+    'traits.flag',
+    'context.library.name = "analytics.js"',
+    'event = "Order Completed" and properties.plan = "pro"',
+    'event = "Page Viewed" or type = "identify"',
+    'type = "track" and properties.revenue > 10 or type = "page"',
+    'type = "page" or type = "track" and properties.revenue < 10',
+    '!(event = "Order Completed" or event = "Signed Up")',
+    '!(type = "track") and traits.flag != null',
+    'contains(properties.url, "segment")',
+    'match(properties.url, "https://*.com")',
+    'match(properties.url, "https://*.com/*") and type = "track"',
+    'contains(properties.url, "segment") = false',
+    'properties.plan = ["pro", "enterprise"]',
+    'event = ["Signed Up", "Page Viewed"] and type = "page"',
+    'traits.count != [1, 2.5, true]',
+    'traits.flag = [false, null]',
+]
+
+
+def compile_query(query):
+    return Compiler(Parser(Lexer(query).lex()).parse()).compile()
+
+
+class TestCompiler:
+    def test_compiler_event(self):
+        predicate = compile_query('event = "Order Completed"')
+        assert predicate({'event': 'Order Completed'})
+        assert not predicate({'event': 'Page Viewed'})
+        assert not predicate({})
+
+    def test_compiler_path(self):
+        predicate = compile_query('properties.plan = "pro"')
+        assert predicate({'properties': {'plan': 'pro'}})
+        assert not predicate({'properties': 'pro'})
+        assert not predicate({'plan': 'pro'})
+
+    def test_compiler_null(self):
+        predicate = compile_query('properties.plan = null')
+        assert predicate({})
+        assert predicate({'properties': {'plan': None}})
+        assert not predicate({'properties': {'plan': 'pro'}})
+
+    def test_compiler_numbers_are_not_booleans(self):
+        assert not compile_query('traits.count = 1')({'traits': {'count': True}})
+        assert not compile_query('traits.count > 0')({'traits': {'count': True}})
+        assert compile_query('traits.count = 1')({'traits': {'count': 1.0}})
+
+    def test_compiler_mismatched_types_do_not_order(self):
+        predicate = compile_query('properties.revenue > 10')
+        assert not predicate({'properties': {'revenue': '20'}})
+        assert predicate({'properties': {'revenue': 20}})
+
+    def test_compiler_and_binds_tighter_than_or(self):
+        predicate = compile_query('event = "a" and type = "b" or type = "c"')
+        assert predicate({'type': 'c'})
+        assert predicate({'event': 'a', 'type': 'b'})
+        assert not predicate({'event': 'a'})
+
+    def test_compiler_not(self):
+        predicate = compile_query('!(event = "a" or event = "b")')
+        assert not predicate({'event': 'a'})
+        assert predicate({'event': 'c'})
+
+    def test_compiler_functions(self):
+        assert compile_query('contains(properties.url, "segment")')({'properties': {'url': 'https://segment.com'}})
+        assert not compile_query('contains(properties.url, "segment")')({'properties': {'url': 1}})
+        assert compile_query('match(properties.url, "https://*.com")')({'properties': {'url': 'https://segment.com'}})
+        assert not compile_query('match(properties.url, "https://*.io")')({'properties': {'url': 'https://segment.com'}})
+
+    def test_compiler_lists(self):
+        predicate = compile_query('userId = ["a", "b", 3]')
+        assert predicate({'userId': 'b'})
+        assert predicate({'userId': 3.0})
+        assert not predicate({'userId': 'c'})
+        assert not predicate({'userId': {'a': 1}})
+        assert not predicate({})
+
+        predicate = compile_query('userId != [1, null]')
+        assert predicate({'userId': True})
+        assert predicate({'userId': '1'})
+        assert not predicate({'userId': 1})
+        assert not predicate({})
+
+    def test_compiler_large_list(self):
+        values = ', '.join(f'"user-{index}"' for index in range(100_000))
+        predicate = compile_query(f'userId = [{values}]')
+        assert predicate({'userId': 'user-99999'})
+        assert not predicate({'userId': 'user-100000'})
+
+    def test_compiler_unsupported_operator(self):
+        with pytest.raises(Exception):
+            compile_query('properties.x * 2')
+
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_compiler_matches_interpreter(self, query):
+        ast = Parser(Lexer(query).lex()).parse()
+        predicate = Compiler(ast).compile()
+        interpreter = Interpreter(ast)
+        for event in EVENTS:
+            assert predicate(event) == interpreter.evaluate(event), event
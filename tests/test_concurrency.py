@@ -0,0 +1,113 @@
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from segment_fql import Filter, FilterSet, match_many
+from segment_fql.lexer import Lexer, Scanner, lex
+from segment_fql.parser import Parser, FlatAST, parse
+from benchmarks.bench_filter_set import make_queries, make_events
+from benchmarks.generator import QueryGenerator
+
+THREADS = 8
+
+
+@pytest.fixture(autouse=True)
+def switch_often():
+    # Switch threads every few bytecodes so unsafe interleavings would show up.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_together(work, rounds=20):
+    '''Results of `work(thread index)` for every round of every thread, all threads started at once.'''
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+    errors = []
+
+    def target(index):
+        try:
+            barrier.wait()
+            results[index] = [work(index) for _ in range(rounds)]
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=target, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    return results
+
+
+class TestConcurrency:
+    queries = QueryGenerator(clauses=8, depth=2, function_ratio=0.2, list_size=3, seed=23).queries(20)
+
+    def test_shared_lexer_and_parser(self):
+        lexer, tokens = Lexer(self.queries[0]), Scanner(self.queries[0]).lex()
+        parser, before = Parser(tokens), list(tokens)
+        expected = FlatAST.from_node(parse(tokens))
+
+        results = run_together(lambda index: (lexer.lex(), FlatAST.from_node(parser.parse())))
+        for rounds in results:
+            for lexed, flat in rounds:
+                assert lexed == tokens and flat == expected
+        assert tokens == before
+
+    def test_entry_points_are_deterministic(self):
+        expected = [(lex(query), FlatAST.from_node(parse(query))) for query in self.queries]
+        results = run_together(lambda index: [(lex(query), FlatAST.from_node(parse(query))) for query in self.queries], rounds=3)
+        assert all(found == expected for rounds in results for found in rounds)
+
+    def test_shared_filters(self):
+        generator = QueryGenerator(clauses=8, depth=2, function_ratio=0.2, list_size=3, seed=23)
+        events = generator.events(50)
+        filters = [Filter(query) for query in self.queries]
+        expected = [[compiled(event) for event in events] for compiled in filters]
+        results = run_together(lambda index: [[compiled(event) for event in events] for compiled in filters], rounds=3)
+        assert all(found == expected for rounds in results for found in rounds)
+
+    def test_parse_does_not_modify_tokens(self):
+        tokens = lex('a = 1 and !(b = "x" or c = [1, 2])')
+        ast = parse(tokens)
+        assert isinstance(tokens, tuple) and parse(tokens) is not ast
+        with pytest.raises(AttributeError):
+            ast.children.append(None)
+
+    def test_filter_is_immutable(self):
+        compiled = Filter('a = 1')
+        with pytest.raises(AttributeError, match='immutable'):
+            compiled.predicate = lambda event: True
+        with pytest.raises(AttributeError, match='immutable'):
+            del compiled.query
+        assert compiled({'a': 1}) and not compiled({'a': 2})
+
+
+class TestMatchMany:
+    rng = random.Random(23)
+    queries = make_queries(200, rng)
+    events = make_events(3_000, rng)
+
+    def test_matches_sequential(self):
+        compiled = {filter_id: Filter(query) for filter_id, query in self.queries.items()}
+        expected = [[filter_id for filter_id, predicate in compiled.items() if predicate(event)] for event in self.events]
+        assert match_many(self.queries, self.events, workers=1) == expected
+        for workers in [2, THREADS]:
+            assert match_many(compiled, self.events, workers=workers, chunk_size=97) == expected
+
+    def test_concurrent_calls_are_deterministic(self):
+        filters = FilterSet({filter_id: Filter(query).ast for filter_id, query in self.queries.items()})
+        expected = match_many(filters, self.events, workers=1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = run_together(lambda index: match_many(filters, self.events, chunk_size=64, executor=executor), rounds=2)
+        assert all(found == expected for rounds in results for found in rounds)
+
+    def test_inputs(self):
+        events = iter([{'event': 'a'}, {'event': 'b'}, {'type': 'page'}])
+        assert match_many({'a': 'event = "a"', 'page': Filter('type = "page"').ast}, events, workers=2, chunk_size=1) == [['a'], [], ['page']]
+        assert match_many({'a': 'event = "a"'}, []) == []
@@ -0,0 +1,68 @@
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, PredicateDAG
+
+from tests.test_compiler import EVENTS, QUERIES
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+class TestPredicateDAG:
+    def test_dag_shares_nodes(self):
+        dag = PredicateDAG({
+            'a': parse('event = "Order Completed" and properties.plan = "pro"'),
+            'b': parse('properties.plan = "pro" and event = "Order Completed"'),
+            'c': parse('properties.plan = "pro" or contains(properties.url, "x")'),
+        })
+        assert dag.roots['a'] == dag.roots['b']
+        assert dag.kinds.count('path') == 3
+        assert dag.kinds.count('conditional') == 2
+        stats = dag.stats()
+        assert stats['nodes'] == len(dag.nodes)
+        assert stats['deduplication_ratio'] > 1
+
+    def test_dag_keeps_literal_types_apart(self):
+        dag = PredicateDAG({
+            'number': parse('traits.count = 1'),
+            'boolean': parse('traits.count = true'),
+            'float': parse('traits.count = 1.0'),
+        })
+        assert len(set(dag.roots.values())) == 3
+        assert dag.match({'traits': {'count': True}}) == ['boolean']
+        assert dag.match({'traits': {'count': 1}}) == ['number', 'float']
+
+    def test_dag_evaluates_shared_nodes_once(self):
+        calls = []
+        dag = PredicateDAG({'a': parse('properties.plan = "pro"'), 'b': parse('properties.plan = "pro" and type = "track"')})
+        index = dag.keys[('path', ('properties', 'plan'))]
+        compute = dag.nodes[index]
+        dag.nodes[index] = lambda evaluation: calls.append(1) or compute(evaluation)
+        assert dag.evaluate({'type': 'track', 'properties': {'plan': 'pro'}}) == {'a': True, 'b': True}
+        assert len(calls) == 1
+
+    def test_dag_profile(self):
+        dag = PredicateDAG({
+            'a': parse('properties.plan = "pro" and type = "track"'),
+            'b': parse('properties.plan = "pro" and type = "page"'),
+        })
+        profile = dag.profile([{'type': 'track', 'properties': {'plan': 'pro'}}])
+        assert profile['events'] == 1
+        # `b` reuses `properties.plan = "pro"` (condition and path) and the `type` path from `a`.
+        assert profile['saved_per_event'] == 3
+        assert profile['unshared_per_event'] == profile['evaluations_per_event'] + 3
+
+    def test_dag_duplicate_id(self):
+        dag = PredicateDAG({'a': parse('true')})
+        with pytest.raises(Exception):
+            dag.add('a', parse('true'))
+
+    def test_dag_matches_compiler(self):
+        asts = {query: parse(query) for query in QUERIES}
+        dag = PredicateDAG(asts)
+        for event in EVENTS:
+            expected = {query: Compiler(ast).compile()(event) for query, ast in asts.items()}
+            assert dag.evaluate(event) == expected
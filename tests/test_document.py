@@ -0,0 +1,127 @@
+import random
+import re
+
+import pytest
+
+from segment_fql import Filter
+from segment_fql.lexer import Scanner
+from segment_fql.parser import Parser, Document, FlatAST
+from segment_fql.parser.document import Offsets
+from benchmarks.generator import QueryGenerator
+from benchmarks.bench_document import query
+
+PIECES = ['a', ' ', 'and ', ' or ', '!(', ')', '(', '"', '=', '!=', '1', '.', 'x.y', ' = 1', 'contains(a, "b")', '[1, 2]', '#', '1.', ']', ',']
+
+
+def assert_matches_full_parse(document):
+    tokens, spans, error = Scanner(document.text).scan()
+    if error is not None:
+        assert document.error == error[1]
+        return
+    assert document.tokens == tokens
+    assert document.spans() == spans
+    try:
+        ast = Parser(tokens).parse()
+    except Exception as exception:
+        assert document.error == str(exception) and document.ast is None
+    else:
+        assert document.error is None
+        assert FlatAST.from_node(document.ast) == FlatAST.from_node(ast)
+
+
+def random_edit(rng, text):
+    kind = rng.random()
+    if kind < 0.3:
+        values = list(re.finditer(r'"[^"]*"|\b\d+\b', text))
+        if values:
+            value = rng.choice(values)
+            replacement = '"' + 'q' * rng.randint(0, 3) + '"' if value.group().startswith('"') else str(rng.randint(0, 99))
+            return value.start(), value.end(), replacement
+    if kind < 0.5:
+        connectors = [found.end() for found in re.finditer(r' (and|or) ', text)]
+        if connectors:
+            start, end = sorted([rng.choice(connectors), rng.choice(connectors)])
+            return start, end, rng.choice(['x = 1 and ', '!(y != "z") or ', ''])
+    start = rng.randint(0, len(text))
+    return start, min(len(text), start + rng.choice([0, 1, 2, 5])), rng.choice(PIECES + [''])
+
+
+class TestDocument:
+    def test_random_edits_match_full_parse(self):
+        rng = random.Random(22)
+        for _ in range(40):
+            generator = QueryGenerator(clauses=rng.randint(5, 20), depth=rng.randint(0, 4), function_ratio=0.2, list_size=2, seed=rng.randrange(100))
+            document = Document(generator.query())
+            for _ in range(30):
+                start, end, text = random_edit(rng, document.text)
+                removed = document.text[start:end]
+                document.edit(start, end, text)
+                assert_matches_full_parse(document)
+                if rng.random() < 0.5:
+                    document.edit(start, start + len(text), removed)
+                    assert_matches_full_parse(document)
+
+    def test_untouched_nodes_are_reused(self):
+        document = Document('a = 1 and !(b = 2 or c = 3) and d = 4')
+        root = document.ast
+        first, grouping, last = [document.chain.statements[index].children[0] for index in range(3)]
+        inner = document.chain.chains[1].statements[0].children[0]
+
+        document.edit(document.text.index('3'), document.text.index('3') + 1, '30')
+        assert document.ast is root
+        assert [document.chain.statements[index].children[0] for index in range(3)] == [first, grouping, last]
+        assert document.chain.chains[1].statements[0].children[0] is inner
+        assert document.stats()['reparsed_tokens'] == 3
+        assert document.full_parses == 1
+        assert_matches_full_parse(document)
+
+    def test_structural_edits(self):
+        document = Document('a = 1 and !(b = 2 or c = 3) and d = 4')
+        for start, end, text in [(26, 27, ''), (26, 26, ')'), (10, 12, ''), (10, 10, '!('), (0, 0, '!('), (7, 7, ')')]:
+            document.edit(start, end, text)
+            assert_matches_full_parse(document)
+        assert document.text == '!(a = 1) and !(b = 2 or c = 3) and d = 4'
+
+    def test_errors_keep_the_last_tree(self):
+        document = Document('a = 1 and b = 2')
+        document.edit(10, 10, 'x = ')
+        with pytest.raises(Exception) as parse_error:
+            Parser(Scanner(document.text).lex()).parse()
+        assert document.error == str(parse_error.value) and document.ast is None
+        assert document.error.startswith('Unexpected token in statement')
+        document.edit(14, 14, '#')
+        assert document.error == 'Invalid character'
+        document.edit(14, 15, '3 and ')
+        assert document.text == 'a = 1 and x = 3 and b = 2'
+        assert document.full_parses == 1
+        assert_matches_full_parse(document)
+
+    def test_frozen_tree_is_not_updated(self):
+        document = Document('a = 1 and b = 2')
+        compiled = Filter.from_ast(document.text, document.ast)
+        document.edit(14, 15, '3')
+        assert document.ast is not compiled.ast and document.full_parses == 2
+        assert compiled({'a': 1, 'b': 2}) and Filter.from_ast(document.text, document.ast)({'a': 1, 'b': 3})
+
+    def test_edits_stay_local(self):
+        text = query(20_000)
+        document = Document(text)
+        position = text.index(' and ', len(text) // 2) + len(' and ')
+        for index, char in enumerate('x = 1 and '):
+            document.edit(position + index, position + index, char)
+            assert document.stats()['relexed_tokens'] < 20
+            assert document.stats()['reparsed_tokens'] < 100
+        assert document.full_parses == 1 and document.error is None
+        assert_matches_full_parse(document)
+
+    def test_invalid_range(self):
+        with pytest.raises(Exception, match='Invalid edit range'):
+            Document('a = 1').edit(3, 9, '')
+
+    def test_offsets(self):
+        offsets = Offsets([0, 10, 20, 30])
+        offsets.replace(1, 2, [11, 12], 5)
+        assert list(offsets) == [0, 11, 12, 25, 35]
+        offsets.replace(4, 4, [], -1)
+        assert list(offsets) == [0, 11, 12, 25, 34]
+        assert [offsets.find(value) for value in [-1, 0, 12, 24, 25, 100]] == [-1, 0, 2, 2, 3, 4]
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from segment_fql.filter import Filter, FilterCache, get_filter, configure_filter_cache, filter_cache_info
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFilter:
+    def test_filter_matches(self):
+        query = Filter('event = "Order Completed" and properties.revenue > 10')
+        assert query({'event': 'Order Completed', 'properties': {'revenue': 20}})
+        assert not query.matches({'event': 'Order Completed', 'properties': {'revenue': 5}})
+
+    def test_filter_ast_is_frozen(self):
+        query = Filter('event = "a" or event = "b"')
+        with pytest.raises(AttributeError):
+            query.ast.children.append(None)
+        assert isinstance(query.ast.children[0].children[2].children, tuple)
+
+    def test_filter_invalid_query(self):
+        with pytest.raises(Exception):
+            Filter('event = #')
+
+
+class TestFilterCache:
+    def test_cache_hits_and_misses(self):
+        cache = FilterCache(maxsize=2)
+        first = cache.get('event = "a"')
+        assert cache.get('event = "a"') is first
+        info = cache.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = FilterCache(maxsize=2)
+        first = cache.get('event = "a"')
+        cache.get('event = "b"')
+        cache.get('event = "a"')
+        cache.get('event = "c"')
+        assert cache.cache_info().evictions == 1
+        assert cache.get('event = "a"') is first
+        assert cache.cache_info().misses == 3
+        cache.get('event = "b"')
+        assert cache.cache_info().misses == 4
+
+    def test_cache_ttl(self):
+        clock = FakeClock()
+        cache = FilterCache(maxsize=2, ttl=10, clock=clock)
+        first = cache.get('event = "a"')
+        clock.now = 9
+        assert cache.get('event = "a"') is first
+        clock.now = 10
+        assert cache.get('event = "a"') is not first
+        assert cache.cache_info().expirations == 1
+
+    def test_cache_does_not_store_errors(self):
+        cache = FilterCache()
+        with pytest.raises(Exception):
+            cache.get('event = #')
+        assert cache.cache_info().currsize == 0
+
+    def test_cache_threads(self):
+        cache = FilterCache(maxsize=8)
+        queries = [f'event = "e{index}"' for index in range(16)]
+        errors = []
+
+        def work(offset):
+            try:
+                for step in range(500):
+                    query = queries[(offset + step) % len(queries)]
+                    assert cache.get(query).query == query
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        info = cache.cache_info()
+        assert not errors
+        assert info.hits + info.misses == 8 * 500
+        assert info.currsize <= 8
+
+    def test_process_wide_cache(self):
+        configure_filter_cache(maxsize=4, ttl=None)
+        assert get_filter('type = "track"') is get_filter('type = "track"')
+        assert filter_cache_info().hits == 1
+        configure_filter_cache()
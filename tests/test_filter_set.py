@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from segment_fql.filter import Filter, FilterSet
+
+QUERIES = {
+    'orders': 'event = "Order Completed"',
+    'big-orders': 'event = "Order Completed" and properties.revenue > 100',
+    'pages': 'type = "page"',
+    'signups-or-pages': 'event = "Signed Up" or type = "page" and properties.url != null',
+    'pro': 'properties.plan = "pro" and event != "Order Completed"',
+    'checkout': 'contains(properties.url, "checkout")',
+    'not-orders': '!(event = "Order Completed")',
+    'mixed': 'event = "Signed Up" or contains(properties.url, "docs")',
+}
+
+
+def build(queries):
+    return FilterSet({filter_id: Filter(query).ast for filter_id, query in queries.items()})
+
+
+def linear(queries, event):
+    return [filter_id for filter_id, query in queries.items() if Filter(query)(event)]
+
+
+class TestFilterSet:
+    def test_filter_set_indexes_equalities(self):
+        filters = build(QUERIES)
+        assert set(filters.indexes) == {('event',), ('type',), ('properties', 'plan')}
+        assert set(filters.fallback) == {'checkout', 'not-orders', 'mixed'}
+        assert filters.indexes[('event',)]['Signed Up'] == ['signups-or-pages']
+        assert filters.indexes[('type',)]['page'] == ['pages', 'signups-or-pages']
+
+    def test_filter_set_match(self):
+        filters = build(QUERIES)
+        event = {'type': 'track', 'event': 'Order Completed', 'properties': {'revenue': 150, 'url': '/checkout'}}
+        assert filters.match(event) == ['orders', 'big-orders', 'checkout']
+        assert filters.candidates(event) == {'orders', 'big-orders', 'checkout', 'not-orders', 'mixed'}
+
+    def test_filter_set_ignores_non_string_values(self):
+        filters = build({'one': 'properties.id = "1"'})
+        assert filters.match({'properties': {'id': 1}}) == []
+        assert filters.match({'properties': {'id': ['1']}}) == []
+        assert filters.match({'properties': {'id': '1'}}) == ['one']
+
+    def test_filter_set_add(self):
+        filters = build(QUERIES)
+        filters.add('identify', Filter('type = "identify"').ast)
+        assert filters.match({'type': 'identify'}) == ['not-orders', 'identify']
+        with pytest.raises(Exception):
+            filters.add('identify', Filter('true').ast)
+
+    def test_filter_set_rejected_add_keeps_counts(self):
+        filters = build(QUERIES)
+        counts = dict(filters.path_counts)
+        with pytest.raises(Exception, match='Duplicate filter id: orders'):
+            filters.add('orders', Filter('properties.plan = "pro" and event = "Signed Up"').ast)
+        assert dict(filters.path_counts) == counts
+        assert len(filters) == len(QUERIES)
+
+    def test_filter_set_duplicate_ids(self):
+        with pytest.raises(Exception, match='Duplicate filter id: a'):
+            FilterSet([('a', Filter('type = "page"').ast), ('a', Filter('true').ast)])
+
+    def test_filter_set_matches_linear_scan(self):
+        rng = random.Random(5)
+        names = ['Order Completed', 'Signed Up', 'Page Viewed', 'Product Added']
+        events = [
+            {
+                'type': rng.choice(['track', 'page', 'identify']),
+                'event': rng.choice(names),
+                'properties': {
+                    'revenue': rng.randint(0, 200),
+                    'plan': rng.choice(['pro', 'free', 1]),
+                    'url': rng.choice(['/checkout', '/docs', None]),
+                },
+            }
+            for _ in range(300)
+        ]
+        filters = build(QUERIES)
+        for event in events:
+            assert filters.match(event) == linear(QUERIES, event)
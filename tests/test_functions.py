@@ -0,0 +1,123 @@
+import fnmatch
+import itertools
+import random
+import re
+
+import pytest
+
+from segment_fql import Filter
+from segment_fql.compiler import Interpreter, PredicateDAG, ColumnarEvaluator
+from segment_fql.functions import FunctionRegistry, contains, match, default_registry, register_function
+
+VALUES = ['', 'a', 'b', 'ab', 'ba', 'aab', 'abab', 'bab', 'a*b', 'a?b', 'a\nb', 'abcab']
+
+
+class TestMatchers:
+    @pytest.mark.parametrize('pattern', [
+        '', 'ab', '*', '**', 'a*', '*b', '*ab*', 'a*b', 'ab*ab', '*a*b*', 'a**b', 'a*a*b', '*ba*ab',
+        'a?b', '[ab]b', '[!a]*', 'a[', '*[*]*',
+    ])
+    def test_match_agrees_with_fnmatch(self, pattern):
+        test = match(pattern)
+        for value in VALUES:
+            assert test(value) == fnmatch.fnmatchcase(value, pattern), (pattern, value)
+
+    def test_match_random_globs(self):
+        rng = random.Random(7)
+        values = [''.join(chars) for length in range(6) for chars in itertools.product('ab', repeat=length)]
+        for _ in range(300):
+            pattern = ''.join(rng.choice('ab*') for _ in range(rng.randint(0, 6)))
+            test = match(pattern)
+            for value in values:
+                assert test(value) == fnmatch.fnmatchcase(value, pattern), (pattern, value)
+
+    def test_contains(self):
+        assert contains('seg')('segment')
+        assert contains('')('anything')
+        assert not contains('Seg')('segment')
+
+
+class TestFunctionRegistry:
+    def test_matchers_are_shared(self):
+        registry = FunctionRegistry({'match': match})
+        assert registry.matcher('match', 'a*') is registry.matcher('match', 'a*')
+        assert registry.matcher('match', 'a*') is not registry.matcher('match', 'b*')
+        info = registry.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+
+    def test_filters_share_matchers(self):
+        default_registry.clear()
+        Filter('match(properties.url, "https://*")')
+        Filter('event = "a" or match(context.page, "https://*")')
+        info = default_registry.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_cache_is_bounded(self):
+        registry = FunctionRegistry({'contains': contains}, maxsize=2)
+        first = registry.matcher('contains', 'a')
+        registry.matcher('contains', 'b')
+        registry.matcher('contains', 'a')
+        registry.matcher('contains', 'c')
+        assert registry.cache_info().evictions == 1
+        assert registry.matcher('contains', 'a') is first
+        assert registry.cache_info().currsize == 2
+
+    def test_unknown_function(self):
+        with pytest.raises(Exception):
+            FunctionRegistry().matcher('missing', 'x')
+
+    @pytest.mark.parametrize('name', ['and', 'null', 'two words', '1st'])
+    def test_invalid_names(self, name):
+        with pytest.raises(Exception):
+            FunctionRegistry().register(name, contains)
+
+    def test_reregistering_drops_cached_matchers(self):
+        registry = FunctionRegistry({'check': contains})
+        assert registry.matcher('check', 'a')('cat')
+        registry.register('check', lambda pattern: lambda value: value == pattern)
+        assert not registry.matcher('check', 'a')('cat')
+
+    def test_custom_function(self):
+        calls = []
+
+        def starts_with(prefix):
+            calls.append(prefix)
+            return lambda value: value.startswith(prefix)
+
+        register_function('startsWith', starts_with)
+        try:
+            query = Filter('startsWith(properties.url, "https://") and type = "page"')
+            events = [
+                {'type': 'page', 'properties': {'url': 'https://segment.com'}},
+                {'type': 'page', 'properties': {'url': 'http://segment.com'}},
+                {'type': 'page', 'properties': {'url': 7}},
+                {'type': 'track', 'properties': {'url': 'https://segment.com'}},
+            ]
+            expected = [True, False, False, False]
+            assert [query(event) for event in events] == expected
+            assert [Interpreter(query.ast).evaluate(event) for event in events] == expected
+            assert [PredicateDAG({'q': query.ast}).evaluate(event)['q'] for event in events] == expected
+            columns = {'type': [event['type'] for event in events], 'properties.url': [event['properties']['url'] for event in events]}
+            assert ColumnarEvaluator(query.ast).evaluate(columns) == expected
+            assert calls == ['https://']
+        finally:
+            default_registry.unregister('startsWith')
+
+        with pytest.raises(Exception):
+            Filter('startsWith(properties.url, "https://")')
+
+    def test_custom_function_results_are_booleans(self):
+        register_function('search', lambda pattern: re.compile(pattern).search)
+        try:
+            query = Filter('search(properties.url, "^https") or search("literal", "lit")')
+            literal = Filter('search("literal", "lit")')
+            events = [{'properties': {'url': 'https://segment.com'}}, {'properties': {'url': 7}}]
+            assert query(events[0]) is True and literal(events[1]) is True
+            assert Filter('search(properties.url, "^https")')(events[1]) is False
+            assert [Interpreter(query.ast).evaluate(event) for event in events] == [True, True]
+            assert [PredicateDAG({'q': literal.ast}).evaluate(event)['q'] for event in events] == [True, True]
+            columns = {'properties.url': [event['properties']['url'] for event in events]}
+            assert ColumnarEvaluator(Filter('search(properties.url, "^https")').ast).evaluate(columns) == [True, False]
+            assert all(type(result) is bool for result in ColumnarEvaluator(query.ast).evaluate(columns))
+        finally:
+            default_registry.unregister('search')
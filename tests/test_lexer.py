@@ -93,3 +93,17 @@ class TestLexer:
         assert tokens[19] == Token(TokenType.ParenRight, ')')
         
 
+
+    def test_lexer_shares_symbol_tokens(self):
+        first = Lexer('a.b = "x" and !(c = 1)').lex()
+        second = Lexer('d.e = "y" and !(f = 2)').lex()
+        for index in [1, 3, 6, 7, 9, 11]:
+            assert first[index] is second[index]
+        assert not hasattr(first[0], '__dict__')
+
+    def test_lexer_interns_identifiers(self):
+        first = Lexer('properties.' + 'plan' + '_name = "x"').lex()
+        second = Lexer('properties.plan_' + 'name = "y"').lex()
+        assert first[2].value is second[2].value
+        assert first[2] == second[2]
+        assert hash(first[2]) == hash(Token(TokenType.Ident, 'plan_name'))
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from segment_fql import Filter
+from segment_fql.compiler import Compiler, MemoizedFilter
+
+from tests.test_optimizer import DOMAIN_EVENTS, parse, random_query
+
+
+class TestMemoizedFilter:
+    def test_agrees_with_compiled(self):
+        rng = random.Random(25)
+        for _ in range(100):
+            ast = parse(random_query(rng))
+            predicate = Compiler(ast).compile()
+            memoized = MemoizedFilter(ast, maxsize=8, min_hit_rate=0)
+            for event in rng.choices(DOMAIN_EVENTS, k=300):
+                assert memoized(event) == predicate(event)
+
+    def test_values_are_keyed_with_their_type(self):
+        memoized = MemoizedFilter(parse('a = true or contains(a, "1")'))
+        values = [1, True, 1.0, '1', None, 0, False]
+        assert [memoized({'a': value}) for value in values] == [False, True, False, True, False, False, False]
+        assert [memoized({'a': value}) for value in values] == [False, True, False, True, False, False, False]
+        assert memoized.stats()['hits'] == 7 and memoized.stats()['entries'] == 7
+
+    def test_nested_paths(self):
+        memoized = MemoizedFilter(parse('context.library.name = "x" and properties'))
+        events = [{'context': {'library': {'name': 'x'}}, 'properties': 'p'}, {'context': {'library': 'x'}, 'properties': 'p'}, {'context': None}]
+        assert [memoized(event) for event in events * 2] == [True, False, False] * 2
+        assert memoized.stats()['hits'] == 3
+
+    def test_lru_eviction(self):
+        memoized = MemoizedFilter(parse('a = 1'), maxsize=2, min_hit_rate=0)
+        for value in [1, 2, 1, 3, 2]:
+            memoized({'a': value})
+        stats = memoized.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (1, 4, 2, 2)
+        assert stats['memory_bytes'] > 0
+
+    def test_bypasses_large_and_unhashable_keys(self):
+        memoized = MemoizedFilter(parse('contains(a, "x") or b'), max_key_length=10, min_hit_rate=0)
+        assert memoized({'a': 'x' * 11}) and memoized({'a': 'x' * 11})
+        assert memoized({'a': 'y', 'b': {'c': 1}}) and not memoized({'a': 'y', 'b': []})
+        stats = memoized.stats()
+        assert (stats['oversized'], stats['unhashable'], stats['entries']) == (2, 2, 0)
+
+    def test_disables_on_low_hit_rate(self):
+        memoized = MemoizedFilter(parse('a > 10'), window=100, min_hit_rate=0.5, retry_after=50)
+        for value in range(100):
+            assert memoized({'a': value}) == (value > 10)
+        stats = memoized.stats()
+        assert not stats['enabled'] and stats['disabled'] == 1 and stats['entries'] == 0
+
+        assert [memoized({'a': 20}) for _ in range(50)] == [True] * 50
+        assert memoized.stats()['bypassed'] == 50 and memoized.stats()['enabled']
+        for _ in range(100):
+            memoized({'a': 20})
+        assert memoized.stats()['enabled'] and memoized.stats()['hits'] == 99
+
+    def test_stays_enabled_on_repeated_values(self):
+        memoized = MemoizedFilter(Filter('event = "A" and properties.plan = "pro"').ast, window=100)
+        events = [{'event': 'A', 'properties': {'plan': plan}} for plan in ['pro', 'free']]
+        for index in range(1000):
+            memoized(events[index % 2])
+        stats = memoized.stats()
+        assert stats['enabled'] and stats['hit_rate'] == pytest.approx(0.998)
+
+    def test_invalid_size(self):
+        with pytest.raises(Exception, match='Cache size must be positive'):
+            MemoizedFilter(parse('a'), maxsize=0)
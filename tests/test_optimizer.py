@@ -0,0 +1,110 @@
+import itertools
+import random
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser, ASTType, FlatAST
+from segment_fql.compiler import Compiler, Optimizer
+from segment_fql.compiler.optimizer import count_nodes
+from segment_fql import Filter
+from benchmarks.generator import QueryGenerator
+
+from tests.test_compiler import EVENTS, QUERIES
+
+ATOMS = [
+    'a = 1', 'a = 1.0', 'a = true', 'a = null', 'a = "x"', 'a != 1', 'a != "x"', 'a = ["x", 1]', 'a != ["y", null]',
+    'b > 1', 'b <= 0', 'b = "z"', 'contains(c, "x")', 'match(c, "y*")', '1 = 1', '1 = 2', 'null = null',
+]
+DOMAIN = {
+    'a': [1, 1.0, True, None, 'x', 'y'],
+    'b': [0, 2, 'z'],
+    'c': ['xx', 'y'],
+}
+MISSING = object()
+DOMAIN_EVENTS = [
+    {key: value for key, value in zip(DOMAIN, values) if value is not MISSING}
+    for values in itertools.product(*[[MISSING] + values for values in DOMAIN.values()])
+]
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+def random_query(rng, depth=0):
+    parts = []
+    for index in range(rng.randint(1, 4)):
+        if index:
+            parts.append(rng.choice(['and', 'or']))
+        if depth < 3 and rng.random() < 0.3:
+            parts.append(f'!({random_query(rng, depth + 1)})')
+        else:
+            parts.append(rng.choice(ATOMS))
+    return ' '.join(parts)
+
+
+def assert_equivalent(query, events):
+    ast = parse(query)
+    optimized = Optimizer(ast).optimize()
+    expected = Compiler(ast).compile()
+    actual = Compiler(optimized).compile()
+    for event in events:
+        assert actual(event) == expected(event), (query, event)
+
+
+class TestOptimizer:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_optimizer_preserves_queries(self, query):
+        assert_equivalent(query, EVENTS)
+
+    def test_optimizer_random_queries(self):
+        rng = random.Random(17)
+        for _ in range(400):
+            assert_equivalent(random_query(rng), DOMAIN_EVENTS)
+
+    def test_optimizer_generated_queries(self):
+        generator = QueryGenerator(clauses=30, depth=4, function_ratio=0.2, list_size=3, seed=4)
+        events = generator.events(50)
+        for query in generator.queries(30):
+            assert_equivalent(query, events)
+
+    @pytest.mark.parametrize('query, expected', [
+        ('a = "x" or a = "y" or a = "z"', 'a = ["x", "y", "z"]'),
+        ('a != "x" and a != "y"', 'a != ["x", "y"]'),
+        ('!(!(a = 1 and b = 2)) and c = 3', 'a = 1 and b = 2 and c = 3'),
+        ('!(a = 1 or b = 2) and c = 3', 'a != 1 and b != 2 and c = 3'),
+        ('a = 1 and a = 1 or b > 2 or a = 1', 'a = 1 or b > 2'),
+        ('a = 1 and true', 'a = 1'),
+        ('a = 1 or 1 = 2 or null', 'a = 1'),
+        ('a = 1 and 1 = 2 or b > 2', 'b > 2'),
+        ('a = "x" and a = "y"', 'false'),
+        ('a = ["x", "y"] and a != "x" and b > 1', 'a = ["x", "y"] and a != "x" and b > 1'),
+        ('a = ["x", "y"] and a != "x" and a != "y"', 'false'),
+        ('a = 1 or !(a = 1)', 'true'),
+        ('b > 1 or c = 2 or !(b > 1)', 'true'),
+        ('b > 1 and !(b > 1)', 'false'),
+    ])
+    def test_optimizer_rewrites(self, query, expected):
+        optimized = Optimizer(parse(query)).optimize()
+        assert FlatAST.from_node(optimized) == FlatAST.from_node(parse(expected))
+
+    def test_optimizer_node_counts(self):
+        ast = parse('a = "x" or a = "y" or a = "z"')
+        optimizer = Optimizer(ast)
+        optimized = optimizer.optimize()
+        assert optimizer.stats() == {'nodes_before': 18, 'nodes_after': 9}
+        assert count_nodes(ast) == 18
+        assert count_nodes(optimized) == 9
+
+    def test_optimizer_does_not_modify_the_ast(self):
+        query = Filter('!(!(a = 1 and b = 2)) and a = 1')
+        before = FlatAST.from_node(query.ast)
+        Optimizer(query.ast).optimize()
+        assert FlatAST.from_node(query.ast) == before
+
+    def test_filter_optimize(self):
+        query = Filter('type = "track" or type = "page" or type = "track"', optimize=True)
+        assert query.ast.children[0].children[0].children[2].type == ASTType.LIST
+        assert query({'type': 'page'})
+        assert not query({'type': 'identify'})
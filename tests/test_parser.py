@@ -1,7 +1,7 @@
 import pytest
 
-from segment_fql.lexer import Lexer
-from segment_fql.parser import Parser, ASTNode, ASTType
+from segment_fql.lexer import Lexer, Scanner
+from segment_fql.parser import Parser, ASTNode, ASTType, FlatAST
 
 class TestParser:
     def test_parser(self):
@@ -104,4 +104,95 @@ class TestParser:
         assert third_conditional_event.children[0].value == 'event'
         assert third_conditional_event.children[1].value == '='
         assert third_conditional_event.children[2].value == 'User Status Changed'
-        
\ No newline at end of file
+        
+    def test_parser_list(self):
+        ast = Parser(Lexer('userId = ["a", 2, true, null]').lex()).parse()
+        values = ast.children[0].children[0].children[2]
+        assert values.type == ASTType.LIST
+        assert [token.value for token in values.children] == ['a', '2', 'true', 'null']
+
+        empty = Parser(Lexer('userId != []').lex()).parse()
+        assert empty.children[0].children[0].children[2].children == []
+
+    @pytest.mark.parametrize('query', ['x > [1]', 'x = [a]', 'x = [1,]', 'x = [1 2]', 'x = [[1]]', 'x = [1'])
+    def test_parser_invalid_list(self, query):
+        with pytest.raises(Exception):
+            Parser(Lexer(query).lex()).parse()
+
+    def test_parser_does_not_consume_tokens(self):
+        tokens = Lexer('event = "Order Completed"').lex()
+        copy = list(tokens)
+        Parser(tokens).parse()
+        assert tokens == copy
+
+    def test_parser_long_chain(self):
+        clauses = 5000
+        lexer = Scanner(' or '.join(f'event = "e{index}"' for index in range(clauses)))
+        node = Parser(lexer.lex()).parse()
+        statement = node.children[0]
+        for index in range(clauses):
+            assert statement.children[0].children[2].value == f'e{index}'
+            if index < clauses - 1:
+                assert statement.children[1].value == 'or'
+                statement = statement.children[2]
+        assert len(statement.children) == 1
+
+    def test_parser_grouping_depth(self):
+        depth = 2000
+        tokens = Scanner('!(' * depth + 'a = 1' + ')' * depth).lex()
+        parser = Parser(tokens)
+        parser.MAXIMUM_GROUPING_DEPTH = depth
+        node = parser.parse().children[0]
+        for _ in range(depth):
+            assert node.children[0].type == ASTType.NOT
+            node = node.children[0].children[0].children[0]
+        assert node.children[0].type == ASTType.CONDITIONAL
+
+        parser = Parser(tokens)
+        parser.MAXIMUM_GROUPING_DEPTH = depth - 1
+        with pytest.raises(Exception, match='Maximum grouping depth'):
+            parser.parse()
+
+    def test_parser_scales_linearly(self):
+        class CountingParser(Parser):
+            # A list, so the copy `parse()` works on shares it.
+            reads = None
+
+            def _peek(self):
+                self.reads[0] += 1
+                return super()._peek()
+
+        def reads_per_clause(clauses):
+            tokens = Scanner(' and '.join(f'properties.id{index} = "{index}"' for index in range(clauses))).lex()
+            parser = CountingParser(tokens)
+            parser.reads = [0]
+            parser.parse()
+            return parser.reads[0] / clauses
+
+        # Each clause is read a fixed number of times, however long the query.
+        assert reads_per_clause(10000) == pytest.approx(reads_per_clause(500), rel=0.01)
+
+    def test_parser_long_chains_do_not_recurse(self):
+        clauses = 100_000
+        node = Parser(Scanner(' or '.join(f'event = "{index}"' for index in range(clauses))).lex()).parse()
+        statement = node.children[0]
+        for _ in range(clauses - 1):
+            assert statement.children[0].type == ASTType.CONDITIONAL
+            statement = statement.children[2]
+        assert len(statement.children) == 1
+
+    def test_parser_flat_ast(self):
+        query = '!(event = "a" or contains(properties.url, "x")) and properties.revenue > 10'
+        node = Parser(Lexer(query).lex()).parse()
+        flat = FlatAST.from_node(node)
+        assert flat.type_of(0) == ASTType.ROOT
+        assert len(flat) == 30
+        assert flat.strings.count('properties') == 1
+
+        statement = flat.children_of(0)[0]
+        assert flat.type_of(statement) == ASTType.STATEMENT
+        assert [flat.type_of(index) for index in flat.children_of(statement)] == [ASTType.NOT, 'logical', ASTType.STATEMENT]
+
+        rebuilt = flat.to_node()
+        assert repr(rebuilt) == repr(node)
+        assert FlatAST.from_node(rebuilt) == flat
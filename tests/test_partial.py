@@ -0,0 +1,122 @@
+import random
+import threading
+
+import pytest
+
+from segment_fql import Filter, ResidualCache
+from segment_fql.compiler import Compiler, PartialEvaluator
+from segment_fql.compiler.optimizer import count_nodes
+from segment_fql.parser import FlatAST
+
+from tests.test_optimizer import DOMAIN, DOMAIN_EVENTS, parse, random_query
+
+QUERY = 'type = "track" and event = "Order Completed" and properties.revenue > 10 or type = "track" and event = "Signed Up"'
+
+
+def agrees(event, known):
+    return all(event.get(field) is value or (type(event.get(field)) is type(value) and event.get(field) == value) for field, value in known.items())
+
+
+class TestPartialEvaluation:
+    def test_residual_agrees_with_original(self):
+        rng = random.Random(24)
+        decided = 0
+        for _ in range(300):
+            ast = parse(random_query(rng))
+            predicate = Compiler(ast).compile()
+            fields = rng.sample(sorted(DOMAIN), rng.randint(1, 2))
+            known = {field: rng.choice(DOMAIN[field] + [None]) for field in fields}
+            residual = PartialEvaluator(ast, known).specialize()
+            for event in DOMAIN_EVENTS:
+                if agrees(event, known):
+                    assert residual(event) == predicate(event)
+                    if residual.always is not None:
+                        assert residual.always == predicate(event)
+            decided += residual.always is not None
+        assert decided > 100
+
+    @pytest.mark.parametrize('known, always, residual', [
+        ({'type': 'track', 'event': 'Order Completed'}, None, 'properties.revenue > 10'),
+        ({'type': 'track', 'event': 'Signed Up'}, True, 'true'),
+        ({'type': 'track', 'event': 'Page Viewed'}, False, 'false'),
+        ({'type': 'page'}, False, 'false'),
+        ({'event': 'Signed Up'}, None, 'type = "track"'),
+        ({'properties': {'revenue': 5}}, None, 'type = "track" and event = "Signed Up"'),
+    ])
+    def test_specialize(self, known, always, residual):
+        evaluator = PartialEvaluator(parse(QUERY), known)
+        result = evaluator.specialize()
+        assert result.always is always
+        assert FlatAST.from_node(result.ast) == FlatAST.from_node(parse(residual))
+        assert evaluator.stats()['nodes_after'] == count_nodes(result.ast) < evaluator.stats()['nodes_before']
+
+    def test_functions_and_nested_fields(self):
+        known = {'context': {'library': {'name': 'analytics.js'}}, 'event': 'Order Completed'}
+        residual = Filter('contains(event, "Order") and context.library.name = "analytics.js" and properties.x').specialize(known)
+        assert residual.always is None and not residual({}) and residual({'properties': {'x': 1}})
+        assert Filter('context.library.version = "1"').specialize(known).always is False
+        assert Filter('a = null').specialize({'a': None}).always is True
+
+    def test_residual_is_frozen(self):
+        residual = Filter('a = 1 and b = 2').specialize({'a': 1})
+        with pytest.raises(AttributeError):
+            residual.ast.children.append(None)
+
+
+    def test_input_ast_is_unchanged(self):
+        ast = parse('event = "a" and properties.x = 1 or properties.y = 2')
+        before = FlatAST.from_node(ast)
+        residual = PartialEvaluator(ast, {'event': 'a'}).specialize()
+        pending = [ast]
+        while pending:
+            node = pending.pop()
+            assert type(node.children) is list
+            pending.extend(child for child in node.children if hasattr(child, 'children'))
+        assert FlatAST.from_node(ast) == before
+        assert residual({'properties': {'y': 2}}) and not residual({})
+
+    def test_frozen_input_is_shared(self):
+        compiled = Filter('a = 1 and b = 2')
+        residual = compiled.specialize({'c': 1})
+        assert residual.ast.children[0].children[0] is compiled.ast.children[0].children[0]
+
+
+class TestResidualCache:
+    def test_hits_and_eviction(self):
+        cache = ResidualCache(maxsize=2)
+        first = cache.get('event = "A" and x = 1', {'event': 'A'})
+        assert cache.get(Filter('event = "A" and x = 1'), {'event': 'A'}) is first
+        assert cache.get('event = "A" and x = 1', {'event': 'B'}).always is False
+        cache.get('event = "A"', {'event': 'A'})
+        info = cache.cache_info()
+        assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 3, 1, 2)
+        assert cache.get('event = "A" and x = 1', {'event': 'A'}) is not first
+
+    def test_keys_tell_value_types_apart(self):
+        cache = ResidualCache()
+        assert cache.get('a = 1', {'a': 1}).always is True
+        assert cache.get('a = 1', {'a': True}).always is False
+        assert cache.get('a.b = 1', {'a': {'b': 1}}).always is True
+        assert cache.get('a.b = 1', {'a': {'b': '1'}}).always is False
+
+    def test_threads(self):
+        cache = ResidualCache(maxsize=8)
+        queries = [f'event = "E{index}" and properties.x > {index}' for index in range(4)]
+        errors = []
+
+        def work(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(200):
+                    index, name = rng.randrange(4), f'E{rng.randrange(4)}'
+                    residual = cache.get(queries[index], {'event': name})
+                    assert residual.always is (False if name != f'E{index}' else None)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == [] and cache.cache_info().currsize <= 8
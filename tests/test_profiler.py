@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, Profiler
+from segment_fql.compiler.profiler import node_text
+from segment_fql import Filter
+
+from tests.test_compiler import EVENTS, QUERIES
+
+QUERY = '!(a.b = "x") or contains(c, "y") and d = [1, null] or e.f'
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+class TestProfiler:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_profiled_results_match_compiler(self, query):
+        expected = Compiler(parse(query)).compile()
+        profiler = Profiler(parse(query), sample_every=1)
+        for event in EVENTS:
+            assert profiler(event) == expected(event)
+            assert profiler.trace(event)['result'] == expected(event)
+
+    def test_nodes_in_source_order(self):
+        stats = Profiler(parse(QUERY)).stats()
+        assert [(record['kind'], record['text'], record['parent']) for record in stats.values()] == [
+            ('statement', QUERY, None),
+            ('not', '!(a.b = "x")', 0),
+            ('conditional', 'a.b = "x"', 1),
+            ('function', 'contains(c, "y")', 0),
+            ('conditional', 'd = [1, null]', 0),
+            ('value', 'e.f', 0),
+        ]
+
+    def test_counts_evaluations_and_matches(self):
+        profiler = Profiler(parse(QUERY), sample_every=None)
+        events = [{'a': {'b': 'x'}, 'c': 'y', 'd': 1}, {'a': {'b': 'x'}, 'c': 'z'}, {}]
+        assert [profiler(event) for event in events] == [True, False, True]
+
+        stats = profiler.stats()
+        assert [(record['evaluations'], record['matches']) for record in stats.values()] == [
+            (3, 2), (3, 1), (3, 2), (2, 1), (1, 1), (1, 0),
+        ]
+        assert stats[3]['match_rate'] == 0.5
+        assert all(record['samples'] == 0 and record['time_ns'] == 0 for record in stats.values())
+
+    def test_samples_time(self):
+        profiler = Profiler(parse('a = 1 and b = 2'), sample_every=4)
+        for _ in range(10):
+            profiler({'a': 1, 'b': 2})
+        stats = profiler.stats()
+        assert stats[0]['samples'] == 2
+        assert stats[0]['time_ns'] > 0 and stats[0]['mean_ns'] == stats[0]['time_ns'] / 2
+
+    def test_trace_marks_short_circuited_branches(self):
+        trace = Profiler(parse(QUERY)).trace({'a': {'b': 'x'}, 'c': 'z'})
+        assert trace['result'] is False
+        assert [(node['result'], node['short_circuited']) for node in trace['nodes']] == [
+            (False, False), (False, False), (True, False), (False, False), (None, True), (False, False),
+        ]
+
+    def test_nested_skipped_nodes_are_not_short_circuited(self):
+        trace = Profiler(parse('a = 1 or !(b = 2 and c = 3)')).trace({'a': 1})
+        assert [(node['text'], node['result'], node['short_circuited']) for node in trace['nodes']] == [
+            ('a = 1 or !(b = 2 and c = 3)', True, False),
+            ('a = 1', True, False),
+            ('!(b = 2 and c = 3)', None, True),
+            ('b = 2 and c = 3', None, False),
+            ('b = 2', None, False),
+            ('c = 3', None, False),
+        ]
+
+    def test_disable_and_enable(self):
+        profiler = Profiler(parse('a = 1'))
+        profiler.disable()
+        assert profiler({'a': 1}) is True and profiler.predicate is profiler.plain
+        assert profiler.stats()[0]['evaluations'] == 0
+
+        profiler.enable()
+        profiler({'a': 1})
+        assert profiler.stats()[0]['evaluations'] == 1
+
+        profiler.reset()
+        assert profiler.stats()[0]['evaluations'] == 0
+
+    def test_json_lines(self):
+        profiler = Profiler(parse(QUERY))
+        profiler({})
+        records = [json.loads(line) for line in profiler.to_json_lines().splitlines()]
+        assert records == list(profiler.stats().values())
+
+    def test_filter_profiler(self):
+        compiled = Filter('event = "Order Completed" and properties.revenue > 10')
+        profiler = compiled.profiler()
+        assert [profiler(event) for event in EVENTS] == [compiled(event) for event in EVENTS]
+        assert compiled.predicate is not profiler.predicate
+        assert profiler.stats()[2]['evaluations'] == 2
+
+    @pytest.mark.parametrize('query', ['a.b >= 1.5', 'match(a, "x*")', 'a = ["x", 2, null]', '!(a = true)', 'a != "x y"'])
+    def test_node_text_round_trips(self, query):
+        assert node_text(parse(query).children[0]) == query
@@ -0,0 +1,114 @@
+import json
+import random
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, ProjectedEvaluator, semantics
+from segment_fql.compiler.projection import projection_trie
+
+from tests.test_compiler import EVENTS, QUERIES
+
+PAYLOAD = json.dumps({
+    'type': 'track',
+    'context': {'ip': '10.0.0.1', 'tricky': 'brackets } ] { [ and "quotes" \\ backslashes', 'list': [{'a': [1, {}]}, []]},
+    'event': 'Order é "Completed"',
+    'properties': {'revenue': 1.5e3, 'items': [1, 2, 3], 'url': 'https://segment.com', 'empty': {}, 'flag': False},
+    'näme': None,
+}, ensure_ascii=False, indent=2).encode()
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+class TestProjectedEvaluator:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_projection_matches_compiler(self, query):
+        ast = parse(query)
+        evaluator = ProjectedEvaluator(ast)
+        predicate = Compiler(ast).compile()
+        for event in EVENTS:
+            assert evaluator(json.dumps(event).encode()) == predicate(event)
+
+    def test_projection_decodes_only_needed_paths(self):
+        evaluator = ProjectedEvaluator(parse('event = "x" and properties.url = "y" or properties.flag'))
+        assert evaluator.project(PAYLOAD) == {
+            'event': 'Order é "Completed"',
+            'properties': {'url': 'https://segment.com', 'flag': False},
+        }
+
+    def test_projection_tricky_values(self):
+        payload = memoryview(PAYLOAD)
+        event = json.loads(PAYLOAD)
+        for query in [
+            'contains(event, "é")',
+            'properties.revenue >= 1500',
+            'properties.items != null and properties.empty != null',
+            'context.list != null',
+            'contains(context.tricky, "quotes")',
+            'näme = null and type = "track"',
+            'properties.missing = null',
+            'properties',
+        ]:
+            ast = parse(query)
+            assert ProjectedEvaluator(ast)(payload) == Compiler(ast).compile()(event), query
+
+    def test_projection_escaped_keys(self):
+        evaluator = ProjectedEvaluator(parse('properties.café = "x" and event = "a"'))
+        payload = json.dumps({'properties': {'café': 'x'}, 'event': 'a'}).encode()
+        assert b'\\u00e9' in payload and evaluator(payload)
+        assert evaluator(br'{"properties": {"caf\u00e9": "x"}, "ev\u0065nt": "a"}')
+        assert not evaluator(br'{"properties": {"cafe": "x"}, "event": "a"}')
+
+    def test_projection_prefix_paths(self):
+        assert projection_trie([('properties', 'url'), ('properties',), ('event',)]) == {'properties': None, 'event': None}
+        assert projection_trie([('properties',), ('properties', 'url')]) == {'properties': None}
+        assert ProjectedEvaluator(parse('properties.url = "https://segment.com" or properties'))(PAYLOAD)
+
+    def test_projection_non_object_parent(self):
+        evaluator = ProjectedEvaluator(parse('properties.url = null'))
+        assert evaluator.project(b'{"properties": [1, 2]}') == {'properties': None}
+        assert evaluator(b'{"properties": "text"}')
+
+    def test_projection_stops_early(self):
+        evaluator = ProjectedEvaluator(parse('event = "a" and properties.plan = "pro"'))
+        assert evaluator(b'{"event": "a", "properties": {"plan": "pro", "x": 1}, "context": ')
+        assert evaluator(b'{"properties": {"plan": "pro"}, "event": "a" this is never read')
+
+    def test_projection_duplicate_keys(self):
+        evaluator = ProjectedEvaluator(parse('event = "first"'))
+        assert evaluator(b'{"event": "first", "event": "second"}')
+
+    def test_projection_invalid_json(self):
+        evaluator = ProjectedEvaluator(parse('event = "a"'))
+        for payload in [b'[1, 2]', b'', b'{"context": {"a": 1}', b'{"context": "open', b'{"context" 1}', b'{"context": 1 "event": "a"}', b'{"event": tru}']:
+            with pytest.raises(Exception):
+                evaluator(payload)
+
+    def test_projection_without_paths(self):
+        assert ProjectedEvaluator(parse('true'))(b'not even json')
+
+    def test_projection_random_payloads(self):
+        rng = random.Random(7)
+        strings = ['plain', 'with } brace', 'with ] bracket', 'quote " and \\ slash', 'ünïcode', '']
+
+        def value(depth):
+            roll = rng.random()
+            if depth > 2 or roll < 0.4:
+                return rng.choice([rng.choice(strings), rng.randint(-5, 5), 1.5, True, False, None])
+            if roll < 0.7:
+                return [value(depth + 1) for _ in range(rng.randint(0, 20))]
+            return {rng.choice(['a', 'b', 'c', 'd']) + str(index): value(depth + 1) for index in range(rng.randint(0, 20))}
+
+        paths = [('a0',), ('b1', 'c2'), ('d3', 'a4', 'b5')]
+        evaluator = ProjectedEvaluator(parse('a0 = "x" or b1.c2 = "x" or d3.a4.b5 = "x"'))
+        for _ in range(200):
+            event = {key: value(0) for key in ['c9', 'a0', 'b1', 'd3', 'd8'] if rng.random() < 0.8}
+            for keys in paths:
+                if rng.random() < 0.5:
+                    event.setdefault(keys[0], {})
+            projected = evaluator.project(json.dumps(event, ensure_ascii=rng.random() < 0.5).encode())
+            for keys in paths:
+                assert semantics.resolve(projected, keys) == semantics.resolve(event, keys)
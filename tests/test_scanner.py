@@ -0,0 +1,100 @@
+import random
+import types
+
+import pytest
+
+from segment_fql.lexer import Lexer, Scanner, Token, TokenType
+
+QUERIES = [
+    'true',
+    '1 = "hello"',
+    'properties.product = "dfs"',
+    '!(1 = "hello")',
+    'event = "Order Completed"',
+    '!(event = "Notification Event" or traits.fgd_marketing_comms_status != null)',
+    'properties.revenue >= 10.5 and properties.count < -1',
+    'contains(properties.url, "segment") or match(context.page.path, "/docs/*")',
+    'userId = ["a", "b", 3]',
+    'a\\ b\\. = 1',
+    'café = "crème" and x² = 1',
+    '"unterminated',
+    '',
+    '   ',
+]
+
+ERRORS = ['!', '!x', 'a*', 'a\\', '1.', '1..2', '1.2.3', 'a = #', 'a$ = 1', '½']
+
+
+def outcome(lexer_class, text):
+    try:
+        return lexer_class(text).lex()
+    except Exception as error:
+        return str(error)
+
+
+class TestScanner:
+    def test_scanner_path(self):
+        tokens = Scanner('properties.product = "dfs"').lex()
+        assert tokens == [
+            Token(TokenType.Ident, 'properties'),
+            Token(TokenType.Dot, '.'),
+            Token(TokenType.Ident, 'product'),
+            Token(TokenType.Operator, '='),
+            Token(TokenType.String, 'dfs'),
+            Token(TokenType.EOS, 'eos')
+        ]
+
+    def test_scanner_iter_tokens_is_lazy(self):
+        tokens = Scanner('event = "a" and !').iter_tokens()
+        assert isinstance(tokens, types.GeneratorType)
+        assert next(tokens) == Token(TokenType.Ident, 'event')
+        assert next(tokens) == Token(TokenType.Operator, '=')
+        assert next(tokens) == Token(TokenType.String, 'a')
+        assert next(tokens) == Token(TokenType.Logical, 'and')
+        with pytest.raises(Exception):
+            next(tokens)
+
+    @pytest.mark.parametrize('query', QUERIES + ERRORS)
+    def test_scanner_matches_lexer(self, query):
+        assert outcome(Scanner, query) == outcome(Lexer, query)
+
+    def test_scanner_length_limits(self):
+        for text in ['a' * 11, '1' * 12, '1' * 9 + '.5', '1' * 10 + '.5']:
+            lexer, scanner = Lexer(text), Scanner(text)
+            for instance in [lexer, scanner]:
+                instance.MAXIMUM_NUMBER_LENGTH = 10
+                instance.MAXIMUM_STRING_LENGTH = 10
+            assert outcome(lambda _: scanner, text) == outcome(lambda _: lexer, text)
+
+    def test_scanner_fuzz(self):
+        alphabet = list('ab_-\\.,()[]"!=<>+* 09\t') + ['é', '²', '½', 'event', 'and', ' or ', 'null', '1.5']
+        rng = random.Random(1)
+        for _ in range(5000):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+            assert outcome(Scanner, text) == outcome(Lexer, text), text
+
+    @pytest.mark.parametrize('query', QUERIES + ERRORS)
+    def test_scan_matches_lex(self, query):
+        tokens, spans, error = Scanner(query).scan()
+        expected = outcome(Scanner, query)
+        if isinstance(expected, str):
+            assert error is not None and error[1] == expected
+            assert 0 <= error[2] < error[3] <= len(query)
+        else:
+            assert error is None and tokens == expected and len(spans) == len(tokens)
+
+    def test_scan_spans(self):
+        query = ' a.b  >= "x y" and\tc = -1.5'
+        tokens, spans, error = Scanner(query).scan()
+        assert error is None
+        assert [query[start:end] for start, end in spans] == ['a', '.', 'b', '>=', '"x y"', 'and', 'c', '=', '-1.5', '']
+        assert spans[-1] == (len(query), len(query))
+
+    def test_scan_fuzz(self):
+        alphabet = list('ab_-\\.,()[]"!=<>+* 09\t') + ['é', '²', '½', 'event', 'and', ' or ', 'null', '1.5']
+        rng = random.Random(2)
+        for _ in range(5000):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+            tokens, _, error = Scanner(text).scan()
+            expected = outcome(Scanner, text)
+            assert (error[1] if error else tokens) == expected, text
@@ -0,0 +1,126 @@
+import json
+import random
+import sqlite3
+
+import pytest
+
+from segment_fql.lexer import Lexer
+from segment_fql.parser import Parser
+from segment_fql.compiler import Compiler, SQLCompiler, SQLDialect, SQLiteDialect
+from segment_fql.compiler.sql import sqlite_glob
+from benchmarks.generator import QueryGenerator
+
+from tests.test_compiler import EVENTS, QUERIES
+from tests.test_optimizer import DOMAIN_EVENTS, random_query
+
+TYPED_EVENTS = [
+    {'a': value, 'b': other}
+    for value in [0, 1, 2.5, -1, True, False, None, '', 'x', 'y', {}, {'k': 1}, [], [1]]
+    for other in [1, 'x', True, None, {'k': 1}]
+] + [{}, {'a': {'b': 'nested'}}, {'a': 'x', 'c': 'xyz'}]
+
+TYPED_QUERIES = [
+    'a', 'a = 1', 'a = 1.0', 'a != 1', 'a = true', 'a != false', 'a = null', 'a != null', 'a = "x"',
+    'a > 0', 'a <= 2.5', 'a > "w"', 'a < null', 'a > true', 'a = b', 'a != b', 'a > b', 'a <= b',
+    'a = [1, "x", true, null]', 'a != [2.5, "y"]', 'a = []', 'a != []', '1 < a', '"x" = a', 'a.b = "nested"',
+    'contains(a, "")', 'contains(c, "y")', 'match(a, "?")', 'match(c, "x*z")', 'match(c, "[!a]y[x-z]")',
+    'contains(a, "x") = a', 'contains(a, "x") = true', 'contains(a, "x") != [false]', 'contains("abc", "b")',
+]
+
+
+class Database:
+    def __init__(self, events):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE events (payload TEXT)')
+        self.connection.executemany('INSERT INTO events (payload) VALUES (?)', [(json.dumps(event),) for event in events])
+        self.events = events
+
+    def matches(self, query, **options):
+        sql, params = SQLCompiler(parse(query), **options).compile()
+        rows = self.connection.execute(f'SELECT rowid FROM events WHERE {sql} ORDER BY rowid', params)
+        return [rowid - 1 for rowid, in rows]
+
+    def expected(self, query):
+        predicate = Compiler(parse(query)).compile()
+        return [index for index, event in enumerate(self.events) if predicate(event)]
+
+
+def parse(query):
+    return Parser(Lexer(query).lex()).parse()
+
+
+class TestSQLCompiler:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_sql_matches_compiler(self, query):
+        database = Database(EVENTS)
+        assert database.matches(query) == database.expected(query)
+
+    @pytest.mark.parametrize('query', TYPED_QUERIES)
+    def test_sql_types(self, query):
+        database = Database(TYPED_EVENTS)
+        assert database.matches(query) == database.expected(query)
+
+    def test_sql_random_queries(self):
+        database = Database(DOMAIN_EVENTS)
+        rng = random.Random(23)
+        for _ in range(200):
+            query = random_query(rng)
+            assert database.matches(query) == database.expected(query), query
+
+    def test_sql_generated_queries(self):
+        generator = QueryGenerator(clauses=20, depth=3, function_ratio=0.2, list_size=4, seed=6)
+        database = Database(generator.events(200))
+        for query in generator.queries(20):
+            assert database.matches(query) == database.expected(query), query
+
+    def test_sql_large_list(self):
+        database = Database([{'userId': f'user-{index}'} for index in range(0, 1000, 7)])
+        values = ', '.join(f'"user-{index}"' for index in range(0, 1000, 3))
+        query = f'userId = [{values}]'
+        sql, params = SQLCompiler(parse(query)).compile()
+        assert len(params) < 10
+        assert database.matches(query) == database.expected(query)
+
+    def test_sql_is_parameterized(self):
+        sql, params = SQLCompiler(parse('properties.name = "x\' OR 1 = 1 --"'), column='data').compile()
+        assert 'OR 1 = 1' not in sql
+        assert 'json_extract(data, ?)' in sql
+        assert "x' OR 1 = 1 --" in params
+
+    def test_sql_unsupported_function(self):
+        from segment_fql.functions import default_registry
+        default_registry.register('custom', lambda pattern: lambda value: True)
+        try:
+            with pytest.raises(Exception):
+                SQLCompiler(parse('custom(a, "x")')).compile()
+        finally:
+            default_registry.unregister('custom')
+
+    def test_sql_dialect_is_pluggable(self):
+        class LikeDialect(SQLiteDialect):
+            def contains(self, value, params, substring):
+                escaped = substring.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+                return f"{value} LIKE ? ESCAPE '!'", params + [f'%{escaped}%']
+
+        database = Database([{'a': 'x_y'}, {'a': 'xzy'}, {'a': 'X_Y'}])
+        database.connection.execute('PRAGMA case_sensitive_like = ON')
+        assert database.matches('contains(a, "_")', dialect=LikeDialect()) == [0, 2]
+
+    def test_sql_dialect_must_be_complete(self):
+        class PartialDialect(SQLDialect):
+            def type_of(self, column, keys):
+                return f"json_type({column})", []
+
+        with pytest.raises(TypeError, match='abstract'):
+            PartialDialect()
+        with pytest.raises(TypeError):
+            SQLDialect()
+
+    @pytest.mark.parametrize('pattern, expected', [
+        ('a*', 'a*'),
+        ('[!ab]?', '[^ab]?'),
+        ('[^a]', '[a^]'),
+        ('[a', '[[]a'),
+    ])
+    def test_sqlite_glob(self, pattern, expected):
+        assert sqlite_glob(pattern) == expected
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from segment_fql import Filter, afilter
+
+from tests.test_compiler import EVENTS
+
+QUERY = 'event = "Order Completed" or match(properties.url, "https://*.com")'
+
+
+async def source_of(events, delay=None, produced=None):
+    for event in events:
+        if delay is not None:
+            await asyncio.sleep(delay)
+        if produced is not None:
+            produced.append(time.perf_counter())
+        yield event
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def expected(events, query=QUERY):
+    return [event for event in events if Filter(query)(event)]
+
+
+class TestStreaming:
+    def test_afilter_matches_in_order(self):
+        events = [dict(event, index=index) for index, event in enumerate(EVENTS * 200)]
+        found = asyncio.run(collect(afilter(QUERY, source_of(events), batch_size=64)))
+        assert found == expected(events)
+
+    def test_afilter_plain_iterable_and_filter(self):
+        found = asyncio.run(collect(afilter(Filter(QUERY), EVENTS * 3, batch_size=2)))
+        assert found == expected(EVENTS * 3)
+
+    @pytest.mark.parametrize('executor_type', [ThreadPoolExecutor, ProcessPoolExecutor])
+    def test_afilter_executor(self, executor_type):
+        events = [dict(event, index=index) for index, event in enumerate(EVENTS * 100)]
+        with executor_type(max_workers=2) as executor:
+            found = asyncio.run(collect(afilter(QUERY, source_of(events), batch_size=50, executor=executor)))
+        assert found == expected(events)
+
+    def test_afilter_source_error(self):
+        async def failing():
+            yield EVENTS[0]
+            raise ValueError('source failed')
+
+        with pytest.raises(ValueError):
+            asyncio.run(collect(afilter(QUERY, failing())))
+
+    def test_afilter_invalid_query(self):
+        with pytest.raises(Exception):
+            asyncio.run(collect(afilter('event = #', EVENTS)))
+
+    def test_afilter_backpressure(self):
+        produced = []
+
+        async def main():
+            stream = afilter('true', source_of(range(100000), produced=produced), batch_size=10, max_batches=2)
+            await stream.__anext__()
+            await asyncio.sleep(0.05)
+            count = len(produced)
+            await stream.aclose()
+            return count
+
+        # One batch being consumed, two queued, one waiting to be queued and one being filled.
+        assert asyncio.run(main()) <= 5 * 10
+
+    def test_afilter_flushes_partial_batches(self):
+        # The source only produces the next event once the previous one was yielded,
+        # so this finishes only if partial batches are flushed after `max_delay`.
+        consumed = []
+
+        async def source():
+            for index in range(5):
+                yield {'event': 'Order Completed', 'index': index}
+                while len(consumed) <= index:
+                    await asyncio.sleep(0.001)
+
+        async def main():
+            async for event in afilter(QUERY, source(), batch_size=1000, max_delay=0.001):
+                consumed.append(event['index'])
+
+        asyncio.run(asyncio.wait_for(main(), timeout=10))
+        assert consumed == list(range(5))
+
+    def test_afilter_full_batches_without_delay(self):
+        sizes = []
+
+        class RecordingExecutor(ThreadPoolExecutor):
+            def submit(self, function, *arguments):
+                sizes.append(len(arguments[1]))
+                return super().submit(function, *arguments)
+
+        events = [dict(event, index=index) for index, event in enumerate(EVENTS * 250)]
+        with RecordingExecutor(max_workers=1) as executor:
+            found = asyncio.run(collect(afilter(QUERY, source_of(events), batch_size=100, max_delay=None, executor=executor)))
+        assert found == expected(events)
+        assert sizes[:-1] == [100] * (len(sizes) - 1) and sum(sizes) == len(events)
+
+    def test_afilter_closing_early_stops_the_work(self):
+        started = threading.Event()
+        gate = threading.Event()
+        futures = []
+
+        class GatedExecutor(ThreadPoolExecutor):
+            # The second batch blocks until `gate` is set, so the batches queued behind it never start.
+            def submit(self, function, *arguments):
+                second = len(futures) == 1
+
+                def run():
+                    if second:
+                        started.set()
+                        gate.wait(10)
+                    return function(*arguments)
+
+                futures.append(super().submit(run))
+                return futures[-1]
+
+        async def main():
+            with GatedExecutor(max_workers=1) as executor:
+                stream = afilter('true', source_of(range(1000)), batch_size=10, max_batches=4, executor=executor)
+                assert await stream.__anext__() == 0
+                await asyncio.to_thread(started.wait, 10)
+                queued = futures[2:]
+                for future in queued:
+                    future.add_done_callback(lambda _: all(other.done() for other in queued) and gate.set())
+                await stream.aclose()
+                assert asyncio.all_tasks() == {asyncio.current_task()}
+
+        asyncio.run(main())
+        assert len(futures) > 2 and futures[1].result() == list(range(10, 20))
+        assert all(future.cancelled() for future in futures[2:])
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from segment_fql import Filter, validate, validate_many
+from segment_fql.functions import FunctionRegistry, contains
+from segment_fql.validation import Validator, Diagnostic, CODES
+from benchmarks.generator import QueryGenerator
+
+from tests.test_compiler import QUERIES
+
+PIECES = [
+    'a', 'b.c', 'true', 'null', 'and', 'or', '=', '!=', '>', '!(', '(', ')', '[', ']', ',', '.', '"s"', '1', '1.5',
+    '+', '1.', '²', 'é', '\\', '*', 'contains(a, "x")', 'match(b, "y*")', 'foo(a, "x")', '[1, "a", null]', '[]',
+]
+
+DIAGNOSTICS = [
+    ('', 'unexpected-end', ''),
+    ('a = 1 and', 'unexpected-end', ''),
+    ('a = 1.', 'invalid-number', '1.'),
+    ('a = +', 'invalid-number', '+'),
+    ('a = 1 #', 'invalid-character', '#'),
+    ('a$ = 1', 'invalid-identifier', 'a'),
+    ('!(a = 1', 'unclosed-group', '!(a = 1'),
+    ('a = 1)', 'unexpected-token', ')'),
+    ('a and b = 1', 'unexpected-token', 'and'),
+    ('a = 1 b', 'unexpected-token', 'b'),
+    ('foo(a, "x")', 'unsupported-function', 'foo'),
+    ('contains(a, 1)', 'invalid-function-call', '1'),
+    ('a > [1]', 'list-operator', '>'),
+    ('a = [1, b]', 'invalid-list', 'b'),
+    ('a = [1 2]', 'invalid-list', '2'),
+    ('"x".y = 1', 'invalid-path', '"x".y'),
+    ('= = 1', 'expected-value', '='),
+]
+
+
+def compiles(query):
+    try:
+        Filter(query)
+        return True
+    except Exception:
+        return False
+
+
+def random_query(rng):
+    return ' '.join(rng.choice(PIECES) for _ in range(rng.randint(0, 7)))
+
+
+def mutated_query(rng, query):
+    characters = list(query)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randint(0, len(characters))
+        if rng.random() < 0.5 and characters:
+            del characters[min(index, len(characters) - 1)]
+        else:
+            characters.insert(index, rng.choice(' ()[]",.=!<>a1+-\\é'))
+    return ''.join(characters)
+
+
+class TestValidation:
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_valid_queries(self, query):
+        result = validate(query)
+        assert result.valid and result.diagnostics == []
+
+    @pytest.mark.parametrize('query, code, text', DIAGNOSTICS)
+    def test_diagnostics(self, query, code, text):
+        assert not compiles(query)
+        result = validate(query)
+        assert not result.valid
+        diagnostic = result.diagnostics[-1]
+        assert diagnostic.code == code and diagnostic.code in CODES
+        assert query[diagnostic.start:diagnostic.end] == text
+
+    def test_value_errors_before_a_syntax_error(self):
+        diagnostics = validate('"x".y = 1 and b = 2 c').diagnostics
+        assert [diagnostic.code for diagnostic in diagnostics] == ['invalid-path', 'unexpected-token']
+
+    def test_agrees_with_filter_on_random_queries(self):
+        rng = random.Random(4)
+        base = QueryGenerator(seed=4, clauses=4, depth=1, function_ratio=0.3, list_size=3).queries(50)
+        for _ in range(4000):
+            query = random_query(rng) if rng.random() < 0.5 else mutated_query(rng, rng.choice(base))
+            result = validate(query)
+            assert result.valid == compiles(query), (query, result.diagnostics)
+            for diagnostic in result.diagnostics:
+                assert 0 <= diagnostic.start <= diagnostic.end <= len(query)
+
+    def test_grouping_depth(self):
+        assert validate('!(' * 1000 + 'a' + ')' * 1000).diagnostics == [Diagnostic('unexpected-token', 'Expected an operator after "a", got ")"', 2001, 2002)]
+        assert validate('!(' * 1000 + 'a = 1' + ')' * 1000).valid
+        assert [diagnostic.code for diagnostic in validate('!(' * 1001 + 'a = 1' + ')' * 1001).diagnostics] == ['nesting-too-deep']
+
+    def test_functions(self):
+        functions = FunctionRegistry({'contains': contains})
+        assert Validator('contains(a, "x")', functions).validate() == []
+        assert [diagnostic.code for diagnostic in Validator('match(a, "x")', functions).validate()] == ['unsupported-function']
+
+    def test_to_dict(self):
+        assert validate('a = 1)').to_dict() == {
+            'query': 'a = 1)',
+            'valid': False,
+            'diagnostics': [{'code': 'unexpected-token', 'message': 'Unmatched ")"', 'start': 5, 'end': 6}],
+        }
+
+    def test_validate_many(self):
+        queries = [query for query, _, _ in DIAGNOSTICS] + QUERIES
+        expected = [validate(query).to_dict() for query in queries]
+        assert [result.to_dict() for result in validate_many(queries)] == expected
+        assert [result.to_dict() for result in validate_many(iter(queries), workers=2, chunk_size=10)] == expected